@@ -0,0 +1,135 @@
+"""
+Download path benchmark for TikTok Live Recorder.
+
+Serves synthetic live streams from a local HTTP server (in another
+process) and records them with the old path (4 KiB iter_content chunks
+gathered in a bytearray) and the block path (http_utils.stream_reader),
+then prints the recorder's CPU time per stream.
+
+Usage: python benchmark_download.py [-streams 50] [-rate 1] [-seconds 10]
+"""
+
+import argparse
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from http_utils.stream_reader import STREAM_READ_SIZE, iter_blocks
+
+
+def serve(port, rate, seconds, ready):
+    """Streams `seconds` of random bytes at `rate` bytes/s to every client."""
+    payload = os.urandom(rate // 10)
+
+    class StreamHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.0"
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "video/x-flv")
+            self.end_headers()
+            start = time.monotonic()
+            for i in range(seconds * 10):
+                time.sleep(max(0, start + i / 10 - time.monotonic()))
+                self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), StreamHandler)
+    ready.set()
+    server.serve_forever()
+
+
+def record_chunks(url, path):
+    """The previous path: 4 KiB chunks appended to a 512 KiB bytearray."""
+    buffer = bytearray()
+    with open(path, "wb") as out_file:
+        stream = requests.get(url, stream=True)
+        start_time = time.time()
+        for chunk in stream.iter_content(chunk_size=4096):
+            if chunk:
+                buffer.extend(chunk)
+                if len(buffer) >= 512 * 1024:
+                    out_file.write(buffer)
+                    buffer.clear()
+                time.time() - start_time
+        out_file.write(buffer)
+
+
+def record_blocks(url, path, read_size=STREAM_READ_SIZE):
+    """The block path: readinto a reused buffer, written as memoryviews."""
+    with open(path, "wb") as out_file:
+        stream = requests.get(url, stream=True)
+        start_time = time.time()
+        for block in iter_blocks(stream, read_size):
+            out_file.write(block)
+            time.time() - start_time
+
+
+def run(recorder, url, streams, directory):
+    """Records `streams` streams at once; returns (CPU seconds, bytes written)."""
+    paths = [
+        os.path.join(directory, f"{recorder.__name__}_{i}.flv") for i in range(streams)
+    ]
+    threads = [threading.Thread(target=recorder, args=(url, path)) for path in paths]
+
+    cpu = time.process_time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cpu = time.process_time() - cpu
+
+    written = sum(os.path.getsize(path) for path in paths)
+    for path in paths:
+        os.remove(path)
+    return cpu, written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the stream download path")
+    parser.add_argument(
+        "-streams", type=int, default=50, help="Concurrent streams (default: 50)"
+    )
+    parser.add_argument(
+        "-rate", type=float, default=1.0, help="Stream bitrate in MB/s (default: 1)"
+    )
+    parser.add_argument(
+        "-seconds", type=int, default=10, help="Stream length (default: 10)"
+    )
+    parser.add_argument(
+        "-port", type=int, default=8790, help="Local server port (default: 8790)"
+    )
+    args = parser.parse_args()
+
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(
+        target=serve,
+        args=(args.port, int(args.rate * 1024 * 1024), args.seconds, ready),
+        daemon=True,
+    )
+    server.start()
+    ready.wait()
+    url = f"http://127.0.0.1:{args.port}/live.flv"
+
+    print(f"{args.streams} streams x {args.seconds}s at {args.rate} MB/s")
+    with tempfile.TemporaryDirectory() as directory:
+        for recorder in (record_chunks, record_blocks):
+            cpu, written = run(recorder, url, args.streams, directory)
+            per_stream = cpu / args.streams / args.seconds * 100
+            print(
+                f"  {recorder.__name__:14} {cpu:6.2f}s CPU, {per_stream:5.2f}% of a core per stream, "
+                f"{written / 1024 / 1024:.0f} MB written"
+            )
+
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import asyncio
+
+from http_utils.circuit_breaker import get_breaker
+from http_utils.http_client import DEFAULT_HEADERS
+from http_utils.transport import DNS_CACHE_TIMEOUT
+from http_utils.rate_limiter import RateLimiter
+from utils.enums import Priority, TikTokError
+from utils.room_id_cache import RoomIdCache
+from utils.custom_exceptions import UserLiveError
+
+
+class AsyncTikTokAPI:
+    """
+    Asyncio counterpart of TikTokAPI for the polling endpoints, built on
+    curl_cffi's AsyncSession so thousands of users can be checked from a
+    single event loop.
+    """
+
+    def __init__(
+        self,
+        proxy=None,
+        cookies=None,
+        max_clients=20,
+        room_id_cache=None,
+        rate_limiter=None,
+    ):
+        from curl_cffi import AsyncSession, CurlOpt
+
+        self.BASE_URL = "https://www.tiktok.com"
+        self.WEBCAST_URL = "https://webcast.tiktok.com"
+        self.TIKREC_API = "https://tikrec.com"
+
+        self.CHECK_ALIVE_BATCH_SIZE = 50
+
+        self.room_id_cache = room_id_cache or RoomIdCache()
+        self.rate_limiter = rate_limiter or RateLimiter()
+
+        # Shared with TikTokAPI: a WAF block seen by one stops both
+        self.tikrec_breaker = get_breaker("tikrec.com")
+        self.room_api_breaker = get_breaker("tiktok.com/api-live")
+
+        self.session = AsyncSession(
+            impersonate="chrome136",
+            max_clients=max_clients,
+            proxies={"http": proxy, "https": proxy} if proxy else None,
+            timeout=10,
+            curl_options={CurlOpt.DNS_CACHE_TIMEOUT: DNS_CACHE_TIMEOUT},
+        )
+        self.session.headers.update(DEFAULT_HEADERS)
+
+        if cookies is not None:
+            self.session.cookies.update(cookies)
+
+    async def close(self):
+        await self.session.close()
+
+    async def _get(self, url: str, priority: Priority = Priority.ROUTINE, **kwargs):
+        await self.rate_limiter.acquire_async(url, priority)
+        return await self.session.get(url, **kwargs)
+
+    async def _tikrec_get_room_id_signed_path(self, user: str) -> str:
+        response = await self._get(
+            f"{self.TIKREC_API}/tiktok/room/api/sign",
+            params={"unique_id": user},
+        )
+
+        return response.json().get("signed_path")
+
+    async def _fetch_user_room_data(self, signed_path: str) -> dict:
+        response = await self._get(f"{self.BASE_URL}{signed_path}")
+        content = response.text
+
+        if not content or "Please wait" in content:
+            raise UserLiveError(TikTokError.WAF_BLOCKED)
+
+        return response.json()
+
+    async def get_room_id_from_user(self, user: str, max_age: float = 0) -> str | None:
+        """
+        Given a username, get the room_id. A cached "no room" answer is
+        reused for max_age seconds (see RoomIdCache.get_room_id).
+        """
+        hit, room_id = self.room_id_cache.get_room_id(user, max_age)
+        if hit:
+            return room_id
+
+        # Reuse a cached signed path first to skip the tikrec round-trip
+        signed_path = self.room_id_cache.get_signed_path(user)
+        if signed_path:
+            try:
+                data = await self.room_api_breaker.call_async(
+                    self._fetch_user_room_data, signed_path
+                )
+            except (UserLiveError, ValueError):
+                data = {}
+
+            if "data" in data:
+                user_data = (data["data"] or {}).get("user")
+                room_id = (user_data or {}).get("roomId")
+                self.room_id_cache.set_room_id(user, room_id, missing=user_data is None)
+                return room_id
+
+        signed_path = await self.tikrec_breaker.call_async(
+            self._tikrec_get_room_id_signed_path, user
+        )
+        data = await self.room_api_breaker.call_async(
+            self._fetch_user_room_data, signed_path
+        )
+
+        user_data = (data.get("data") or {}).get("user")
+        room_id = (user_data or {}).get("roomId")
+        self.room_id_cache.set_room_id(
+            user, room_id, signed_path, missing="data" in data and user_data is None
+        )
+
+        return room_id
+
+    async def _check_alive_batch(self, batch: list) -> list:
+        response = await self._get(
+            f"{self.WEBCAST_URL}/webcast/room/check_alive/",
+            Priority.LIVE_CONFIRMATION,
+            params={
+                "aid": "1988",
+                "region": "CH",
+                "room_ids": ",".join(batch),
+                "user_is_login": "true",
+            },
+        )
+
+        return response.json().get("data") or []
+
+    async def is_rooms_alive(self, room_ids) -> dict:
+        """
+        Checks many rooms at once, sending up to CHECK_ALIVE_BATCH_SIZE
+        room_ids per check_alive request. Returns room_id -> alive.
+        """
+        room_ids = list(dict.fromkeys(str(r) for r in room_ids if r))
+        alive = dict.fromkeys(room_ids, False)
+
+        batches = [
+            room_ids[i : i + self.CHECK_ALIVE_BATCH_SIZE]
+            for i in range(0, len(room_ids), self.CHECK_ALIVE_BATCH_SIZE)
+        ]
+        results = await asyncio.gather(*(self._check_alive_batch(b) for b in batches))
+
+        for entries in results:
+            for entry in entries:
+                room_id = str(entry.get("room_id_str") or entry.get("room_id", ""))
+                if room_id in alive:
+                    alive[room_id] = entry.get("alive", False)
+
+        return alive
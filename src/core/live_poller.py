@@ -0,0 +1,143 @@
+import asyncio
+import time
+from threading import Thread
+
+from core.async_tiktok_api import AsyncTikTokAPI
+from utils.enums import TimeOut
+from utils.logger_manager import logger
+from utils.poll_scheduler import AdaptivePollScheduler, REQUESTS_PER_MINUTE
+
+
+class LivePoller:
+    """
+    Polls many users from a single asyncio event loop with a bounded number
+    of in-flight requests. When a user goes live, on_live(user, room_id) is
+    run in its own thread, so the existing (blocking) recording path is
+    reused unchanged.
+
+    Poll times come from an AdaptivePollScheduler: users are polled more
+    often around the times they usually go live, within a global
+    requests-per-minute budget.
+    """
+
+    def __init__(
+        self,
+        users,
+        on_live,
+        interval=TimeOut.AUTOMATIC_MODE,
+        max_in_flight=20,
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        on_offline=None,
+        proxy=None,
+        cookies=None,
+        room_id_cache=None,
+        history=None,
+        rate_limiter=None,
+    ):
+        self.users = list(dict.fromkeys(users))
+        self.on_live = on_live
+        self.on_offline = on_offline
+        self.interval = interval
+        self.max_in_flight = max_in_flight
+        self.proxy = proxy
+        self.cookies = cookies
+        self.room_id_cache = room_id_cache
+        self.rate_limiter = rate_limiter
+
+        self.active_recordings = {}  # user -> Thread
+        self.scheduler = AdaptivePollScheduler(
+            self.users,
+            default_interval=interval * TimeOut.ONE_MINUTE,
+            requests_per_minute=requests_per_minute,
+            history=history,
+        )
+
+    def run(self):
+        """
+        Runs the polling loop until interrupted.
+        """
+        asyncio.run(self._run())
+
+    async def _run(self):
+        api = AsyncTikTokAPI(
+            proxy=self.proxy,
+            cookies=self.cookies,
+            max_clients=self.max_in_flight,
+            room_id_cache=self.room_id_cache,
+            rate_limiter=self.rate_limiter,
+        )
+        semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        logger.info(f"Monitoring {len(self.users)} users\n")
+
+        try:
+            while True:
+                self._reap_recordings()
+
+                due = self.scheduler.pop_due()
+                if due:
+                    await self._poll(api, semaphore, due)
+
+                await asyncio.sleep(1)
+        finally:
+            await api.close()
+
+    async def _resolve(self, api, semaphore, user):
+        async with semaphore:
+            try:
+                # Another process's "not live" is only reused within this poll
+                max_age = self.scheduler.interval_for(user) / 2
+                return user, await api.get_room_id_from_user(user, max_age)
+            except Exception as ex:
+                logger.error(f"@{user}: {ex}")
+                return user, None
+
+    async def _poll(self, api, semaphore, users):
+        rooms = dict(
+            await asyncio.gather(*(self._resolve(api, semaphore, u) for u in users))
+        )
+
+        try:
+            alive = await api.is_rooms_alive(rooms.values())
+        except Exception as ex:
+            logger.error(f"Unexpected error while checking rooms: {ex}")
+            alive = {}
+
+        for user, room_id in rooms.items():
+            if room_id and alive.get(str(room_id)):
+                self._hand_off(user, room_id)
+                continue
+
+            self.scheduler.schedule(user)
+            if self.on_offline:
+                self.on_offline(user)
+
+    def _hand_off(self, user, room_id):
+        logger.info(f"@{user} is live. Starting recording...")
+
+        thread = Thread(
+            target=self._record,
+            args=(user, room_id),
+            daemon=True,
+        )
+        thread.start()
+        self.active_recordings[user] = thread
+        self.scheduler.live_started(user)
+
+    def _record(self, user, room_id):
+        try:
+            self.on_live(user, room_id)
+        except Exception as ex:
+            logger.error(f"Error while recording @{user}: {ex}")
+
+    def _reap_recordings(self):
+        for user, thread in list(self.active_recordings.items()):
+            if thread.is_alive():
+                continue
+
+            logger.info(f"Recording of @{user} finished.")
+            del self.active_recordings[user]
+            self.scheduler.live_ended(user)
+
+            # Check again soon, the live may have only dropped briefly
+            self.scheduler.schedule(user, time.monotonic() + 30)
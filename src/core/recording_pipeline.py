@@ -0,0 +1,252 @@
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+
+from http_utils.stream_reader import STREAM_READ_SIZE
+from utils.enums import SpillPolicy
+from utils.logger_manager import logger
+
+
+# Blocks queued in memory between the network reader and the disk writer
+QUEUE_BLOCKS = 32
+
+# Disk writes slower than this (seconds) are counted as slow
+SLOW_WRITE = 1.0
+
+
+class RecordingPipeline:
+    """
+    Bounded buffer between a recording's network reader and a dedicated
+    disk writer thread, so a slow write (NAS hiccup, another process's
+    fsync) doesn't stall the socket until the CDN drops the connection.
+
+    The reader reads each block straight into a free queue buffer
+    (next_buffer) and hands it over with put(). When every buffer is
+    waiting for the disk, the spill policy applies: SPILL keeps reading
+    into a spill file on local disk, drained in order by the writer once
+    it catches up, BLOCK waits for the writer.
+
+    A None part starts a new output file: the writer closes the current
+    one and continues in open_part(index) (part 0 is out_file).
+    """
+
+    def __init__(
+        self,
+        out_file,
+        read_size=STREAM_READ_SIZE,
+        queue_blocks=QUEUE_BLOCKS,
+        spill_policy=SpillPolicy.SPILL,
+        spill_dir=None,
+        open_part=None,
+    ):
+        self.out_file = out_file
+        self.open_part = open_part
+        self.part_files = [out_file]
+        self.read_size = read_size
+        self.queue_blocks = queue_blocks
+        self.spill_policy = spill_policy
+        self.spill_dir = spill_dir or tempfile.gettempdir()
+
+        self._queue = (
+            deque()
+        )  # (block or None, parts) and [offset, size] spill segments
+        self._free = []
+        self._allocated = 0
+        self._pending = None  # Buffer handed to the reader, not yet put()
+        self._overflow = memoryview(bytearray(read_size))
+        self._cond = threading.Condition()
+        self._closed = False
+        self._thread = None
+        self.error = None
+
+        self._spill_writer = None
+        self._spill_reader = None
+        self._spill_end = 0
+        self._spill_path = None
+
+        # Backpressure metrics
+        self.max_queued = 0
+        self.reader_wait = 0.0
+        self.spilled_bytes = 0
+        self.slow_writes = 0
+        self.max_write_time = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def next_buffer(self) -> memoryview:
+        """Buffer (read_size long) to read the next block into."""
+        with self._cond:
+            if self._pending is not None:
+                return self._pending
+
+            if not self._free and self._allocated < self.queue_blocks:
+                self._free.append(memoryview(bytearray(self.read_size)))
+                self._allocated += 1
+
+            if not self._free and self.spill_policy == SpillPolicy.BLOCK:
+                start = time.monotonic()
+                while not self._free and self.error is None:
+                    self._cond.wait()
+                self.reader_wait += time.monotonic() - start
+
+            self._pending = self._free.pop() if self._free else self._overflow
+            return self._pending
+
+    def put(self, block: memoryview, parts=None) -> None:
+        """
+        Queue a block read into the last next_buffer(). With parts, those
+        (slices of the block or other buffers, None for a new file) are
+        written instead.
+
+        Raises:
+            Exception: The writer's error, if it failed (e.g. disk full)
+        """
+        with self._cond:
+            if self.error is not None:
+                raise self.error
+
+            if parts is None:
+                parts = (block,)
+            if self._pending is self._overflow:
+                for part in parts:
+                    if part is None:
+                        self._queue.append((None, (None,)))
+                    else:
+                        self._spill(part)
+            else:
+                self._queue.append((block, parts))
+            self._pending = None
+
+            self.max_queued = max(self.max_queued, self._allocated - len(self._free))
+            self._cond.notify_all()
+
+    def _spill(self, block):
+        """Append a block to the spill file (called with the lock held)."""
+        if self._spill_writer is None:
+            fd, self._spill_path = tempfile.mkstemp(
+                prefix="tiktok_spill_", dir=self.spill_dir
+            )
+            self._spill_writer = os.fdopen(fd, "wb")
+            self._spill_reader = open(self._spill_path, "rb")
+            logger.warning(
+                f"Disk writes are falling behind, spilling to {self._spill_path}"
+            )
+
+        if not len(block):
+            return
+        self._spill_writer.write(block)
+        self._spill_writer.flush()
+
+        last = self._queue[-1] if self._queue else None
+        if isinstance(last, list) and last[0] + last[1] == self._spill_end:
+            last[1] += len(block)  # Extend the last spill segment
+        else:
+            self._queue.append([self._spill_end, len(block)])
+        self._spill_end += len(block)
+        self.spilled_bytes += len(block)
+
+    def _write_loop(self):
+        scratch = memoryview(bytearray(self.read_size))
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                item = self._queue[0]
+
+            try:
+                start = time.monotonic()
+                if isinstance(item, list):
+                    self._write_spilled(item, scratch)
+                else:
+                    for part in item[1]:
+                        if part is None:
+                            self._next_file()
+                        else:
+                            self.out_file.write(part)
+                elapsed = time.monotonic() - start
+            except Exception as e:
+                logger.error(f"Recording write failed: {e}")
+                with self._cond:
+                    self.error = e
+                    self._queue.clear()
+                    self._cond.notify_all()
+                return
+
+            self.max_write_time = max(self.max_write_time, elapsed)
+            if elapsed > SLOW_WRITE:
+                self.slow_writes += 1
+
+            with self._cond:
+                if isinstance(item, list) and item[1]:
+                    continue  # The reader extended the segment meanwhile
+                self._queue.popleft()
+                if not isinstance(item, list):
+                    if item[0] is not None:
+                        self._free.append(memoryview(item[0].obj))
+                elif not self._queue:
+                    self._reset_spill()
+                self._cond.notify_all()
+
+    def _next_file(self):
+        """Continue in the next part file (closing the previous one, unless it's out_file)."""
+        self.out_file.flush()
+        if len(self.part_files) > 1:
+            self.out_file.close()
+        self.out_file = self.open_part(len(self.part_files))
+        self.part_files.append(self.out_file)
+
+    def _write_spilled(self, segment, scratch):
+        """Copy a spill segment to the output (the segment may grow meanwhile)."""
+        with self._cond:
+            offset, size = segment
+        self._spill_reader.seek(offset)
+        while size:
+            read = self._spill_reader.readinto(scratch[: min(size, len(scratch))])
+            if not read:
+                raise OSError(f"Spill file {self._spill_path} is truncated")
+            self.out_file.write(scratch[:read])
+            with self._cond:
+                segment[0] += read
+                segment[1] -= read
+                size = segment[1]
+
+    def _reset_spill(self):
+        """Rewind the drained spill file (called with the lock held)."""
+        self._spill_writer.seek(0)
+        self._spill_writer.truncate()
+        self._spill_end = 0
+
+    def close(self) -> None:
+        """Wait for the queued blocks to be written, then log the metrics."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self.out_file.flush()
+        if len(self.part_files) > 1:
+            self.out_file.close()
+
+        if self._spill_writer is not None:
+            self._spill_writer.close()
+            self._spill_reader.close()
+            try:
+                os.remove(self._spill_path)
+            except OSError:
+                pass
+
+        logger.info(self.summary())
+
+    def summary(self) -> str:
+        return (
+            f"Write queue: max {self.max_queued}/{self.queue_blocks} blocks, "
+            f"reader waited {self.reader_wait:.1f}s, "
+            f"spilled {self.spilled_bytes / 1024 / 1024:.1f} MB, "
+            f"{self.slow_writes} slow writes (max {self.max_write_time:.2f}s)"
+        )
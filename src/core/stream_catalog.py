@@ -0,0 +1,158 @@
+import json
+import time
+from dataclasses import dataclass
+from urllib.parse import parse_qs, urlparse
+
+
+# Legacy pull url keys, best first
+LEGACY_QUALITIES = ["FULL_HD1", "HD1", "ORIGIN", "SD2", "SD1"]
+
+# Protocols found in live_core_sdk_data entries
+SDK_PROTOCOLS = ["flv", "hls", "cmaf"]
+
+
+def _url_expiry(url: str) -> int | None:
+    """
+    Returns the unix time encoded in the `expire` query parameter, if any.
+    """
+    try:
+        expire = parse_qs(urlparse(url).query).get("expire")
+        return int(expire[0]) if expire else None
+    except ValueError:
+        return None
+
+
+@dataclass(frozen=True)
+class StreamVariant:
+    """
+    A single pullable stream: one quality, protocol and CDN (main/backup).
+    """
+
+    quality: str
+    level: int
+    protocol: str
+    url: str
+    source: str  # "main", "backup" or "legacy"
+    expires_at: int | None = None
+    resolution: str | None = None
+
+    def is_expired(self, margin: int = 30) -> bool:
+        return self.expires_at is not None and self.expires_at - margin <= time.time()
+
+
+class StreamCatalog:
+    """
+    Every variant of a live (quality x protocol x main/backup CDN) parsed
+    from /webcast/room/info/, so the recorder can fail over to another
+    variant without querying the API again.
+    """
+
+    def __init__(self, variants: list[StreamVariant], has_sdk_data: bool = False):
+        self.variants = variants
+        self.has_sdk_data = has_sdk_data
+
+    @classmethod
+    def from_stream_url(cls, stream_url: dict) -> "StreamCatalog":
+        """
+        Builds the catalog from the `stream_url` object of room/info.
+        """
+        variants = []
+
+        pull_data = stream_url.get("live_core_sdk_data", {}).get("pull_data", {})
+        sdk_data_str = pull_data.get("stream_data")
+
+        if sdk_data_str:
+            sdk_data = json.loads(sdk_data_str).get("data", {})
+            level_map = {
+                q["sdk_key"]: q["level"]
+                for q in pull_data.get("options", {}).get("qualities", [])
+            }
+
+            for sdk_key, entry in sdk_data.items():
+                level = level_map.get(sdk_key, -1)
+                for source in ("main", "backup"):
+                    stream = entry.get(source) or {}
+                    resolution = cls._sdk_resolution(stream)
+                    for protocol in SDK_PROTOCOLS:
+                        url = stream.get(protocol)
+                        if url:
+                            variants.append(
+                                StreamVariant(
+                                    quality=sdk_key,
+                                    level=level,
+                                    protocol=protocol,
+                                    url=url,
+                                    source=source,
+                                    expires_at=_url_expiry(url),
+                                    resolution=resolution,
+                                )
+                            )
+
+        # Legacy urls rank below every SDK variant
+        flv_urls = stream_url.get("flv_pull_url") or {}
+        legacy = LEGACY_QUALITIES + [q for q in flv_urls if q not in LEGACY_QUALITIES]
+        for rank, quality in enumerate(legacy):
+            url = flv_urls.get(quality)
+            if url:
+                variants.append(
+                    StreamVariant(
+                        quality=quality,
+                        level=-2 - rank,
+                        protocol="flv",
+                        url=url,
+                        source="legacy",
+                        expires_at=_url_expiry(url),
+                    )
+                )
+
+        for protocol, key in (("hls", "hls_pull_url"), ("rtmp", "rtmp_pull_url")):
+            url = stream_url.get(key)
+            if isinstance(url, str) and url:
+                variants.append(
+                    StreamVariant(
+                        quality=key,
+                        level=-100,
+                        protocol=protocol,
+                        url=url,
+                        source="legacy",
+                        expires_at=_url_expiry(url),
+                    )
+                )
+
+        return cls(variants, has_sdk_data=bool(sdk_data_str))
+
+    @staticmethod
+    def _sdk_resolution(stream: dict) -> str | None:
+        try:
+            params = json.loads(stream.get("sdk_params") or "{}")
+        except ValueError:
+            return None
+        return params.get("resolution") or None
+
+    def candidates(
+        self, protocol: str | None = "flv", include_expired: bool = False
+    ) -> list:
+        """
+        Variants ordered for recording: best quality first and, within a
+        quality, the main CDN before the backup one.
+        """
+        order = {"main": 0, "backup": 1, "legacy": 2}
+        return sorted(
+            (
+                v
+                for v in self.variants
+                if (protocol is None or v.protocol == protocol)
+                and (include_expired or not v.is_expired())
+            ),
+            key=lambda v: (-v.level, order[v.source]),
+        )
+
+    def best(self, protocol: str | None = "flv") -> StreamVariant | None:
+        candidates = self.candidates(protocol)
+        return candidates[0] if candidates else None
+
+    def __len__(self):
+        return len(self.variants)
+
+    def __iter__(self):
+        return iter(self.variants)
@@ -1,9 +1,17 @@
+import hashlib
 import json
 import re
 
+from http_utils.circuit_breaker import get_breaker
 from http_utils.http_client import HttpClient
-from utils.enums import StatusCode, TikTokError
+from http_utils.rate_limiter import RateLimiter
+from http_utils.response_cache import ResponseCache
+from http_utils.stream_reader import STREAM_READ_SIZE, iter_blocks
+from core.stream_catalog import StreamCatalog
+from utils.enums import Priority, StatusCode, TikTokError
 from utils.logger_manager import logger
+from utils.room_id_cache import RoomIdCache
+from utils.follow_list_cache import FollowListCache
 from utils.custom_exceptions import (
     UserLiveError,
     TikTokRecorderError,
@@ -12,21 +20,62 @@ from utils.custom_exceptions import (
 
 
 class TikTokAPI:
-    def __init__(self, proxy, cookies):
+    def __init__(self, proxy, cookies, http2=False):
         self.BASE_URL = "https://www.tiktok.com"
         self.WEBCAST_URL = "https://webcast.tiktok.com"
         self.API_URL = "https://www.tiktok.com/api-live/user/room/"
         self.EULER_API = "https://tiktok.eulerstream.com"
         self.TIKREC_API = "https://tikrec.com"
 
-        self.http_client = HttpClient(proxy, cookies).req
-        self._http_client_stream = HttpClient(proxy, cookies).req_stream
+        self.CHECK_ALIVE_BATCH_SIZE = 50
+        self.FOLLOWING_FEED_MAX_PAGES = 5
 
-    def _is_authenticated(self) -> bool:
-        response = self.http_client.get(f"{self.BASE_URL}/foryou")
-        response.raise_for_status()
+        self.FOLLOWERS_PAGE_SIZE = 30
 
-        content = response.text
+        self.room_id_cache = RoomIdCache()
+
+        # Stop calling an endpoint after repeated WAF blocks / connection errors
+        self.tikrec_breaker = get_breaker("tikrec.com")
+        self.room_api_breaker = get_breaker("tiktok.com/api-live")
+
+        # One follow list cache per authenticated account
+        session_id = (cookies or {}).get("sessionid", "")
+        self.follow_list_cache = FollowListCache(
+            hashlib.sha1(session_id.encode()).hexdigest()[:12]
+        )
+
+        self.rate_limiter = RateLimiter()
+
+        # API requests go through the proxy (or proxy pool), streams direct
+        client = HttpClient(proxy, cookies, self.rate_limiter, http2)
+        self.http_client = client.req
+        self.response_cache = ResponseCache(ttl=10)
+        self._http_client_stream = client.req_stream
+
+    def _get_foryou_page(self) -> str:
+        def fetch():
+            response = self.http_client.get(f"{self.BASE_URL}/foryou")
+            response.raise_for_status()
+            return response.text
+
+        return self.response_cache.get_or_fetch(("foryou",), fetch, ttl=60)
+
+    def _get_room_info(self, room_id) -> dict:
+        """
+        Returns /webcast/room/info/ for a room. The response is shared for a
+        few seconds, so resolving the username and the live url of the same
+        room costs a single request.
+        """
+        return self.response_cache.get_or_fetch(
+            ("room_info", str(room_id)),
+            lambda: self.http_client.get(
+                f"{self.WEBCAST_URL}/webcast/room/info/?aid=1988&room_id={room_id}",
+                priority=Priority.LIVE_CONFIRMATION,
+            ).json(),
+        )
+
+    def _is_authenticated(self) -> bool:
+        content = self._get_foryou_page()
         return "login-title" not in content
 
     def is_country_blacklisted(self) -> bool:
@@ -44,25 +93,49 @@ class TikTokAPI:
         if not room_id:
             raise UserLiveError(TikTokError.USER_NOT_CURRENTLY_LIVE)
 
-        data = self.http_client.get(
-            f"{self.WEBCAST_URL}/webcast/room/check_alive/"
-            f"?aid=1988&region=CH&room_ids={room_id}&user_is_login=true"
-        ).json()
+        return self.is_rooms_alive([room_id]).get(str(room_id), False)
 
-        if "data" not in data or len(data["data"]) == 0:
-            return False
-
-        return data["data"][0].get("alive", False)
+    def is_rooms_alive(self, room_ids) -> dict:
+        """
+        Checks many rooms at once, sending up to CHECK_ALIVE_BATCH_SIZE
+        room_ids per check_alive request. Returns room_id -> alive.
+        """
+        room_ids = list(dict.fromkeys(str(r) for r in room_ids if r))
+        alive = dict.fromkeys(room_ids, False)
+
+        for i in range(0, len(room_ids), self.CHECK_ALIVE_BATCH_SIZE):
+            batch = room_ids[i : i + self.CHECK_ALIVE_BATCH_SIZE]
+
+            data = self.http_client.get(
+                f"{self.WEBCAST_URL}/webcast/room/check_alive/",
+                params={
+                    "aid": "1988",
+                    "region": "CH",
+                    "room_ids": ",".join(batch),
+                    "user_is_login": "true",
+                },
+                priority=Priority.LIVE_CONFIRMATION,
+            ).json()
+
+            for entry in data.get("data") or []:
+                room_id = str(entry.get("room_id_str") or entry.get("room_id", ""))
+                if room_id in alive:
+                    alive[room_id] = entry.get("alive", False)
+
+        return alive
 
     def get_sec_uid(self):
         """
         Returns the sec_uid of the authenticated user.
         """
-        response = self.http_client.get(f"{self.BASE_URL}/foryou")
+        sec_uid = self.follow_list_cache.get_sec_uid()
+        if sec_uid:
+            return sec_uid
 
-        sec_uid = re.search('"secUid":"(.*?)",', response.text)
+        sec_uid = re.search('"secUid":"(.*?)",', self._get_foryou_page())
         if sec_uid:
             sec_uid = sec_uid.group(1)
+            self.follow_list_cache.set_sec_uid(sec_uid)
 
         return sec_uid
 
@@ -70,9 +143,7 @@ class TikTokAPI:
         """
         Given a room_id, I get the username
         """
-        data = self.http_client.get(
-            f"{self.WEBCAST_URL}/webcast/room/info/?aid=1988&room_id={room_id}"
-        ).json()
+        data = self._get_room_info(room_id)
 
         if "Follow the creator to watch their LIVE" in json.dumps(data):
             raise UserLiveError(TikTokError.ACCOUNT_PRIVATE_FOLLOW)
@@ -132,7 +203,7 @@ class TikTokAPI:
 
         return room_id
 
-    def _tikrec_get_room_id_signed_url(self, user: str) -> str:
+    def _tikrec_get_room_id_signed_path(self, user: str) -> str:
         response = self.http_client.get(
             f"{self.TIKREC_API}/tiktok/room/api/sign",
             params={"unique_id": user},
@@ -140,29 +211,116 @@ class TikTokAPI:
 
         data = response.json()
 
-        signed_path = data.get("signed_path")
-        return f"{self.BASE_URL}{signed_path}"
+        return data.get("signed_path")
 
-    def get_room_id_from_user(self, user: str) -> str | None:
-        """Given a username, get the room_id."""
-        signed_url = self._tikrec_get_room_id_signed_url(user)
-
-        response = self.http_client.get(signed_url)
+    def _fetch_user_room_data(self, signed_path: str) -> dict:
+        response = self.http_client.get(f"{self.BASE_URL}{signed_path}")
         content = response.text
 
         if not content or "Please wait" in content:
             raise UserLiveError(TikTokError.WAF_BLOCKED)
 
-        data = response.json()
-        return (data.get("data") or {}).get("user", {}).get("roomId")
+        return response.json()
+
+    def get_room_id_from_user(self, user: str, max_age: float = 0) -> str | None:
+        """
+        Given a username, get the room_id. A cached "no room" answer is
+        reused for max_age seconds (see RoomIdCache.get_room_id).
+        """
+        hit, room_id = self.room_id_cache.get_room_id(user, max_age)
+        if hit:
+            return room_id
+
+        # Reuse a cached signed path first to skip the tikrec round-trip
+        signed_path = self.room_id_cache.get_signed_path(user)
+        if signed_path:
+            try:
+                data = self.room_api_breaker.call(
+                    self._fetch_user_room_data, signed_path
+                )
+            except (UserLiveError, ValueError):
+                data = {}
+
+            if "data" in data:
+                user_data = (data["data"] or {}).get("user")
+                room_id = (user_data or {}).get("roomId")
+                self.room_id_cache.set_room_id(user, room_id, missing=user_data is None)
+                return room_id
+
+        signed_path = self.tikrec_breaker.call(
+            self._tikrec_get_room_id_signed_path, user
+        )
+        data = self.room_api_breaker.call(self._fetch_user_room_data, signed_path)
+
+        user_data = (data.get("data") or {}).get("user")
+        room_id = (user_data or {}).get("roomId")
+        self.room_id_cache.set_room_id(
+            user, room_id, signed_path, missing="data" in data and user_data is None
+        )
+
+        return room_id
+
+    def get_following_live(self) -> dict:
+        """
+        Returns followed user -> room_id for every followed account that
+        is live right now, from the authenticated following live feed.
+        """
+        live = {}
+        max_time = 0
+
+        for _ in range(self.FOLLOWING_FEED_MAX_PAGES):
+            response = self.http_client.get(
+                f"{self.WEBCAST_URL}/webcast/feed/",
+                params={
+                    "aid": "1988",
+                    "app_name": "tiktok_web",
+                    "channel": "tiktok_web",
+                    "channel_id": "86",
+                    "content_type": "0",
+                    "device_platform": "web_pc",
+                    "req_from": "pc_web_following_list",
+                    "count": "50",
+                    "max_time": str(max_time),
+                    "user_is_login": "true",
+                },
+            )
+
+            if response.status_code != StatusCode.OK:
+                raise TikTokRecorderError("Failed to retrieve following live feed.")
+
+            data = response.json()
+            if "data" not in data or data.get("status_code", 0) != 0:
+                raise TikTokRecorderError(
+                    f"Following live feed error: {data.get('status_code')}"
+                )
+
+            for item in data.get("data") or []:
+                room = item.get("data") or {}
+                username = room.get("owner", {}).get("display_id")
+                room_id = room.get("id_str") or room.get("id")
+
+                # 2 = live
+                if username and room_id and room.get("status", 2) == 2:
+                    live[username] = str(room_id)
+
+            extra = data.get("extra") or {}
+            if not extra.get("has_more") or not extra.get("max_time"):
+                break
+
+            max_time = extra["max_time"]
+
+        return live
 
     def get_followers_list(self, sec_uid) -> list:
         """
         Returns all followers for the authenticated user by paginating
         """
-        followers = []
-        cursor = 0
-        has_more = True
+        return list(self.get_followers_room_ids(sec_uid))
+
+    def _get_ms_token(self) -> str:
+        ms_token = self.follow_list_cache.get_ms_token()
+        if ms_token:
+            return ms_token
 
         ms_token = self.http_client.get(
             f"{self.BASE_URL}/api/user/list/?"
@@ -180,13 +338,28 @@ class TikTokAPI:
             "msToken=GphHoLvRR4QxA5AWVwDkrs3AbumoK5H8toE8LVHtj6cce3ToGdXhMfvDWzOXG-0GXUWoaGVHrwGNA4k_NnjuFFnHgv2S5eMjsvtkAhwMPa13xLmvP7tumx0KreFjPwTNnOj-BvAkPdO5Zrev3hoFBD9lHVo=&X-Bogus=&X-Gnarly="
         ).cookies["msToken"]
 
+        self.follow_list_cache.set_ms_token(ms_token)
+        return ms_token
+
+    def get_followers_room_ids(self, sec_uid) -> dict:
+        """
+        Returns follower -> room_id for the authenticated user, from every
+        page of the follow list (room_id is None for followers without a
+        room). The msToken is reused across sweeps until it expires.
+        """
+        followers = {}
+        cursor = 0
+        has_more = True
+
+        ms_token = self._get_ms_token()
+
         while has_more:
             url = (
                 "https://www.tiktok.com/api/user/list/?"
                 "WebIdLastTime=1747672102&aid=1988&app_language=it-IT&app_name=tiktok_web"
                 "&browser_language=it-IT&browser_name=Mozilla&browser_online=true"
                 "&browser_platform=Linux%20x86_64&browser_version=5.0%20%28X11%3B%20Linux%20x86_64%29%20AppleWebKit%2F537.36%20%28KHTML%2C%20like%20Gecko%29%20Chrome%2F140.0.0.0%20Safari%2F537.36&channel=tiktok_web&"
-                "cookie_enabled=true&count=5&data_collection_enabled=true&device_id=7506194516308166166"
+                f"cookie_enabled=true&count={self.FOLLOWERS_PAGE_SIZE}&data_collection_enabled=true&device_id=7506194516308166166"
                 "&device_platform=web_pc&focus_state=true&from_page=user&history_len=3&"
                 f"is_fullscreen=false&is_page_visible=true&maxCursor={cursor}&minCursor={cursor}&"
                 "odinId=7246312836442604570&os=linux&priority_region=IT&referer=&"
@@ -201,13 +374,17 @@ class TikTokAPI:
             if response.status_code != StatusCode.OK:
                 raise TikTokRecorderError("Failed to retrieve followers list.")
 
+            # TikTok rotates the msToken through cookies
+            ms_token = response.cookies.get("msToken") or ms_token
+            self.follow_list_cache.set_ms_token(ms_token)
+
             data = response.json()
             user_list = data.get("userList", [])
 
             for user in user_list:
                 username = user.get("user", {}).get("uniqueId")
                 if username:
-                    followers.append(username)
+                    followers[username] = user.get("user", {}).get("roomId") or None
 
             has_more = data.get("hasMore", False)
             new_cursor = data.get("minCursor", 0)
@@ -217,71 +394,52 @@ class TikTokAPI:
 
             cursor = new_cursor
 
+        self.follow_list_cache.save()
+
         if not followers:
             raise TikTokRecorderError("Followers list is empty.")
 
         return followers
 
-    def get_live_url(self, room_id: str) -> str | None:
+    def get_stream_catalog(self, room_id: str) -> StreamCatalog:
         """
-        Return the cdn (flv or m3u8) of the streaming
+        Return every stream variant (quality, protocol, main/backup cdn)
         """
-        data = self.http_client.get(
-            f"{self.WEBCAST_URL}/webcast/room/info/?aid=1988&room_id={room_id}"
-        ).json()
+        data = self._get_room_info(room_id)
 
         if "This account is private" in data:
             raise UserLiveError(TikTokError.ACCOUNT_PRIVATE)
 
         stream_url = data.get("data", {}).get("stream_url", {})
+        catalog = StreamCatalog.from_stream_url(stream_url)
 
-        sdk_data_str = (
-            stream_url.get("live_core_sdk_data", {})
-            .get("pull_data", {})
-            .get("stream_data")
-        )
-        if not sdk_data_str:
+        if not catalog.has_sdk_data:
             logger.warning(
                 "No SDK stream data found. Falling back to legacy URLs. Consider contacting the developer to update the code."
             )
-            return (
-                stream_url.get("flv_pull_url", {}).get("FULL_HD1")
-                or stream_url.get("flv_pull_url", {}).get("HD1")
-                or stream_url.get("flv_pull_url", {}).get("SD2")
-                or stream_url.get("flv_pull_url", {}).get("SD1")
-                or stream_url.get("rtmp_pull_url", "")
-            )
 
-        # Extract stream options
-        sdk_data = json.loads(sdk_data_str).get("data", {})
-        qualities = (
-            stream_url.get("live_core_sdk_data", {})
-            .get("pull_data", {})
-            .get("options", {})
-            .get("qualities", [])
-        )
-        if not qualities:
-            logger.warning("No qualities found in the stream data. Returning None.")
-            return None
-        level_map = {q["sdk_key"]: q["level"] for q in qualities}
-
-        best_level = -1
-        best_flv = None
-        for sdk_key, entry in sdk_data.items():
-            level = level_map.get(sdk_key, -1)
-            stream_main = entry.get("main", {})
-            if level > best_level:
-                best_level = level
-                best_flv = stream_main.get("flv")
-
-        if not best_flv and data.get("status_code") == 4003110:
+        if not catalog.best("flv") and data.get("status_code") == 4003110:
             raise UserLiveError(TikTokError.LIVE_RESTRICTION)
 
-        return best_flv
+        return catalog
 
-    def download_live_stream(self, live_url: str):
-        """Generator that returns the live stream for a given room_id."""
+    def get_live_url(self, room_id: str) -> str | None:
+        """
+        Return the cdn (flv or m3u8) of the streaming
+        """
+        catalog = self.get_stream_catalog(room_id)
+
+        best = catalog.best("flv") or catalog.best("rtmp")
+        return best.url if best else None
+
+    def download_live_stream(
+        self, live_url: str, read_size: int = STREAM_READ_SIZE, next_buffer=None
+    ):
+        """
+        Generator that returns the live stream for a given room_id, in
+        blocks of up to read_size bytes. Blocks are memoryviews of one
+        reused buffer (or of the buffers returned by next_buffer): write
+        each one out before asking for the next.
+        """
         stream = self._http_client_stream.get(live_url, stream=True)
-        for chunk in stream.iter_content(chunk_size=4096):
-            if chunk:
-                yield chunk
+        yield from iter_blocks(stream, read_size, next_buffer)
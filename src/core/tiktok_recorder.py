@@ -1,16 +1,30 @@
 import os
+import random
 import time
 from http.client import HTTPException
 from threading import Thread
 
 from requests import RequestException
 
+from core.recording_pipeline import QUEUE_BLOCKS, RecordingPipeline
 from core.tiktok_api import TikTokAPI
+from http_utils.circuit_breaker import Backoff, jittered
+from http_utils.stream_reader import STREAM_READ_SIZE
+from utils.flv import FlvStitcher
 from utils.logger_manager import logger
 from utils.video_management import VideoManagement
 from upload.telegram import Telegram
-from utils.custom_exceptions import LiveNotFound, UserLiveError, TikTokRecorderError
-from utils.enums import Mode, Error, TimeOut, TikTokError
+from utils.custom_exceptions import (
+    CircuitOpenError,
+    LiveNotFound,
+    UserLiveError,
+    TikTokRecorderError,
+)
+from utils.enums import Mode, Error, SpillPolicy, TimeOut, TikTokError
+
+
+# Longest wait between reconnection attempts that get no data (seconds)
+MAX_RECONNECT_DELAY = 30
 
 
 class TikTokRecorder:
@@ -26,6 +40,10 @@ class TikTokRecorder:
         output,
         duration,
         use_telegram,
+        read_size=STREAM_READ_SIZE,
+        queue_blocks=QUEUE_BLOCKS,
+        spill_policy=SpillPolicy.SPILL,
+        spill_dir=None,
     ):
         # Setup TikTok API client
         self.tiktok = TikTokAPI(proxy=proxy, cookies=cookies)
@@ -41,9 +59,22 @@ class TikTokRecorder:
         self.duration = duration
         self.output = output
 
+        # Bytes read from the stream per block
+        self.read_size = read_size
+
+        # Write queue between the stream and the disk, and what to do when it's full
+        self.queue_blocks = queue_blocks
+        self.spill_policy = spill_policy
+        self.spill_dir = spill_dir
+
         # Upload Settings
         self.use_telegram = use_telegram
 
+        # Retry delay after connection errors (decorrelated jitter)
+        self.backoff = Backoff(
+            TimeOut.ONE_MINUTE, TimeOut.MAX_BACKOFF * TimeOut.ONE_MINUTE
+        )
+
         # Check if the user's country is blacklisted
         self.check_country_blacklisted()
 
@@ -74,10 +105,6 @@ class TikTokRecorder:
                     + ("\n" if not self.tiktok.is_room_alive(self.room_id) else "")
                 )
 
-        # If proxy is provided, set up the HTTP client without the proxy
-        if proxy:
-            self.tiktok = TikTokAPI(proxy=None, cookies=cookies)
-
     def run(self):
         """
         runs the program in the selected mode.
@@ -97,11 +124,22 @@ class TikTokRecorder:
             self.manual_mode()
 
         elif self.mode == Mode.AUTOMATIC:
+            self.stagger_startup()
             self.automatic_mode()
 
         elif self.mode == Mode.FOLLOWERS:
+            self.stagger_startup()
             self.followers_mode()
 
+    def stagger_startup(self):
+        """
+        Waits a random part of a minute before the first poll, so instances
+        restarted together don't poll in lockstep.
+        """
+        delay = random.uniform(0, TimeOut.STARTUP_STAGGER * TimeOut.ONE_MINUTE)
+        logger.info(f"Starting in {delay:.0f} seconds\n")
+        time.sleep(delay)
+
     def manual_mode(self):
         if not self.tiktok.is_room_alive(self.room_id):
             raise UserLiveError(f"@{self.user}: {TikTokError.USER_NOT_CURRENTLY_LIVE}")
@@ -111,52 +149,66 @@ class TikTokRecorder:
     def automatic_mode(self):
         while True:
             try:
-                self.room_id = self.tiktok.get_room_id_from_user(self.user)
+                self.room_id = self.tiktok.get_room_id_from_user(
+                    self.user, self.automatic_interval * TimeOut.ONE_MINUTE / 2
+                )
                 self.manual_mode()
+                self.backoff.reset()
 
             except UserLiveError as ex:
-                logger.info(ex)
-                logger.info(
-                    f"Waiting {self.automatic_interval} minutes before recheck\n"
-                )
-                time.sleep(self.automatic_interval * TimeOut.ONE_MINUTE)
+                self.backoff.reset()
+                self.wait_interval(ex)
 
             except LiveNotFound as ex:
                 logger.error(f"Live not found: {ex}")
-                logger.info(
-                    f"Waiting {self.automatic_interval} minutes before recheck\n"
-                )
-                time.sleep(self.automatic_interval * TimeOut.ONE_MINUTE)
+                self.wait_interval()
+
+            except CircuitOpenError as ex:
+                logger.error(ex)
+                time.sleep(jittered(ex.retry_after))
 
             except ConnectionError:
-                logger.error(Error.CONNECTION_CLOSED_AUTOMATIC)
-                time.sleep(TimeOut.CONNECTION_CLOSED * TimeOut.ONE_MINUTE)
+                self.wait_backoff(Error.CONNECTION_CLOSED)
 
             except Exception as ex:
-                logger.error(f"Unexpected error: {ex}\n")
+                self.wait_backoff(f"Unexpected error: {ex}")
+
+    def wait_interval(self, message=None):
+        """
+        Waits the automatic interval, randomly spread so that many
+        instances drift apart instead of polling together.
+        """
+        if message:
+            logger.info(message)
+        logger.info(f"Waiting {self.automatic_interval} minutes before recheck\n")
+        time.sleep(jittered(self.automatic_interval * TimeOut.ONE_MINUTE))
+
+    def wait_backoff(self, message):
+        """
+        Waits a decorrelated jittered, exponentially growing delay after
+        an error.
+        """
+        delay = self.backoff.next()
+        logger.error(f"{message}. Retrying in {delay:.0f} seconds\n")
+        time.sleep(delay)
 
     def followers_mode(self):
-        active_recordings = {}  # follower -> Process
+        active_recordings = {}  # follower -> Thread
 
         while True:
             try:
-                followers = self.tiktok.get_followers_list(self.sec_uid)
+                for follower, thread in list(active_recordings.items()):
+                    if not thread.is_alive():
+                        logger.info(f"Recording of @{follower} finished.")
+                        del active_recordings[follower]
+
+                live_followers = self.get_live_followers()
 
-                for follower in followers:
+                for follower, room_id in live_followers.items():
                     if follower in active_recordings:
-                        if not active_recordings[follower].is_alive():
-                            logger.info(f"Recording of @{follower} finished.")
-                            del active_recordings[follower]
-                        else:
-                            continue
+                        continue
 
                     try:
-                        room_id = self.tiktok.get_room_id_from_user(follower)
-
-                        if not room_id or not self.tiktok.is_room_alive(room_id):
-                            # logger.info(f"@{follower} is not live. Skipping...")
-                            continue
-
                         logger.info(f"@{follower} is live. Starting recording...")
 
                         thread = Thread(
@@ -167,30 +219,51 @@ class TikTokRecorder:
                         thread.start()
                         active_recordings[follower] = thread
 
-                        time.sleep(2.5)
-
                     except Exception as e:
                         logger.error(f"Error while processing @{follower}: {e}")
                         continue
 
                 print()
-                delay = self.automatic_interval * TimeOut.ONE_MINUTE
-                logger.info(f"Waiting {delay} minutes for the next check...")
-                time.sleep(delay)
+                self.backoff.reset()
+                self.wait_interval()
 
             except UserLiveError as ex:
-                logger.info(ex)
-                logger.info(
-                    f"Waiting {self.automatic_interval} minutes before recheck\n"
-                )
-                time.sleep(self.automatic_interval * TimeOut.ONE_MINUTE)
+                self.wait_interval(ex)
+
+            except CircuitOpenError as ex:
+                logger.error(ex)
+                time.sleep(jittered(ex.retry_after))
 
             except ConnectionError:
-                logger.error(Error.CONNECTION_CLOSED_AUTOMATIC)
-                time.sleep(TimeOut.CONNECTION_CLOSED * TimeOut.ONE_MINUTE)
+                self.wait_backoff(Error.CONNECTION_CLOSED)
 
             except Exception as ex:
-                logger.error(f"Unexpected error: {ex}\n")
+                self.wait_backoff(f"Unexpected error: {ex}")
+
+    def get_live_followers(self) -> dict:
+        """
+        Returns follower -> room_id for the followed users that are live.
+
+        Asks the following live feed first (one or two requests whatever
+        the follow count) and falls back to probing the follow list.
+        """
+        try:
+            return self.tiktok.get_following_live()
+        except Exception as ex:
+            logger.error(f"Following live feed unavailable ({ex}), probing followers")
+
+        followers = self.tiktok.get_followers_room_ids(self.sec_uid)
+        candidates = {
+            follower: room_id for follower, room_id in followers.items() if room_id
+        }
+
+        alive = self.tiktok.is_rooms_alive(candidates.values())
+
+        return {
+            follower: room_id
+            for follower, room_id in candidates.items()
+            if alive.get(str(room_id))
+        }
 
     def start_recording(self, user, room_id):
         """
@@ -216,26 +289,59 @@ class TikTokRecorder:
         else:
             logger.info("Started recording...")
 
-        buffer_size = 512 * 1024  # 512 KB buffer
-        buffer = bytearray()
+        outputs = [output]
+
+        def open_part(index):
+            """Next part of the recording, after a change of video parameters."""
+            path = output.replace("_flv.mp4", f"_part{index + 1}_flv.mp4")
+            logger.info(f"Video parameters changed, recording part {index + 1}: {path}")
+            outputs.append(path)
+            return open(path, "wb")
 
         logger.info("[PRESS CTRL + C ONCE TO STOP]")
         with open(output, "wb") as out_file:
+            # Disk writes happen in their own thread, never stalling the read
+            pipeline = RecordingPipeline(
+                out_file,
+                self.read_size,
+                self.queue_blocks,
+                self.spill_policy,
+                self.spill_dir,
+                open_part,
+            )
+            pipeline.start()
+
+            # Reconnections continue the same FLV (one header, rebased timestamps),
+            # new video parameters start a new part at their keyframe
+            stitcher = FlvStitcher()
+            reconnect_backoff = Backoff(1, MAX_RECONNECT_DELAY)
+            last_data_at = None
+
+            start_time = time.time()
             stop_recording = False
             while not stop_recording:
+                connected = False
                 try:
                     if not self.tiktok.is_room_alive(room_id):
                         logger.info("User is no longer live. Stopping recording.")
                         break
 
-                    start_time = time.time()
-                    for chunk in self.tiktok.download_live_stream(live_url):
-                        buffer.extend(chunk)
-                        if len(buffer) >= buffer_size:
-                            out_file.write(buffer)
-                            buffer.clear()
-
-                        elapsed_time = time.time() - start_time
+                    stitcher.new_connection()
+                    for block in self.tiktok.download_live_stream(
+                        live_url, self.read_size, pipeline.next_buffer
+                    ):
+                        if not connected:
+                            connected = True
+                            reconnect_backoff.reset()
+                            if last_data_at is not None:
+                                logger.info(
+                                    f"Reconnected after a {time.time() - last_data_at:.1f}s gap"
+                                )
+
+                        pipeline.put(block, stitcher.feed(block))
+                        last_data_at = time.time()
+
+                        elapsed_time = last_data_at - start_time
                         if self.duration and elapsed_time >= self.duration:
                             stop_recording = True
                             break
@@ -246,7 +352,9 @@ class TikTokRecorder:
                         time.sleep(TimeOut.CONNECTION_CLOSED * TimeOut.ONE_MINUTE)
 
                 except (RequestException, HTTPException):
-                    time.sleep(2)
+                    # Reconnect at once, backing off only while attempts get no data
+                    if not connected:
+                        time.sleep(reconnect_backoff.next())
 
                 except KeyboardInterrupt:
                     logger.info("Recording stopped by user.")
@@ -256,17 +364,15 @@ class TikTokRecorder:
                     logger.error(f"Unexpected error: {ex}\n")
                     stop_recording = True
 
-                finally:
-                    if buffer:
-                        out_file.write(buffer)
-                        buffer.clear()
-                    out_file.flush()
+            pipeline.close()
 
-        logger.info(f"Recording finished: {output}\n")
-        VideoManagement.convert_flv_to_mp4(output)
+        self.tiktok.room_id_cache.invalidate(user)
+        for path in outputs:
+            logger.info(f"Recording finished: {path}\n")
+            VideoManagement.convert_flv_to_mp4(path)
 
-        if self.use_telegram:
-            Telegram().upload(output.replace("_flv.mp4", ".mp4"))
+            if self.use_telegram:
+                Telegram().upload(path.replace("_flv.mp4", ".mp4"))
 
     def check_country_blacklisted(self):
         is_blacklisted = self.tiktok.is_country_blacklisted()
@@ -0,0 +1,197 @@
+"""
+Circuit Breaker for TikTok Live Recorder.
+
+When TikTok's WAF starts answering "Please wait", retrying on a fixed
+schedule only prolongs the block, and instances restarted together keep
+retrying in lockstep. A CircuitBreaker per endpoint stops calling it after
+repeated blocks or connection errors (open), then lets a single probe
+request through after a jittered delay (half-open) and closes again once
+the probe succeeds.
+
+Delays use decorrelated jittered exponential backoff, so instances that
+failed at the same moment drift apart instead of retrying in waves.
+"""
+
+import random
+import threading
+import time
+from typing import Dict
+
+from utils.custom_exceptions import CircuitOpenError
+from utils.enums import TikTokError
+
+
+# Consecutive failures that open the circuit
+FAILURE_THRESHOLD = 3
+
+# First delay before a probe request (seconds)
+RESET_TIMEOUT = 30
+
+# Longest delay before a probe request (seconds)
+MAX_RESET_TIMEOUT = 1800
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def is_block_or_connection_error(ex: BaseException) -> bool:
+    """True for WAF blocks and network errors, which should trip a breaker."""
+    return isinstance(ex, OSError) or str(TikTokError.WAF_BLOCKED) in str(ex)
+
+
+class Backoff:
+    """
+    Decorrelated jittered exponential backoff: each delay is drawn
+    uniformly between base and three times the previous delay, capped.
+    """
+
+    def __init__(self, base: float, cap: float):
+        self.base = base
+        self.cap = cap
+        self._delay = base
+
+    def next(self) -> float:
+        """Return the next delay (seconds)."""
+        self._delay = min(self.cap, random.uniform(self.base, self._delay * 3))
+        return self._delay
+
+    def reset(self) -> None:
+        """Start again from the base delay (after a success)."""
+        self._delay = self.base
+
+
+def jittered(seconds: float, spread: float = 0.1) -> float:
+    """Return seconds randomly spread by +/- spread, to break lockstep polling."""
+    return seconds * random.uniform(1 - spread, 1 + spread)
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker guarding a single endpoint.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        max_reset_timeout: float = MAX_RESET_TIMEOUT,
+    ):
+        """
+        Initialize the breaker (closed).
+
+        Args:
+            name: Endpoint name, used in messages
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: First delay before a probe request
+            max_reset_timeout: Longest delay before a probe request
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.backoff = Backoff(reset_timeout, max_reset_timeout)
+
+        self.state = CLOSED
+        self.failures = 0
+        self._open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> float:
+        """Seconds until a probe request will be allowed (0 if allowed now)."""
+        with self._lock:
+            if self.state == CLOSED:
+                return 0
+            return max(0.0, self._open_until - time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        True if a request may be sent. Once the open delay has elapsed,
+        exactly one caller gets through as the half-open probe.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            if self._probing or time.monotonic() < self._open_until:
+                return False
+
+            self.state = HALF_OPEN
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != CLOSED:
+                print(f"[*] [CircuitBreaker] {self.name}: recovered, circuit closed")
+            self.state = CLOSED
+            self.failures = 0
+            self._probing = False
+            self.backoff.reset()
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                delay = self.backoff.next()
+                self.state = OPEN
+                self._open_until = time.monotonic() + delay
+                print(
+                    f"[!] [CircuitBreaker] {self.name}: circuit open, next probe in {delay:.0f}s"
+                )
+
+    def call(self, fn, *args, is_failure=is_block_or_connection_error, **kwargs):
+        """
+        Call fn through the breaker.
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as ex:
+            if is_failure(ex):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+
+        self.record_success()
+        return result
+
+    async def call_async(
+        self, fn, *args, is_failure=is_block_or_connection_error, **kwargs
+    ):
+        """Await fn through the breaker (see call)."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+
+        try:
+            result = await fn(*args, **kwargs)
+        except Exception as ex:
+            if is_failure(ex):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+
+        self.record_success()
+        return result
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, **kwargs) -> CircuitBreaker:
+    """Return the process-wide breaker of an endpoint, creating it if needed."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name, **kwargs)
+        return breaker
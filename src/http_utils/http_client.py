@@ -1,57 +1,82 @@
+import hashlib
+
 import requests
 
+from http_utils.proxy_pool import ProxyPool, parse_proxies
+from http_utils.rate_limiter import RateLimiter, RateLimitedSession
+from http_utils.transport import Transport
 from utils.enums import StatusCode
 from utils.logger_manager import logger
-from utils.utils import is_termux
+
+
+DEFAULT_HEADERS = {
+    "Sec-Ch-Ua": '"Not/A)Brand";v="8", "Chromium";v="126"',
+    "Sec-Ch-Ua-Mobile": "?0",
+    "Sec-Ch-Ua-Platform": '"Windows"',
+    "Accept-Language": "en-US",
+    "Upgrade-Insecure-Requests": "1",
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.6478.127 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,application/json,text/plain,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
+    "Sec-Fetch-Site": "none",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-User": "?1",
+    "Sec-Fetch-Dest": "document",
+    "Priority": "u=0, i",
+    "Referer": "https://www.tiktok.com/",
+    "Origin": "https://www.tiktok.com",
+}
 
 
 class HttpClient:
-    def __init__(self, proxy=None, cookies=None):
+    def __init__(self, proxy=None, cookies=None, rate_limiter=None, http2=False):
         self.req = None
         self.req_stream = requests
 
-        self.proxy = proxy
+        # One proxy, or several (list or comma-separated) for a ProxyPool
+        self.proxies = parse_proxies(proxy)
+        self.proxy = self.proxies[0] if len(self.proxies) == 1 else None
         self.cookies = cookies
-        self.headers = {
-            "Sec-Ch-Ua": '"Not/A)Brand";v="8", "Chromium";v="126"',
-            "Sec-Ch-Ua-Mobile": "?0",
-            "Sec-Ch-Ua-Platform": '"Windows"',
-            "Accept-Language": "en-US",
-            "Upgrade-Insecure-Requests": "1",
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.6478.127 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,application/json,text/plain,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7",
-            "Sec-Fetch-Site": "none",
-            "Sec-Fetch-Mode": "navigate",
-            "Sec-Fetch-User": "?1",
-            "Sec-Fetch-Dest": "document",
-            "Priority": "u=0, i",
-            "Referer": "https://www.tiktok.com/",
-            "Origin": "https://www.tiktok.com",
-        }
+        self.headers = dict(DEFAULT_HEADERS)
+        self.http2 = http2
+
+        # API requests of every process share per-host token buckets
+        self.rate_limiter = rate_limiter or RateLimiter()
 
         self.configure_session()
 
+    def new_session(self, proxy=None):
+        """
+        Returns a new keep-alive API transport with the default headers
+        and cookies.
+        """
+        return Transport(
+            headers=self.headers,
+            cookies=self.cookies,
+            proxy=proxy,
+            http2=self.http2,
+        )
+
     def configure_session(self) -> None:
+        # Streams are always downloaded over a direct connection
         self.req_stream = requests.Session()
-
-        if is_termux():
-            self.req = self.req_stream
-        else:
-            from curl_cffi import Session, CurlSslVersion, CurlOpt
-
-            self.req = Session(
-                impersonate="chrome136",
-                http_version="v1",
-                curl_options={CurlOpt.SSLVERSION: CurlSslVersion.TLSv1_2},
-            )
-
-        self.req.headers.update(self.headers)
         self.req_stream.headers.update(self.headers)
-
         if self.cookies is not None:
-            self.req.cookies.update(self.cookies)
             self.req_stream.cookies.update(self.cookies)
 
+        if len(self.proxies) > 1:
+            # One warm session, and one rate limit bucket, per egress proxy
+            sessions = {}
+            for proxy in self.proxies:
+                session = self.new_session(proxy)
+                scope = hashlib.sha1(proxy.encode()).hexdigest()[:8]
+                sessions[proxy] = RateLimitedSession(session, self.rate_limiter, scope)
+
+            self.req = ProxyPool(sessions)
+            self.req.check()
+            return
+
+        self.req = RateLimitedSession(self.new_session(), self.rate_limiter)
+
         self.check_proxy()
 
     def check_proxy(self) -> None:
@@ -64,5 +89,5 @@ class HttpClient:
         response = requests.get("https://ifconfig.me/ip", proxies=proxies, timeout=10)
 
         if response.status_code == StatusCode.OK:
-            self.req.proxies.update(proxies)
+            self.req.set_proxy(self.proxy)
             logger.info("Proxy set up successfully")
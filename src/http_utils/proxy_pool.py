@@ -0,0 +1,184 @@
+"""
+Proxy Pool for TikTok Live Recorder.
+
+Spreads API requests across several egress proxies. Each proxy keeps its
+own warm keep-alive session and a health record (latency, error rate,
+WAF blocks); requests go to the healthier of two randomly picked proxies
+and proxies that get blocked or keep failing are benched for a jittered,
+growing cooldown.
+
+Only API requests go through the pool: live streams are downloaded over
+a direct connection (HttpClient.req_stream).
+"""
+
+import random
+import threading
+import time
+from typing import Dict, List
+
+from http_utils.circuit_breaker import Backoff
+from utils.logger_manager import logger
+
+
+# Weight of the newest sample in the latency / error averages
+EWMA_ALPHA = 0.2
+
+# Cooldown after a WAF block (seconds), growing on repeated blocks
+BLOCK_COOLDOWN = 300
+MAX_BLOCK_COOLDOWN = 3600
+
+# Consecutive errors that bench a proxy, and for how long (seconds)
+MAX_CONSECUTIVE_ERRORS = 3
+ERROR_COOLDOWN = 60
+
+# HTTP statuses that mean the egress IP is being throttled or blocked
+BLOCK_STATUS_CODES = (403, 429)
+
+
+def parse_proxies(proxy) -> List[str]:
+    """Accept None, one proxy, a comma-separated string or a list."""
+    if not proxy:
+        return []
+    if isinstance(proxy, str):
+        proxy = proxy.split(",")
+    return list(dict.fromkeys(p.strip() for p in proxy if p and p.strip()))
+
+
+class ProxyHealth:
+    """Health record of one proxy."""
+
+    def __init__(self):
+        self.latency = None  # EWMA, seconds
+        self.error_rate = 0.0  # EWMA of failed requests
+        self.consecutive_errors = 0
+        self.blocks = 0
+        self.cooldown_until = 0.0
+        self.block_backoff = Backoff(BLOCK_COOLDOWN, MAX_BLOCK_COOLDOWN)
+
+    def score(self) -> float:
+        """Lower is better."""
+        latency = 1.0 if self.latency is None else self.latency
+        return latency * (1 + 4 * self.error_rate)
+
+    def record_success(self, latency: float) -> None:
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += EWMA_ALPHA * (latency - self.latency)
+        self.error_rate *= 1 - EWMA_ALPHA
+        self.consecutive_errors = 0
+        self.block_backoff.reset()
+
+    def record_error(self) -> None:
+        self.error_rate += EWMA_ALPHA * (1 - self.error_rate)
+        self.consecutive_errors += 1
+        if self.consecutive_errors >= MAX_CONSECUTIVE_ERRORS:
+            self.cooldown_until = time.monotonic() + ERROR_COOLDOWN
+
+    def record_block(self) -> None:
+        self.error_rate += EWMA_ALPHA * (1 - self.error_rate)
+        self.blocks += 1
+        self.cooldown_until = time.monotonic() + self.block_backoff.next()
+
+
+class ProxyPool:
+    """
+    Session-like object (get/post/request) that rotates requests across
+    healthy proxies, one warm session per proxy.
+    """
+
+    def __init__(self, sessions: Dict[str, object]):
+        """
+        Initialize the pool.
+
+        Args:
+            sessions: proxy -> session already configured for that proxy
+        """
+        self.sessions = sessions
+        self.health = {proxy: ProxyHealth() for proxy in sessions}
+        self._lock = threading.Lock()
+
+    def pick(self) -> str:
+        """
+        Pick the healthier of two random proxies out of cooldown. If every
+        proxy is benched, the one whose cooldown ends first is used.
+        """
+        now = time.monotonic()
+        with self._lock:
+            healthy = [p for p, h in self.health.items() if h.cooldown_until <= now]
+            if not healthy:
+                return min(self.health, key=lambda p: self.health[p].cooldown_until)
+
+            candidates = random.sample(healthy, min(2, len(healthy)))
+            return min(candidates, key=lambda p: self.health[p].score())
+
+    def request(self, method, url, **kwargs):
+        proxy = self.pick()
+        health = self.health[proxy]
+
+        start = time.monotonic()
+        try:
+            response = self.sessions[proxy].request(method, url, **kwargs)
+        except Exception:
+            with self._lock:
+                health.record_error()
+            raise
+
+        blocked = response.status_code in BLOCK_STATUS_CODES or (
+            not kwargs.get("stream") and "Please wait" in (response.text or "")[:512]
+        )
+        with self._lock:
+            if blocked:
+                health.record_block()
+            else:
+                health.record_success(time.monotonic() - start)
+
+        if blocked:
+            logger.warning(f"Proxy {proxy} blocked, benched for a while")
+
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def check(self, url: str = "https://ifconfig.me/ip") -> None:
+        """
+        Probe every proxy once; unreachable ones start benched.
+        """
+        for proxy, session in self.sessions.items():
+            logger.info(f"Testing {proxy}...")
+            try:
+                start = time.monotonic()
+                response = session.get(url, timeout=10)
+                ok = response.status_code == 200
+            except Exception:
+                ok = False
+
+            with self._lock:
+                if ok:
+                    self.health[proxy].record_success(time.monotonic() - start)
+                else:
+                    self.health[proxy].cooldown_until = (
+                        time.monotonic() + ERROR_COOLDOWN
+                    )
+
+            logger.info(
+                f"Proxy {proxy} " + ("is working" if ok else "is unreachable, benched")
+            )
+
+    def stats(self) -> Dict[str, dict]:
+        """Health of every proxy, for logging."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                proxy: {
+                    "latency": health.latency,
+                    "error_rate": round(health.error_rate, 3),
+                    "blocks": health.blocks,
+                    "benched_for": max(0, round(health.cooldown_until - now)),
+                }
+                for proxy, health in self.health.items()
+            }
@@ -0,0 +1,203 @@
+"""
+Rate Limiter for TikTok Live Recorder.
+
+Every recorder process polls tikrec.com, www.tiktok.com and
+webcast.tiktok.com. Without coordination the combined rate trips the
+TikTok WAF and every process gets blocked at once. This module keeps one
+token bucket per host, shared by all processes through a SQLite database
+in the status directory (BEGIN IMMEDIATE serializes the updates across
+processes).
+
+A share of each bucket is reserved for go-live confirmations, so a
+recording never waits behind routine polls.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from utils.enums import Priority
+
+
+# Default status directory (same as status_manager.py)
+DEFAULT_STATUS_DIR = ".tiktok_status"
+
+STATE_FILENAME = "rate_limits.sqlite3"
+
+# host -> (requests per minute, burst). Hosts not listed (e.g. stream CDNs)
+# are not limited.
+HOST_LIMITS = {
+    "tikrec.com": (30, 5),
+    "www.tiktok.com": (60, 10),
+    "webcast.tiktok.com": (120, 20),
+}
+
+# Share of each bucket that only go-live confirmations may use
+PRIORITY_RESERVE = 0.25
+
+
+class RateLimiter:
+    """
+    Per-host token buckets shared across processes.
+
+    All failures are swallowed and let the request through: the limiter
+    must never stop the recorder from talking to TikTok.
+    """
+
+    def __init__(
+        self,
+        status_dir: str = DEFAULT_STATUS_DIR,
+        limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        reserve: float = PRIORITY_RESERVE,
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            status_dir: Directory holding the shared state database
+            limits: host -> (requests per minute, burst)
+            reserve: Share of each bucket reserved for go-live confirmations
+        """
+        self.path = os.path.join(status_dir, STATE_FILENAME)
+        self.limits = dict(HOST_LIMITS if limits is None else limits)
+        self.reserve = reserve
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        try:
+            os.makedirs(status_dir, exist_ok=True)
+            self._conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None, check_same_thread=False
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                " host TEXT PRIMARY KEY,"
+                " tokens REAL NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+        except sqlite3.Error as e:
+            print(f"[RateLimiter] Warning: rate limiting disabled: {e}")
+            self._conn = None
+
+    def _limit_for(self, url: str):
+        """Return (host, (rpm, burst)) for the url, or (None, None) if unlimited."""
+        host = (urlparse(url).hostname or "").lower()
+        for limited_host, limit in self.limits.items():
+            if host == limited_host or host.endswith("." + limited_host):
+                return limited_host, limit
+        return None, None
+
+    def try_acquire(
+        self,
+        url: str,
+        priority: Priority = Priority.ROUTINE,
+        scope: Optional[str] = None,
+    ) -> float:
+        """
+        Take a token for the host of url if one is available.
+        With a scope (e.g. the egress proxy) the host gets a separate
+        bucket per scope.
+
+        Returns:
+            0 if the request may go now, else the seconds to wait before
+            trying again.
+        """
+        host, limit = self._limit_for(url)
+        if host is None or self._conn is None:
+            return 0
+
+        if scope:
+            host = f"{host}|{scope}"
+
+        requests_per_minute, burst = limit
+        rate = requests_per_minute / 60
+        # Routine polls leave the reserved share of the bucket untouched
+        needed = (
+            1 if priority >= Priority.LIVE_CONFIRMATION else 1 + burst * self.reserve
+        )
+
+        try:
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    now = time.time()
+                    row = self._conn.execute(
+                        "SELECT tokens, updated_at FROM buckets WHERE host = ?", (host,)
+                    ).fetchone()
+                    tokens = (
+                        burst
+                        if row is None
+                        else min(burst, row[0] + (now - row[1]) * rate)
+                    )
+
+                    wait = 0 if tokens >= needed else (needed - tokens) / rate
+                    if not wait:
+                        tokens -= 1
+
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO buckets (host, tokens, updated_at) VALUES (?, ?, ?)",
+                        (host, tokens, now),
+                    )
+                finally:
+                    self._conn.execute("COMMIT")
+        except sqlite3.Error:
+            return 0  # Non-critical
+
+        return wait
+
+    def acquire(
+        self,
+        url: str,
+        priority: Priority = Priority.ROUTINE,
+        scope: Optional[str] = None,
+    ) -> None:
+        """Block until a request to url is allowed."""
+        wait = self.try_acquire(url, priority, scope)
+        while wait:
+            time.sleep(wait)
+            wait = self.try_acquire(url, priority, scope)
+
+    async def acquire_async(
+        self, url: str, priority: Priority = Priority.ROUTINE
+    ) -> None:
+        """
+        Wait (without blocking the event loop) until a request to url is
+        allowed. The SQLite update runs in a worker thread: under contention
+        from other processes it can wait for the database lock.
+        """
+        wait = await asyncio.to_thread(self.try_acquire, url, priority)
+        while wait:
+            await asyncio.sleep(wait)
+            wait = await asyncio.to_thread(self.try_acquire, url, priority)
+
+
+class RateLimitedSession:
+    """
+    Wraps a requests or curl_cffi session so that every request first
+    waits for its host's bucket. Other attributes (headers, cookies,
+    proxies, ...) are those of the wrapped session.
+    """
+
+    def __init__(self, session, rate_limiter: RateLimiter, scope: Optional[str] = None):
+        self.session = session
+        self.rate_limiter = rate_limiter
+        self.scope = scope
+
+    def request(self, method, url, priority: Priority = Priority.ROUTINE, **kwargs):
+        self.rate_limiter.acquire(url, priority, self.scope)
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, priority: Priority = Priority.ROUTINE, **kwargs):
+        return self.request("GET", url, priority, **kwargs)
+
+    def post(self, url, priority: Priority = Priority.ROUTINE, **kwargs):
+        return self.request("POST", url, priority, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
@@ -0,0 +1,65 @@
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    Short-lived, thread-safe memoization of API responses.
+
+    Concurrent callers asking for the same key share a single request
+    (single-flight): the first one fetches, the others wait for its result.
+    Errors are propagated to every waiter and never cached.
+    """
+
+    MAX_ENTRIES = 256
+
+    def __init__(self, ttl: float = 10):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (expires_at, value)
+        self._in_flight = {}  # key -> [Event, value, exception]
+
+    def get_or_fetch(self, key, fetch, ttl: float | None = None):
+        """
+        Returns the cached value for key, calling fetch() on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = [threading.Event(), None, None]
+                self._in_flight[key] = flight
+
+        if not leader:
+            flight[0].wait()
+            if flight[2] is not None:
+                raise flight[2]
+            return flight[1]
+
+        try:
+            flight[1] = fetch()
+        except BaseException as ex:
+            flight[2] = ex
+            raise
+        finally:
+            with self._lock:
+                if flight[2] is None:
+                    now = time.monotonic()
+                    if len(self._entries) >= self.MAX_ENTRIES:
+                        self._entries = {
+                            k: e for k, e in self._entries.items() if e[0] > now
+                        }
+                    expires_at = now + (self.ttl if ttl is None else ttl)
+                    self._entries[key] = (expires_at, flight[1])
+                del self._in_flight[key]
+            flight[0].set()
+
+        return flight[1]
+
+    def invalidate(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
@@ -0,0 +1,180 @@
+"""
+HTTP Transport for TikTok Live Recorder.
+
+One keep-alive transport for every API call made by TikTok and TikTokAPI:
+    - curl_cffi sessions (browser impersonation) reuse their connections;
+      with http2=True the webcast API is reached over HTTP/2, so
+      concurrent polls are multiplexed on a single connection
+    - DNS answers are cached for DNS_CACHE_TIMEOUT seconds
+    - new connections (TCP + TLS handshakes) and reused ones are counted,
+      so the savings can be checked in the logs
+
+On Termux (no curl_cffi) a pooled requests.Session is used instead.
+"""
+
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.logger_manager import logger
+from utils.utils import is_termux
+
+
+# How long resolved host names are reused (seconds)
+DNS_CACHE_TIMEOUT = 600
+
+# Hosts reached over HTTP/2 when it is enabled
+HTTP2_HOSTS = ("webcast.tiktok.com",)
+
+# Log the connection stats every N requests
+STATS_LOG_INTERVAL = 200
+
+
+class TransportStats:
+    """Thread-safe count of requests, new connections and reused ones."""
+
+    def __init__(self):
+        self.requests = 0
+        self.handshakes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def reused(self) -> int:
+        return self.requests - self.handshakes
+
+    def record(self, new_connections: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.handshakes += min(new_connections, 1)
+            should_log = self.requests % STATS_LOG_INTERVAL == 0
+
+        if should_log:
+            logger.info(self.summary())
+
+    def summary(self) -> str:
+        ratio = self.reused / self.requests * 100 if self.requests else 0
+        return (
+            f"API connections: {self.requests} requests, {self.handshakes} handshakes, "
+            f"{self.reused} reused ({ratio:.0f}%)"
+        )
+
+
+class Transport:
+    """
+    Session-like object (request/get/post) routing every request to a
+    pooled keep-alive session.
+    """
+
+    def __init__(
+        self, headers=None, cookies=None, proxy=None, http2=False, pool_size=10
+    ):
+        """
+        Initialize the transport.
+
+        Args:
+            headers: Default headers of every request
+            cookies: Cookies of every request
+            proxy: Proxy for every request
+            http2: Reach HTTP2_HOSTS over HTTP/2
+            pool_size: Connections kept alive (per thread)
+        """
+        self.stats = TransportStats()
+        self.curl = not is_termux()
+        self.http2 = http2 and self.curl
+
+        if self.curl:
+            from curl_cffi import CurlInfo
+
+            self._num_connects = CurlInfo.NUM_CONNECTS
+
+        self._http1 = self._new_session("v1", pool_size)
+        self._http2 = self._new_session("v2", pool_size) if self.http2 else None
+
+        self.update_headers(headers or {})
+        if cookies is not None:
+            self.update_cookies(cookies)
+        if proxy:
+            self.set_proxy(proxy)
+
+    def _new_session(self, http_version, pool_size):
+        if not self.curl:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            return session
+
+        from curl_cffi import Session, CurlInfo, CurlOpt, CurlSslVersion
+
+        return Session(
+            impersonate="chrome136",
+            http_version=http_version,
+            curl_options={
+                CurlOpt.SSLVERSION: CurlSslVersion.TLSv1_2,
+                CurlOpt.DNS_CACHE_TIMEOUT: DNS_CACHE_TIMEOUT,
+                CurlOpt.MAXCONNECTS: pool_size,
+            },
+            curl_infos=[CurlInfo.NUM_CONNECTS],
+        )
+
+    @property
+    def sessions(self) -> list:
+        return [s for s in (self._http1, self._http2) if s is not None]
+
+    @property
+    def headers(self):
+        return self._http1.headers
+
+    @property
+    def cookies(self):
+        return self._http1.cookies
+
+    def update_headers(self, headers: dict) -> None:
+        for session in self.sessions:
+            session.headers.update(headers)
+
+    def update_cookies(self, cookies: dict) -> None:
+        for session in self.sessions:
+            session.cookies.update(cookies)
+
+    def set_proxy(self, proxy: str) -> None:
+        for session in self.sessions:
+            session.proxies.update({"http": proxy, "https": proxy})
+
+    def _session_for(self, url):
+        if self._http2 is not None and urlparse(url).hostname in HTTP2_HOSTS:
+            return self._http2
+        return self._http1
+
+    def _open_connections(self, session) -> int:
+        """Connections opened so far by a requests.Session (urllib3 pools)."""
+        total = 0
+        for adapter in set(session.adapters.values()):
+            for pool in list(adapter.poolmanager.pools._container.values()):
+                total += pool.num_connections
+        return total
+
+    def request(self, method, url, **kwargs):
+        session = self._session_for(url)
+
+        if self.curl:
+            response = session.request(method, url, **kwargs)
+            self.stats.record(response.infos.get(self._num_connects, 1))
+            return response
+
+        opened = self._open_connections(session)
+        response = session.request(method, url, **kwargs)
+        self.stats.record(self._open_connections(session) - opened)
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        for session in self.sessions:
+            session.close()
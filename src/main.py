@@ -23,15 +23,64 @@ except ImportError:
 def main():
     parser = argparse.ArgumentParser(description="TikTok Live Recorder")
     
-    parser.add_argument("-user", required=True, help="TikTok Username")
+    parser.add_argument("-user", help="TikTok Username (comma-separated for several users)")
+    parser.add_argument("-users_file", help="File with one username per line; all users are monitored by one supervisor process")
     parser.add_argument("-mode", default="manual", help="manual or automatic")
     parser.add_argument("-output", default="./downloads", help="Output directory")
     parser.add_argument("-ffmpeg", default="ffmpeg", help="Path to ffmpeg (optional)")
     parser.add_argument("-automatic_interval", type=float, default=5.0, help="Time between checks in minutes (default: 5)")
+    parser.add_argument("-max_in_flight", type=int, default=20, help="Max concurrent API requests when monitoring several users (default: 20)")
+    parser.add_argument("-requests_per_minute", type=int, default=120, help="Global poll budget when monitoring several users (default: 120)")
+    parser.add_argument("-http2", action="store_true", help="Reach the webcast API over HTTP/2 (multiplexed polls)")
+    parser.add_argument("-ffmpeg_pool", type=int, default=None, help="Idle FFmpeg processes kept ready to record (0 disables, default: 1 in automatic or multi-user mode, 0 otherwise)")
+    parser.add_argument("-ffmpeg_pool_idle", type=float, default=30.0, help="Minutes before an idle FFmpeg process is replaced (default: 30)")
     parser.add_argument("-duration", type=int, default=None, help="Duration in seconds (not fully implemented yet)")
     
     args = parser.parse_args()
 
+    if not args.user and not args.users_file:
+        parser.error("one of -user or -users_file is required")
+
+    users = [u.lstrip("@").strip() for u in (args.user or "").split(",") if u.strip()]
+    if args.users_file:
+        from supervisor import read_users_file
+        users += read_users_file(args.users_file)
+
+    # The pool only pays off when the recorder waits for lives to start
+    if args.ffmpeg_pool is None:
+        monitoring = len(users) > 1 or args.users_file or args.mode == "automatic"
+        args.ffmpeg_pool = 1 if monitoring else 0
+
+    if len(users) > 1 or args.users_file:
+        # Supervisor mode: all users polled and recorded by this process
+        from supervisor import Supervisor
+
+        Supervisor(
+            users,
+            output=args.output,
+            ffmpeg=args.ffmpeg,
+            interval=args.automatic_interval,
+            max_in_flight=args.max_in_flight,
+            requests_per_minute=args.requests_per_minute,
+            http2=args.http2,
+            ffmpeg_pool_size=args.ffmpeg_pool,
+            ffmpeg_pool_idle=args.ffmpeg_pool_idle,
+        ).run()
+        return
+
+    # Pre-spawned FFmpeg workers, so a recording starts without waiting for FFmpeg
+    ffmpeg_pool = None
+    if args.ffmpeg_pool > 0:
+        try:
+            from utils.ffmpeg_pool import FfmpegPool
+            from utils.status_manager import DEFAULT_STATUS_DIR
+        except ImportError:
+            from src.utils.ffmpeg_pool import FfmpegPool
+            from src.utils.status_manager import DEFAULT_STATUS_DIR
+        ffmpeg_pool = FfmpegPool(args.output, args.ffmpeg, args.ffmpeg_pool, args.ffmpeg_pool_idle * 60,
+                                 thumbnail_dir=DEFAULT_STATUS_DIR)
+        ffmpeg_pool.start()
+
     # Create the bot instance
     # The 'run' method in src/tiktok.py already handles the smart recording logic
     bot = TikTok(
@@ -39,11 +88,17 @@ def main():
         mode=args.mode,
         user=args.user,
         ffmpeg=args.ffmpeg,
-        interval=args.automatic_interval
+        interval=args.automatic_interval,
+        http2=args.http2,
+        ffmpeg_pool=ffmpeg_pool
     )
     
     print(f"[*] Starting TikTok Recorder for {args.user} in {args.mode} mode...")
-    bot.run()
+    try:
+        bot.run()
+    finally:
+        if ffmpeg_pool:
+            ffmpeg_pool.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
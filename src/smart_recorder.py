@@ -13,197 +13,241 @@ try:
 except ImportError:
     HAS_MSVCRT = False
 
+from utils.ffmpeg_pool import LIVE_MP4_ARGS, FfmpegWorker, is_flv_url, thumbnail_args
 from utils.video_management import VideoManagement
 
-# Regex to catch resolution from FFprobe JSON output
-RESOLUTION_PATTERN = re.compile(r'"width"\s*:\s*(\d+).*?"height"\s*:\s*(\d+)', re.DOTALL)
+# Regex to catch the resolution from FFmpeg's stream info
+# e.g. "Stream #0:0: Video: h264 (High), yuv420p(progressive), 720x1280, 30 fps"
+RESOLUTION_PATTERN = re.compile(r'Stream #0:\d+.*?: Video: .*?, (\d{2,5})x(\d{2,5})')
+
+# Seconds without new FFmpeg output before failing over to the next URL
+STALL_TIMEOUT = 3
+
+# Seconds a freshly started FFmpeg may take to deliver its first data
+STARTUP_TIMEOUT = 10
+
+# Seconds of data an attempt must deliver to not count as a failed attempt
+HEALTHY_RUN = 10
 
 
 class ResolutionMonitor:
     """
-    Monitors a stream URL for resolution changes using ffprobe.
-    Runs in a separate thread and sets a flag when resolution changes.
+    Tracks the resolution of the stream being recorded and sets a flag when
+    it changes. Nothing is probed: resolutions are reported by the stream
+    reader feeding FFmpeg (the FLV video sequence headers) or, for streams
+    FFmpeg reads itself, by FFmpeg's own stream info.
     """
     
-    def __init__(self, stream_url, ffprobe_path="ffprobe", poll_interval=3, stability_threshold=2):
-        self.stream_url = stream_url
-        self.ffprobe_path = ffprobe_path
-        self.poll_interval = poll_interval
+    def __init__(self, stability_threshold=1):
         self.stability_threshold = stability_threshold  # Number of consistent readings required to confirm change
         
         self.current_resolution = None
         self.resolution_changed = threading.Event()
         self.new_resolution = None
-        self.stop_event = threading.Event()
-        self._thread = None
+        self._lock = threading.Lock()
         
         # Stability tracking
         self.pending_resolution = None
         self.consistency_count = 0
     
-    def get_stream_resolution(self):
+    def report(self, resolution):
         """
-        Uses ffprobe to get the current resolution of the stream.
-        Returns tuple (width, height) or None if failed.
+        Records a resolution seen in the stream (called from reader threads).
         """
-        cmd = [
-            self.ffprobe_path,
-            "-v", "error",
-            "-select_streams", "v:0",
-            "-show_entries", "stream=width,height",
-            "-of", "json",
-            "-timeout", "10000000",  # 10 second timeout in microseconds
-            self.stream_url
-        ]
-        
-        try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=15,
-                encoding="utf-8",
-                errors="replace"
-            )
+        with self._lock:
+            if self.resolution_changed.is_set():
+                return
             
-            if result.returncode == 0:
-                match = RESOLUTION_PATTERN.search(result.stdout)
-                if match:
-                    width = int(match.group(1))
-                    height = int(match.group(2))
-                    return (width, height)
-        except subprocess.TimeoutExpired:
-            pass
-        except Exception as e:
-            # Don't print every error to avoid spamming console
-            pass
-        
-        return None
-    
-    def _monitor_loop(self):
-        """
-        Main monitoring loop that runs in a thread.
-        Polls the stream resolution and checks for changes.
-        """
-        display_counter = 0
-        display_interval = 60 // self.poll_interval  # Show resolution roughly every minute
-        
-        while not self.stop_event.is_set():
-            resolution = self.get_stream_resolution()
+            if self.current_resolution is None:
+                # First detection - accept immediately
+                self.current_resolution = resolution
+                print(f"[*] Recording Resolution: {resolution[0]}x{resolution[1]}")
             
-            if resolution:
-                if self.current_resolution is None:
-                    # First detection - accept immediately
-                    self.current_resolution = resolution
-                    print(f"[*] Recording Resolution: {resolution[0]}x{resolution[1]}")
-                
-                elif resolution != self.current_resolution:
-                    # Potential change detected!
-                    if resolution == self.pending_resolution:
-                        self.consistency_count += 1
-                        print(f"[*] Verifying resolution change ({self.consistency_count}/{self.stability_threshold})...")
-                    else:
-                        # New potential change detected
-                        self.pending_resolution = resolution
-                        self.consistency_count = 1
-                    
-                    # If we have enough consistent readings, confirm the change
-                    if self.consistency_count >= self.stability_threshold:
-                        old_res = self.current_resolution
-                        self.new_resolution = resolution
-                        print(f"\n[!] Resolution Change Confirmed: {old_res[0]}x{old_res[1]} -> {resolution[0]}x{resolution[1]}")
-                        self.resolution_changed.set()
-                        return  # Exit the monitor loop
-                
+            elif resolution != self.current_resolution:
+                # Potential change detected!
+                if resolution == self.pending_resolution:
+                    self.consistency_count += 1
                 else:
-                    # Resolution matches current - reset consistency checks
-                    self.pending_resolution = None
-                    self.consistency_count = 0
-                    
-                    # Periodically display current resolution
-                    display_counter += 1
-                    if display_counter >= display_interval:
-                        print(f"[*] Current Resolution: {resolution[0]}x{resolution[1]} (Stable)")
-                        display_counter = 0
+                    # New potential change detected
+                    self.pending_resolution = resolution
+                    self.consistency_count = 1
+                
+                # If we have enough consistent readings, confirm the change
+                if self.consistency_count >= self.stability_threshold:
+                    old_res = self.current_resolution
+                    self.new_resolution = resolution
+                    print(f"\n[!] Resolution Change Confirmed: {old_res[0]}x{old_res[1]} -> {resolution[0]}x{resolution[1]}")
+                    self.resolution_changed.set()
             
-            # Wait for poll interval or until stopped
-            self.stop_event.wait(timeout=self.poll_interval)
-    
-    def start(self):
-        """Start the resolution monitoring thread."""
-        self._thread = threading.Thread(target=self._monitor_loop, daemon=True)
-        self._thread.start()
+            else:
+                # Resolution matches current - reset consistency checks
+                self.pending_resolution = None
+                self.consistency_count = 0
     
-    def stop(self):
-        """Stop the resolution monitoring thread."""
-        self.stop_event.set()
-        if self._thread and self._thread.is_alive():
-            self._thread.join(timeout=2)
+    def reset(self):
+        """Forget the current resolution (the next part may be another quality)."""
+        with self._lock:
+            self.current_resolution = None
+            self.pending_resolution = None
+            self.consistency_count = 0
     
     def has_changed(self):
         """Check if resolution has changed."""
         return self.resolution_changed.is_set()
 
 
-def record_stream(stream_url, output_file, ffmpeg_path="ffmpeg", status_manager=None):
+def stop_ffmpeg(process):
+    """
+    Stops FFmpeg gracefully by sending 'q' so the output can be finalized,
+    terminating (and finally killing) it if it does not exit in time.
+    Pooled workers are stopped by closing their input instead.
+    """
+    if isinstance(process, FfmpegWorker):
+        process.stop()
+        return
+    try:
+        process.stdin.write("q")
+        process.stdin.flush()
+        process.wait(timeout=5)
+    except (IOError, ValueError, subprocess.TimeoutExpired):
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def part_path(output_file, index):
+    """
+    Path of the index-th part of a recording (the first part is output_file).
+    e.g. user_date_flv.mp4 -> user_date_part2_flv.mp4
+    """
+    if index == 0:
+        return output_file
+    if output_file.endswith("_flv.mp4"):
+        return output_file[:-len("_flv.mp4")] + f"_part{index + 1}_flv.mp4"
+    base, ext = os.path.splitext(output_file)
+    return f"{base}_part{index + 1}{ext}"
+
+
+def handoff_path(output_file):
+    """
+    Temporary path of the recording started by a hitless restart (the next
+    session renames it to its own output file).
+    """
+    directory, name = os.path.split(output_file)
+    return os.path.join(directory, f".next_{name}")
+
+
+def record_stream(stream_url, output_file, ffmpeg_path="ffmpeg", status_manager=None, stop_event=None,
+                  fallback_urls=None, on_first_byte=None, pool=None, thumbnail_path=None, handoff=None):
     """
     Records the stream and restarts if resolution changes.
     Returns: 'FINISHED', 'RESTART', 'ERROR', or 'MANUAL_STOP'
     
+    When FFmpeg stops receiving data for STALL_TIMEOUT seconds (or exits),
+    the recording fails over to the next URL (backup CDN, then lower
+    qualities) into a new part file. All parts are concatenated into the
+    same final recording. The recording ends once every URL failed in a row
+    without delivering data.
+    
+    FFmpeg is launched first: on_first_byte (status update, thumbnails...)
+    only runs once data is flowing.
+    
+    FLV URLs are downloaded by a Python reader piping them into FFmpeg (a
+    pre-spawned worker when a pool is given). The reader sees every video
+    sequence header, so resolution changes are detected without probing
+    the stream again. Other URLs are read by FFmpeg itself and only their
+    initial resolution is known.
+    
+    With a thumbnail_path, the same FFmpeg also refreshes a JPEG of the
+    stream (decoding keyframes only): the stream is pulled once for the
+    recording, the thumbnails and the resolution.
+    
+    With a handoff dict, resolution changes are hitless: the reader moves
+    the stream to the next session's FFmpeg exactly at the new sequence
+    header, before this session's FFmpeg is stopped. 'RESTART' is returned
+    with that FFmpeg in handoff, and the next call (given the same dict)
+    carries on with it instead of starting a new one.
+    
     Args:
         stream_url: URL of the stream to record
         output_file: Path to save the recording
         ffmpeg_path: Path to ffmpeg executable
         status_manager: Optional StatusManager for heartbeat updates
+        stop_event: Optional threading.Event; when set, the recording is
+                    stopped gracefully (used by the supervisor on shutdown)
+        fallback_urls: Optional URLs to fail over to, best first
+        on_first_byte: Optional callback(first_byte_at) run once FFmpeg
+                       receives the stream (first_byte_at is a time.time())
+        pool: Optional FfmpegPool to claim pre-spawned FFmpeg workers from
+        thumbnail_path: Optional JPEG path refreshed from the stream
+        handoff: Optional dict carrying the running FFmpeg over a RESTART
     """
     print(f"[*] [SmartRecorder] Starting: {os.path.basename(output_file)}")
     
-    # Derive ffprobe path from ffmpeg path
-    if ffmpeg_path.endswith("ffmpeg") or ffmpeg_path.endswith("ffmpeg.exe"):
-        ffprobe_path = ffmpeg_path.replace("ffmpeg", "ffprobe")
-    else:
-        ffprobe_path = "ffprobe"
-    
-    # Start resolution monitor
-    monitor = ResolutionMonitor(stream_url, ffprobe_path=ffprobe_path, poll_interval=3)
-    monitor.start()
+    urls = [stream_url] + [url for url in (fallback_urls or []) if url != stream_url]
+    url_index = 0
+    parts = []
+    failed_attempts = 0
     
-    # Wait briefly for initial resolution detection
-    time.sleep(1)
+    # Resolution changes are reported by whatever reads the stream
+    monitor = ResolutionMonitor()
+    first_byte_seen = False
     
-    # Simple FFmpeg command - just record, no dual-output needed
-    cmd = [
-        ffmpeg_path, "-y", "-loglevel", "info",
-        "-rw_timeout", "10000000",  # 10 second read/write timeout
-        "-i", stream_url,
-        "-c", "copy",
-        output_file
-    ]
+    def report_resolution(resolution):
+        """Resolution seen in the stream: watched for changes and shown in the status."""
+        monitor.report(resolution)
+        if status_manager:
+            try:
+                status_manager.update_resolution(f"{resolution[0]}x{resolution[1]}")
+            except Exception:
+                pass  # Non-critical
     
-    print(f"[*] [SmartRecorder] Stream URL: {stream_url[:100]}...")  # Debug: show stream URL
+    def publish_thumbnail():
+        """Moves the latest thumbnail of a pooled worker to thumbnail_path."""
+        spool = getattr(process, "thumbnail_path", None)
+        if not thumbnail_path or not spool or spool == thumbnail_path:
+            return
+        try:
+            if os.path.exists(spool):
+                os.replace(spool, thumbnail_path)
+        except OSError:
+            pass  # In use (Windows) - retried on the next pass
 
-    process = None
-    try:
-        process = subprocess.Popen(
-            cmd, 
-            stdin=subprocess.PIPE,  # Allow sending commands like 'q'
-            stdout=subprocess.PIPE, 
-            stderr=subprocess.PIPE,
-            universal_newlines=True, 
-            encoding="utf-8", 
-            errors="replace"
-        )
-    except Exception as e:
-        print(f"[!] FFmpeg launch failed: {e}")
-        monitor.stop()
-        return "ERROR"
+    def drop_handoff():
+        """Stops an FFmpeg started for a next session that won't happen."""
+        if handoff and handoff.get("process") is not None:
+            next_process = handoff.pop("process")
+            stop_ffmpeg(next_process)
+            try:
+                os.remove(next_process.output_path)
+            except OSError:
+                pass
+        if handoff:
+            handoff.clear()
 
-    def convert_and_return(status):
-        """Helper to convert FLV to MP4 before returning status."""
-        if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
-            VideoManagement.convert_flv_to_mp4(output_file)
-        else:
+    def finalize_and_return(status):
+        """Helper to join the parts (or just rename the single one) before returning status."""
+        if status != "RESTART":
+            drop_handoff()
+        publish_thumbnail()
+        written = []
+        for path in parts:
+            if os.path.exists(path) and os.path.getsize(path) > 0:
+                written.append(path)
+            elif os.path.exists(path):
+                os.remove(path)
+        
+        if not written:
             print(f"[!] Output file empty or missing: {output_file}")
+        elif len(written) == 1:
+            # Already a (fragmented) MP4: no remux needed
+            VideoManagement.finalize(written[0], output_file.replace("_flv.mp4", ".mp4"))
+        else:
+            # Several parts still take a full (stream copy) rewrite
+            print(f"[*] [SmartRecorder] Joining {len(written)} parts after CDN failover...")
+            VideoManagement.concat_parts(written, output_file.replace("_flv.mp4", ".mp4"))
         return status
 
     # ANSI codes for formatting
@@ -236,110 +280,263 @@ def record_stream(stream_url, output_file, ffmpeg_path="ffmpeg", status_manager=
             return "[FFmpeg] " + "  ".join(formatted_parts)
         
         return f"[FFmpeg] {line}"
-    
-    # Thread to read FFmpeg stderr continuously
-    stderr_output = []
-    def read_stderr():
-        try:
-            for line in process.stderr:
-                line = line.strip()
-                if line:
-                    stderr_output.append(line)
-                    # Print progress info (lines with time= or speed=)
-                    if "time=" in line:
-                        print(format_ffmpeg_line(line))
-                    elif "error" in line.lower():
-                        print(f"[FFmpeg] {line[:150]}")
-        except:
-            pass
-    
-    stderr_thread = threading.Thread(target=read_stderr, daemon=True)
-    stderr_thread.start()
+
+    def split(resolution):
+        """
+        Starts the next session's FFmpeg at a resolution change (called by
+        the stream reader, which continues into it). None keeps the stream
+        in the current FFmpeg.
+        """
+        if handoff is None:
+            return None
+        if pool is not None:
+            worker = pool.claim()
+        else:
+            try:
+                worker = FfmpegWorker(ffmpeg_path, handoff_path(output_file), thumbnail_path)
+            except Exception as e:
+                print(f"[!] FFmpeg launch failed: {e}")
+                worker = None
+        if worker is None:
+            return None
+        
+        next_progress = watch_ffmpeg(worker, piped=True)
+        next_progress["first_byte"] = time.time()
+        handoff.update(process=worker, progress=next_progress, url=urls[url_index])
+        return worker
+
+    def start_ffmpeg(url):
+        """
+        Launches FFmpeg for the next part and a thread reading its stderr.
+        Returns (process, progress) where progress tracks the last time
+        FFmpeg reported new output, or (None, None) if the launch failed.
+        """
+        print(f"[*] [SmartRecorder] Stream URL: {url[:100]}...")  # Debug: show stream URL
+        
+        worker = None
+        if is_flv_url(url):
+            # FFmpeg records whatever FLV is piped into it
+            if pool is not None:
+                worker = pool.claim()
+            else:
+                try:
+                    worker = FfmpegWorker(ffmpeg_path, part_path(output_file, len(parts)), thumbnail_path)
+                except Exception as e:
+                    print(f"[!] FFmpeg launch failed: {e}")
+        
+        if worker is not None:
+            process = worker
+            parts.append(worker.output_path)
+        else:
+            path = part_path(output_file, len(parts))
+            
+            # Record, plus the thumbnail output when requested
+            cmd = [ffmpeg_path, "-y", "-loglevel", "info"]
+            if thumbnail_path:
+                cmd += ["-skip_frame", "nokey"]  # Only the thumbnail output decodes
+            cmd += [
+                "-rw_timeout", "10000000",  # 10 second read/write timeout
+                "-i", url,
+                "-c", "copy",
+                *LIVE_MP4_ARGS,
+                path
+            ]
+            if thumbnail_path:
+                cmd += thumbnail_args(thumbnail_path)
+            
+            try:
+                process = subprocess.Popen(
+                    cmd, 
+                    stdin=subprocess.PIPE,  # Allow sending commands like 'q'
+                    stdout=subprocess.PIPE, 
+                    stderr=subprocess.PIPE,
+                    universal_newlines=True, 
+                    encoding="utf-8", 
+                    errors="replace"
+                )
+            except Exception as e:
+                print(f"[!] FFmpeg launch failed: {e}")
+                return None, None
+            parts.append(path)
+        
+        progress = watch_ffmpeg(process, piped=worker is not None)
+        
+        if worker is not None:
+            def on_worker_first_byte(first_byte_at):
+                progress["first_byte"] = progress["first_byte"] or first_byte_at
+            worker.feed(url, on_worker_first_byte, report_resolution, split)
+        
+        return process, progress
+
+    def watch_ffmpeg(process, piped):
+        """
+        Starts a thread reading FFmpeg's stderr. Returns the progress dict
+        it keeps up to date.
+        """
+        progress = {"started_at": time.time(), "first_byte": None, "first_progress": None,
+                    "last_progress": None, "output": None, "process": process}
+        
+        # Thread to read FFmpeg stderr continuously
+        def read_stderr():
+            try:
+                for line in process.stderr:
+                    line = line.strip()
+                    if line:
+                        # The input is opened (and probed) once data arrives
+                        if progress["first_byte"] is None and line.startswith("Input #0"):
+                            progress["first_byte"] = time.time()
+                        
+                        # FFmpeg's stream info (piped streams are tracked by their reader)
+                        if not piped:
+                            match = RESOLUTION_PATTERN.search(line)
+                            if match:
+                                report_resolution((int(match.group(1)), int(match.group(2))))
+                        
+                        # Print progress info (lines with time= or speed=)
+                        if "time=" in line:
+                            print(format_ffmpeg_line(line))
+                            # A growing output means data is flowing (with a thumbnail
+                            # output, time= only moves when a thumbnail is written)
+                            match = re.search(r'size=\s*(\d+)', line) or re.search(r'time=\s*([\d:.]+)', line)
+                            if match and match.group(1) != progress["output"]:
+                                progress["output"] = match.group(1)
+                                progress["last_progress"] = time.time()
+                                if progress["first_progress"] is None:
+                                    progress["first_progress"] = progress["last_progress"]
+                                    progress["first_byte"] = progress["first_byte"] or progress["last_progress"]
+                        elif "error" in line.lower():
+                            print(f"[FFmpeg] {line[:150]}")
+            except:
+                pass
+        
+        threading.Thread(target=read_stderr, daemon=True).start()
+        return progress
+
+    def was_healthy(progress):
+        """True if the attempt delivered data for at least HEALTHY_RUN seconds."""
+        if progress["last_progress"] is None:
+            return False
+        return progress["last_progress"] - progress["first_progress"] >= HEALTHY_RUN
+
+    def last_data(progress):
+        """
+        Last time data flowed: FFmpeg's output grew, or (piped workers) the
+        feeder received data for FFmpeg's input, which keeps flowing while
+        the output waits for the end of a long GOP.
+        """
+        feeder = getattr(progress["process"], "feeder", None)
+        fed = feeder.last_data_at if feeder is not None else None
+        return max((t for t in (progress["last_progress"], fed) if t), default=None)
+
+    def is_stalled(progress):
+        """True if FFmpeg stopped receiving data (or never started to)."""
+        last = last_data(progress)
+        if last is None:
+            return time.time() - progress["started_at"] > STARTUP_TIMEOUT
+        return time.time() - last > STALL_TIMEOUT
+
+    if handoff and handoff.get("process") is not None:
+        # Hitless restart: the previous session already started this FFmpeg
+        process, progress = handoff.pop("process"), handoff.pop("progress")
+        url = handoff.pop("url")
+        url_index = urls.index(url) if url in urls else 0
+        parts.append(process.output_path)
+        process.feeder.on_resolution = report_resolution
+        process.feeder.on_split = split
+        if process.feeder.resolution:
+            report_resolution(process.feeder.resolution)
+    else:
+        process, progress = start_ffmpeg(urls[url_index])
+    if process is None:
+        return "ERROR"
 
     try:
         while True:
-            # Check if FFmpeg has stopped
+            # The stream already moved on to the next session's FFmpeg (which
+            # may end this one before the resolution change is noticed)
+            if handoff and handoff.get("process") is not None:
+                print("[!] Resolution changed - next session already recording, closing this one...")
+                stop_ffmpeg(process)
+                return finalize_and_return("RESTART")
+            
+            # Check if FFmpeg has stopped or stopped receiving data
             exit_code = process.poll()
-            if exit_code is not None:
-                monitor.stop()
-                if exit_code == 0:
-                    return convert_and_return("FINISHED")
-                else:
-                    # Read any error output
-                    stderr_output = process.stderr.read() if process.stderr else ""
-                    if stderr_output:
-                        print(f"[!] FFmpeg stderr: {stderr_output[:500]}")
-                    return convert_and_return("FINISHED")  # Stream probably ended
+            stalled = exit_code is None and is_stalled(progress)
+            if exit_code is not None or stalled:
+                if stalled:
+                    print(f"[!] [SmartRecorder] No data for {STALL_TIMEOUT}s, failing over...")
+                    stop_ffmpeg(process)
+                
+                # Attempts that delivered data for a while reset the count: the
+                # stream only counts as ended once every URL failed in a row
+                failed_attempts = 0 if was_healthy(progress) else failed_attempts + 1
+                publish_thumbnail()
+                if failed_attempts >= len(urls):
+                    return finalize_and_return("FINISHED")  # Stream probably ended
+                
+                url_index = (url_index + 1) % len(urls)
+                monitor.reset()  # The next URL may be another quality
+                print(f"[*] [SmartRecorder] Switching to stream URL {url_index + 1}/{len(urls)}")
+                process, progress = start_ffmpeg(urls[url_index])
+                if process is None:
+                    return finalize_and_return("ERROR")
+                continue
+            
+            # Deferred start work, once bytes are flowing
+            if not first_byte_seen and progress["first_byte"]:
+                first_byte_seen = True
+                if on_first_byte:
+                    try:
+                        on_first_byte(progress["first_byte"])
+                    except Exception as e:
+                        print(f"[!] [SmartRecorder] First byte callback failed: {e}")
             
             # Check for resolution change
             if monitor.has_changed():
                 print("[!] Restarting session due to resolution change...")
-                try:
-                    process.stdin.write("q")
-                    process.stdin.flush()
-                    process.wait(timeout=5)
-                except (IOError, ValueError, subprocess.TimeoutExpired):
-                    process.terminate()
-                    try:
-                        process.wait(timeout=5)
-                    except subprocess.TimeoutExpired:
-                        process.kill()
-                monitor.stop()
-                return convert_and_return("RESTART")
+                stop_ffmpeg(process)
+                return finalize_and_return("RESTART")
+            
+            # Check for a stop request from another thread
+            if stop_event is not None and stop_event.is_set():
+                print(f"\n[*] Stop requested - Gracefully stopping {os.path.basename(output_file)}...")
+                stop_ffmpeg(process)
+                return finalize_and_return("MANUAL_STOP")
             
             # Check for 'q' key press (Windows only)
             if HAS_MSVCRT and msvcrt.kbhit():
                 key = msvcrt.getch()
                 if key in (b'q', b'Q'):
                     print("\n[*] 'q' pressed - Gracefully stopping recording...")
-                    monitor.stop()
-                    try:
-                        process.stdin.write("q")
-                        process.stdin.flush()
-                        process.wait(timeout=5)
-                    except (IOError, ValueError, subprocess.TimeoutExpired):
-                        process.terminate()
-                        try:
-                            process.wait(timeout=5)
-                        except subprocess.TimeoutExpired:
-                            process.kill()
-                    return convert_and_return("MANUAL_STOP")
+                    stop_ffmpeg(process)
+                    return finalize_and_return("MANUAL_STOP")
+            
+            publish_thumbnail()
             
             # Update status manager heartbeat and file size
             if status_manager:
                 try:
-                    if os.path.exists(output_file):
-                        file_size_mb = os.path.getsize(output_file) / (1024 * 1024)
-                        status_manager.update_recording_progress(file_size_mb)
+                    file_size = sum(os.path.getsize(p) for p in parts if os.path.exists(p))
+                    if file_size:
+                        status_manager.update_recording_progress(file_size / (1024 * 1024))
                     else:
                         status_manager.heartbeat()
                 except Exception:
                     pass  # Non-critical, don't crash recording
             
-            # Small sleep to prevent busy-waiting
-            time.sleep(0.5)
+            # Small sleep to prevent busy-waiting (shorter until data flows)
+            time.sleep(0.5 if first_byte_seen else 0.1)
 
     except KeyboardInterrupt:
         print(f"\n[*] Gracefully stopping recording (CTRL+C received)...")
-        monitor.stop()
         if process:
-            try:
-                # Send 'q' to quit gracefully and allow MP4 to finalize
-                process.stdin.write("q")
-                process.stdin.flush()
-                process.wait(timeout=5)
-            except (IOError, ValueError, subprocess.TimeoutExpired):
-                # If 'q' fails or times out, force terminate
-                process.terminate()
-                try:
-                    process.wait(timeout=5)
-                except subprocess.TimeoutExpired:
-                    process.kill()
-        return convert_and_return("MANUAL_STOP")
+            # Send 'q' to quit gracefully and allow MP4 to finalize
+            stop_ffmpeg(process)
+        return finalize_and_return("MANUAL_STOP")
                 
     except Exception as e:
         print(f"[!] Recorder Error: {e}")
-        monitor.stop()
+        drop_handoff()
         if process:
             try:
                 process.terminate()
@@ -347,4 +544,4 @@ def record_stream(stream_url, output_file, ffmpeg_path="ffmpeg", status_manager=
                 process.kill()
         return "ERROR"
     
-    return "FINISHED"
\ No newline at end of file
+    return "FINISHED"
@@ -0,0 +1,154 @@
+"""
+Supervisor for TikTok Live Recorder.
+
+Runs every monitored user in a single process instead of one Python
+interpreter per creator:
+    - one asyncio LivePoller checks all users (bounded in-flight requests)
+    - each active recording is a managed child: a recording thread driving
+      its own FFmpeg subprocess, stopped gracefully on shutdown
+    - all users share one keep-alive HTTP session, one room ID cache, one
+      rate limiter and one StatusWriter thread for their status files
+      (monitor.py keeps working unchanged)
+"""
+
+from core.live_poller import LivePoller
+from http_utils.rate_limiter import RateLimiter
+from http_utils.transport import Transport
+from utils.ffmpeg_pool import FfmpegPool
+from utils.poll_scheduler import LiveHistory, REQUESTS_PER_MINUTE
+from utils.room_id_cache import RoomIdCache
+from utils.status_manager import DEFAULT_STATUS_DIR, StatusWriter
+
+try:
+    from tiktok import TikTok
+except ImportError:
+    from src.tiktok import TikTok
+
+
+def read_users_file(path):
+    """
+    Reads usernames from a file: one per line (or comma-separated),
+    '@' prefixes are stripped and lines starting with '#' are ignored.
+    """
+    users = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            users.extend(u.lstrip("@").strip() for u in line.split(",") if u.strip())
+    return users
+
+
+class Supervisor:
+    """
+    Polls and records many users from a single process.
+    """
+
+    def __init__(
+        self,
+        users,
+        output,
+        ffmpeg="ffmpeg",
+        interval=5,
+        max_in_flight=20,
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        http2=False,
+        ffmpeg_pool_size=1,
+        ffmpeg_pool_idle=30,
+    ):
+        """
+        Initialize the supervisor.
+
+        Args:
+            users: Usernames to monitor
+            output: Output directory for recordings
+            ffmpeg: Path to ffmpeg executable
+            interval: Default minutes between checks of a user
+            max_in_flight: Max concurrent API requests
+            requests_per_minute: Global poll budget
+            http2: Reach the webcast API over HTTP/2
+            ffmpeg_pool_size: Idle FFmpeg workers kept ready (0 disables the pool)
+            ffmpeg_pool_idle: Minutes before an idle FFmpeg worker is recycled
+        """
+        self.users = list(dict.fromkeys(users))
+
+        # Shared keep-alive HTTP transport, sized for concurrent recordings
+        self.session = Transport(pool_size=max_in_flight, http2=http2)
+
+        self.status_writer = StatusWriter()
+        self.room_id_cache = RoomIdCache()
+        self.live_history = LiveHistory()
+        self.rate_limiter = RateLimiter()
+
+        # Pre-spawned FFmpeg workers shared by all recordings (they also
+        # write the thumbnails shown by the monitor)
+        self.ffmpeg_pool = None
+        if ffmpeg_pool_size > 0:
+            self.ffmpeg_pool = FfmpegPool(
+                output,
+                ffmpeg,
+                ffmpeg_pool_size,
+                ffmpeg_pool_idle * 60,
+                thumbnail_dir=DEFAULT_STATUS_DIR,
+            )
+
+        self.bots = {
+            user: TikTok(
+                output=output,
+                mode="automatic",
+                user=user,
+                ffmpeg=ffmpeg,
+                interval=interval,
+                session=self.session,
+                status_writer=self.status_writer,
+                room_id_cache=self.room_id_cache,
+                live_history=self.live_history,
+                rate_limiter=self.rate_limiter,
+                ffmpeg_pool=self.ffmpeg_pool,
+            )
+            for user in self.users
+        }
+
+        self.poller = LivePoller(
+            self.users,
+            on_live=lambda user, room_id: self.bots[user].record_live(room_id),
+            on_offline=lambda user: self.bots[user].status_manager.set_waiting(),
+            interval=interval,
+            max_in_flight=max_in_flight,
+            requests_per_minute=requests_per_minute,
+            room_id_cache=self.room_id_cache,
+            history=self.live_history,
+            rate_limiter=self.rate_limiter,
+        )
+
+    def run(self):
+        """Run until interrupted, then stop all recordings gracefully."""
+        print(f"[*] [Supervisor] Monitoring {len(self.users)} users in one process")
+        self.status_writer.start()
+        if self.ffmpeg_pool:
+            self.ffmpeg_pool.start()
+        try:
+            self.poller.run()
+        except KeyboardInterrupt:
+            print("\n[*] [Supervisor] Stopped by user.")
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """Stop every active recording and mark all users as stopped."""
+        for bot in self.bots.values():
+            bot.stop_event.set()
+
+        for user, thread in list(self.poller.active_recordings.items()):
+            print(f"[*] [Supervisor] Waiting for the recording of {user} to finish...")
+            thread.join(timeout=30)
+
+        for bot in self.bots.values():
+            bot.status_manager.set_stopped()
+
+        self.status_writer.stop()
+        print(f"[*] [Supervisor] {self.session.stats.summary()}")
+        if self.ffmpeg_pool:
+            self.ffmpeg_pool.close()
+            print(f"[*] [Supervisor] {self.ffmpeg_pool.summary()}")
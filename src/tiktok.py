@@ -1,7 +1,10 @@
 import os
 import time
+import random
 import logging
-import requests
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import re
 from datetime import datetime
 import colorama
@@ -27,27 +30,58 @@ except ImportError:
         class StatusManager:
             def __init__(self, *args, **kwargs): pass
             def set_waiting(self): pass
-            def set_recording(self, filename): pass
+            def set_recording(self, filename, first_byte_seconds=None): pass
             def update_recording_progress(self, size): pass
             def heartbeat(self): pass
             def set_stopped(self): pass
 
-# --- THUMBNAIL CAPTURER FOR LIVE STREAM SNAPSHOTS ---
+# --- SHARED ROOM ID CACHE (SQLite, shared by all instances) ---
 try:
-    from src.utils.thumbnail_capturer import ThumbnailCapturer
+    from src.utils.room_id_cache import RoomIdCache
 except ImportError:
-    try:
-        from utils.thumbnail_capturer import ThumbnailCapturer
-    except ImportError:
-        # Fallback: create a dummy ThumbnailCapturer if not available
-        class ThumbnailCapturer:
-            def __init__(self, *args, **kwargs): pass
-            def start(self): pass
-            def stop(self): pass
-            def cleanup(self): pass
+    from utils.room_id_cache import RoomIdCache
+
+# --- ADAPTIVE POLL INTERVALS FROM LIVE HISTORY ---
+try:
+    from src.utils.poll_scheduler import MIN_INTERVAL, AdaptivePollScheduler, LiveHistory
+except ImportError:
+    from utils.poll_scheduler import MIN_INTERVAL, AdaptivePollScheduler, LiveHistory
+
+# --- KEEP-ALIVE TRANSPORT (connection reuse, DNS cache, optional HTTP/2) ---
+try:
+    from src.http_utils.transport import Transport
+except ImportError:
+    from http_utils.transport import Transport
+
+# --- PER-HOST RATE LIMITS SHARED BY ALL INSTANCES ---
+try:
+    from src.http_utils.rate_limiter import RateLimiter, RateLimitedSession
+    from src.utils.enums import Priority, TimeOut
+except ImportError:
+    from http_utils.rate_limiter import RateLimiter, RateLimitedSession
+    from utils.enums import Priority, TimeOut
+
+# --- CIRCUIT BREAKERS AND JITTERED BACKOFF FOR WAF BLOCKS ---
+try:
+    from src.http_utils.circuit_breaker import Backoff, get_breaker, jittered
+except ImportError:
+    from http_utils.circuit_breaker import Backoff, get_breaker, jittered
+
+# --- STREAM CATALOG (every quality / protocol / CDN of a live) ---
+try:
+    from src.core.stream_catalog import StreamCatalog
+except ImportError:
+    from core.stream_catalog import StreamCatalog
 
 # -------------------------------------------
 
+# Hedged room ID resolution: seconds to wait for TikRec before racing the
+# HTML scrape (the p95 of recent TikRec latencies, within these bounds)
+HEDGE_DEFAULT_DELAY = 2
+HEDGE_MIN_DELAY = 0.5
+HEDGE_MAX_DELAY = 5
+HEDGE_MIN_SAMPLES = 5
+
 # ANSI Colors
 GREEN = "\033[92m"
 RED = "\033[91m"
@@ -58,19 +92,42 @@ class TikTok:
     TIKREC_API = "https://tikrec.com"
     BASE_URL = "https://www.tiktok.com"
     
-    def __init__(self, output, mode, user, ffmpeg="ffmpeg", interval=5, update_check=True):
+    def __init__(self, output, mode, user, ffmpeg="ffmpeg", interval=5, update_check=True,
+                 session=None, status_writer=None, room_id_cache=None, live_history=None,
+                 rate_limiter=None, http2=False, ffmpeg_pool=None):
         self.output = output
         self.mode = mode
         self.user = user
         self.ffmpeg = ffmpeg
+        self.ffmpeg_pool = ffmpeg_pool  # Pre-spawned FFmpeg workers (optional)
         self.interval = interval
         self.update_check = update_check
         
         # Initialize status manager for multi-instance monitoring
-        self.status_manager = StatusManager(user, output_path=self.output)
+        # (a supervisor passes one shared writer for all its users)
+        if status_writer is not None:
+            self.status_manager = StatusManager(user, output_path=self.output, writer=status_writer)
+        else:
+            self.status_manager = StatusManager(user, output_path=self.output)
+        
+        # Room ID cache shared with other instances via the status dir
+        self.room_id_cache = room_id_cache or RoomIdCache(status_dir=self.status_manager.status_dir)
+        
+        # Poll interval adapts to when this user usually goes live
+        self.live_history = live_history or LiveHistory(status_dir=self.status_manager.status_dir)
+        self.poll_scheduler = AdaptivePollScheduler(
+            default_interval=self.interval * 60,
+            history=self.live_history,
+            min_interval=min(MIN_INTERVAL, self.interval * 60),
+            max_interval=self.interval * 60  # Never less often than asked
+        )
+        self.live_started_at = None  # Start of the live being recorded (history)
         
-        # Thumbnail capturer (initialized when recording starts)
-        self.thumbnail_capturer = None
+        # Set to stop an ongoing recording gracefully from another thread
+        self.stop_event = threading.Event()
+        
+        # Live thumbnail for the monitor, written by the recording FFmpeg
+        self.thumbnail_path = os.path.join(self.status_manager.status_dir, f"{user}.jpg")
         
         # Headers mimicking a real browser to avoid detection
         self.headers = {
@@ -80,17 +137,41 @@ class TikTok:
             "Accept-Language": "en-US,en;q=0.9",
         }
         
+        # HTTP transport (keep-alive); a supervisor shares one across all users
+        if session is None:
+            session = Transport(headers=self.headers, http2=http2)
+        
+        # Every request waits for its host's token bucket (shared by all instances)
+        self.rate_limiter = rate_limiter or RateLimiter(status_dir=self.status_manager.status_dir)
+        self.session = RateLimitedSession(session, self.rate_limiter)
+        
+        # Endpoints are skipped after repeated WAF blocks / connection errors
+        # (breakers are shared by every user of the process)
+        self.tikrec_breaker = get_breaker("tikrec.com")
+        self.room_api_breaker = get_breaker("tiktok.com/api-live")
+        self.live_page_breaker = get_breaker("tiktok.com/live")
+        
+        # Retry delay after unexpected errors (decorrelated jitter)
+        self.backoff = Backoff(TimeOut.ONE_MINUTE, TimeOut.MAX_BACKOFF * TimeOut.ONE_MINUTE)
+        
+        # Hedged room ID resolution (TikRec raced against HTML scraping)
+        self.resolver = ThreadPoolExecutor(max_workers=4, thread_name_prefix=f"resolve-{user}")
+        self.tikrec_latencies = deque(maxlen=50)
+        
         # Ensure output directory exists
         if not os.path.exists(self.output):
             os.makedirs(self.output)
 
-    def _get_tikrec_signed_url(self):
+    def _get_tikrec_signed_path(self):
         """
-        Gets a signed URL from TikRec API for reliable room_id retrieval.
+        Gets a signed path from TikRec API for reliable room_id retrieval.
         This approach is used by the original Michele0303 repo.
         """
+        if not self.tikrec_breaker.allow():
+            return None
+        
         try:
-            response = requests.get(
+            response = self.session.get(
                 f"{self.TIKREC_API}/tiktok/room/api/sign",
                 params={"unique_id": self.user},
                 headers=self.headers,
@@ -99,49 +180,118 @@ class TikTok:
             
             if response.status_code == 200:
                 data = response.json()
-                signed_path = data.get("signed_path")
-                if signed_path:
-                    return f"{self.BASE_URL}{signed_path}"
+                self.tikrec_breaker.record_success()
+                return data.get("signed_path")
+            self.tikrec_breaker.record_failure()
         except Exception as e:
+            self.tikrec_breaker.record_failure()
             logging.error(f"TikRec API error: {e}")
         
         return None
 
-    def get_room_id(self):
+    def _fetch_signed_room_id(self, signed_path):
         """
-        Retrieves the Room ID for the given user using TikRec signed URL.
-        Falls back to direct HTML scraping if TikRec fails.
-        Returns None if user is not found or not live.
+        Fetches the user's room data from a signed path.
+        Returns (valid, room_id); valid is False if the answer was unusable
+        (WAF block, expired signature, invalid JSON) or the endpoint is
+        suspended by its circuit breaker.
         """
-        # --- PRIMARY: Use TikRec API (like original repo) ---
+        if not self.room_api_breaker.allow():
+            return False, None
+        
         try:
-            signed_url = self._get_tikrec_signed_url()
+            response = self.session.get(f"{self.BASE_URL}{signed_path}", headers=self.headers, timeout=10)
+        except Exception:
+            self.room_api_breaker.record_failure()
+            raise
+        content = response.text
+        
+        if not content or "Please wait" in content:
+            self.room_api_breaker.record_failure()
+            return False, None
+        self.room_api_breaker.record_success()
+        
+        try:
+            data = response.json()
+        except Exception as json_err:
+            logging.debug(f"TikRec JSON parse error: {json_err}")
+            return False, None
+        
+        if "data" not in data:
+            return False, None
+        
+        return True, (data.get("data") or {}).get("user", {}).get("roomId") or None
+
+    def _hedge_delay(self):
+        """
+        Seconds to wait for TikRec before racing the HTML scrape: the p95
+        of recent TikRec latencies, clamped to [HEDGE_MIN_DELAY, HEDGE_MAX_DELAY].
+        """
+        if len(self.tikrec_latencies) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        
+        samples = sorted(self.tikrec_latencies)
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, p95))
+
+    def _get_room_id_via_tikrec(self):
+        """
+        Resolves the room ID through a TikRec signed path (a cached one
+        first). Returns (valid, room_id); valid is False if no usable
+        answer was obtained.
+        """
+        started = time.monotonic()
+        try:
+            signed_path = self.room_id_cache.get_signed_path(self.user)
+            fresh = False
             
-            if signed_url:
-                response = requests.get(signed_url, headers=self.headers, timeout=10)
-                content = response.text
-                
-                if content and "Please wait" not in content:
-                    try:
-                        data = response.json()
-                        room_id = (data.get("data") or {}).get("user", {}).get("roomId")
-                        if room_id:
-                            print(f"[*] Room ID retrieved via TikRec API: {room_id}")
-                            return room_id
-                    except Exception as json_err:
-                        logging.debug(f"TikRec JSON parse error: {json_err}")
+            valid = False
+            if signed_path:
+                valid, room_id = self._fetch_signed_room_id(signed_path)
+            
+            if not valid:
+                signed_path = self._get_tikrec_signed_path()
+                fresh = True
+                if signed_path:
+                    valid, room_id = self._fetch_signed_room_id(signed_path)
+            
+            if valid:
+                self.tikrec_latencies.append(time.monotonic() - started)
+                self.room_id_cache.set_room_id(self.user, room_id, signed_path if fresh else None)
+                if room_id:
+                    print(f"[*] Room ID retrieved via TikRec API: {room_id}")
+                return True, room_id
         except Exception as e:
             logging.error(f"TikRec signed URL error: {e}")
         
-        # --- FALLBACK: Direct HTML scraping ---
+        return False, None
+
+    def _get_room_id_via_html(self):
+        """
+        Resolves the room ID by scraping the user's /live page.
+        Returns (valid, room_id); valid is False if no usable answer was
+        obtained.
+        """
+        if not self.live_page_breaker.allow():
+            print(f"[!] TikTok is blocking requests, next attempt in {self.live_page_breaker.retry_after():.0f}s")
+            return False, None
+        
         try:
-            print("[*] TikRec API unavailable, falling back to HTML scraping...")
             url = f"https://www.tiktok.com/@{self.user}/live"
-            response = requests.get(url, headers=self.headers, allow_redirects=False, timeout=10)
+            try:
+                response = self.session.get(url, headers=self.headers, allow_redirects=False, timeout=10)
+            except Exception:
+                self.live_page_breaker.record_failure()
+                raise
+            
+            if "Please wait" in response.text:
+                self.live_page_breaker.record_failure()
+                return False, None
+            self.live_page_breaker.record_success()
             
             # If we get a redirect, the room might be offline or user doesn't exist
             if response.status_code == 302:
-                return None
+                return True, None
 
             content = response.text
             
@@ -150,129 +300,135 @@ class TikTok:
                 room_id = re.search(r'"roomId":"(\d+)"', content)
                 if room_id:
                     print(f"[*] Room ID retrieved via HTML scraping: {room_id.group(1)}")
-                    return room_id.group(1)
+                    self.room_id_cache.set_room_id(self.user, room_id.group(1))
+                    return True, room_id.group(1)
             
             # Alternative regex pattern common in TikTok source
             room_id = re.search(r'room_id=(\d+)', content)
             if room_id:
-                return room_id.group(1)
+                self.room_id_cache.set_room_id(self.user, room_id.group(1))
+                return True, room_id.group(1)
 
         except Exception as e:
             logging.error(f"Error retrieving Room ID: {e}")
             
-        return None
+        return False, None
 
-    def get_stream_url(self, room_id):
+    def get_room_id(self):
         """
-        Fetches the FLV stream URL using the Room ID.
-        Uses live_core_sdk_data for highest quality stream selection (like original repo).
+        Retrieves the Room ID for the given user using TikRec signed URL.
+        Returns None if user is not found or not live.
+        
+        Resolution is hedged: if TikRec has not answered within its recent
+        p95 latency (or fails), direct HTML scraping is started in parallel
+        and the first valid answer wins.
+        
+        Answers are cached in the shared RoomIdCache, and the TikRec signed
+        path is reused until it expires so most polls skip TikRec entirely.
         """
-        import json as json_module
+        # A cached "not live" is only reused within this poll interval
+        max_age = self.poll_scheduler.interval_for(self.user) / 2
+        hit, room_id = self.room_id_cache.get_room_id(self.user, max_age)
+        if hit:
+            return room_id
+        
+        # --- PRIMARY: Use TikRec API (like original repo) ---
+        pending = {self.resolver.submit(self._get_room_id_via_tikrec)}
+        hedged = False
         
+        while pending:
+            done, pending = wait(
+                pending,
+                timeout=None if hedged else self._hedge_delay(),
+                return_when=FIRST_COMPLETED
+            )
+            
+            for future in done:
+                valid, room_id = future.result()
+                if valid:
+                    return room_id
+            
+            # --- HEDGE: Direct HTML scraping, racing a slow or failed TikRec ---
+            if not hedged:
+                if done:
+                    print("[*] TikRec API unavailable, falling back to HTML scraping...")
+                else:
+                    print("[*] TikRec API is slow, racing HTML scraping...")
+                pending.add(self.resolver.submit(self._get_room_id_via_html))
+                hedged = True
+        
+        return None
+
+    def get_stream_catalog(self, room_id):
+        """
+        Fetches every stream variant (quality, protocol, main/backup CDN)
+        of the room as a StreamCatalog.
+        Returns None if the room is not live or has no usable stream.
+        """
         try:
             url = f"https://webcast.tiktok.com/webcast/room/info/?aid=1988&room_id={room_id}"
-            response = requests.get(url, headers=self.headers).json()
+            response = self.session.get(url, priority=Priority.LIVE_CONFIRMATION, headers=self.headers).json()
             
-            # Extract stream URL
-            if "data" in response:
-                data = response["data"]
-                
-                # Check live status (2 = Live, 4 = Finish/Offline)
-                status = data.get("status")
-                if status != 2:
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    print(f"[!] {timestamp} - Stream status is {status}, not live (2)")
-                    return None
-
-                if "stream_url" not in data:
-                    print("[!] No stream_url in API response")
-                    return None
-                    
-                stream_info = data["stream_url"]
-                
-                # --- PRIORITY 1: Use live_core_sdk_data for highest quality (like original repo) ---
-                try:
-                    sdk_data_str = (
-                        stream_info.get("live_core_sdk_data", {})
-                        .get("pull_data", {})
-                        .get("stream_data")
-                    )
-                    
-                    if sdk_data_str:
-                        sdk_data = json_module.loads(sdk_data_str).get("data", {})
-                        
-                        # Get quality levels
-                        qualities = (
-                            stream_info.get("live_core_sdk_data", {})
-                            .get("pull_data", {})
-                            .get("options", {})
-                            .get("qualities", [])
-                        )
-                        
-                        if qualities:
-                            level_map = {q["sdk_key"]: q["level"] for q in qualities}
-                            print(f"[*] SDK Qualities available: {list(level_map.keys())}")
-                            
-                            best_level = -1
-                            best_flv = None
-                            best_quality_name = None
-                            
-                            for sdk_key, entry in sdk_data.items():
-                                level = level_map.get(sdk_key, -1)
-                                stream_main = entry.get("main", {})
-                                flv_url = stream_main.get("flv")
-                                
-                                if level > best_level and flv_url:
-                                    best_level = level
-                                    best_flv = flv_url
-                                    best_quality_name = sdk_key
-                            
-                            if best_flv:
-                                print(f"[*] Using SDK stream: {best_quality_name} (level {best_level})")
-                                return best_flv
-                            else:
-                                print("[!] SDK stream data found but no FLV URL extracted")
-                        else:
-                            print("[!] No qualities found in SDK stream data")
-                    else:
-                        print("[*] No SDK stream data, falling back to legacy URLs...")
-                        
-                except Exception as sdk_error:
-                    print(f"[!] SDK extraction failed: {sdk_error}, falling back to legacy URLs...")
-                
-                # --- PRIORITY 2: Fallback to legacy flv_pull_url (with quality preference) ---
-                if "flv_pull_url" in stream_info:
-                    flv_urls = stream_info["flv_pull_url"]
-                    print(f"[*] Legacy qualities available: {list(flv_urls.keys())}")
-                    
-                    # Try quality levels in order of preference
-                    for quality in ["FULL_HD1", "HD1", "ORIGIN", "SD2", "SD1"]:
-                        if quality in flv_urls and flv_urls[quality]:
-                            print(f"[*] Using legacy stream quality: {quality}")
-                            return flv_urls[quality]
-                    
-                    # If no known quality, try the first available
-                    if flv_urls:
-                        first_key = list(flv_urls.keys())[0]
-                        print(f"[*] Using fallback legacy stream: {first_key}")
-                        return flv_urls[first_key]
-                
-                if "rtmp_pull_url" in stream_info:
-                    print("[*] Using RTMP pull URL")
-                    return stream_info["rtmp_pull_url"]
-                    
-                # Check for HLS as fallback
-                if "hls_pull_url" in stream_info:
-                    print("[*] Using HLS pull URL")
-                    return stream_info["hls_pull_url"]
-                    
-                print(f"[!] No usable stream URL found. Available keys: {list(stream_info.keys())}")
+            if "data" not in response:
+                return None
+            
+            data = response["data"]
+            
+            # Check live status (2 = Live, 4 = Finish/Offline)
+            status = data.get("status")
+            if status != 2:
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                print(f"[!] {timestamp} - Stream status is {status}, not live (2)")
+                return None
+
+            if "stream_url" not in data:
+                print("[!] No stream_url in API response")
+                return None
+            
+            catalog = StreamCatalog.from_stream_url(data["stream_url"])
+            if not catalog.has_sdk_data:
+                print("[*] No SDK stream data, falling back to legacy URLs...")
+            
+            if not catalog.candidates(protocol=None):
+                print(f"[!] No usable stream URL found. Available keys: {list(data['stream_url'].keys())}")
+                return None
+            
+            qualities = sorted({v.quality for v in catalog})
+            print(f"[*] Stream variants available: {len(catalog)} ({', '.join(qualities)})")
+            return catalog
                     
         except Exception as e:
             logging.error(f"Error retrieving Stream URL: {e}")
             
         return None
 
+    def get_stream_url(self, room_id):
+        """
+        Fetches the FLV stream URL using the Room ID.
+        Uses live_core_sdk_data for highest quality stream selection (like original repo),
+        then legacy FLV, RTMP and HLS pull URLs.
+        """
+        stream_urls = self.get_stream_urls(room_id)
+        return stream_urls[0] if stream_urls else None
+
+    def get_stream_urls(self, room_id):
+        """
+        Fetches every stream URL of the room, best first: FLV variants
+        (main CDN before backup, highest quality first), then RTMP and HLS.
+        The recorder fails over along this list when a pull stalls.
+        """
+        catalog = self.get_stream_catalog(room_id)
+        if catalog is None:
+            return []
+        
+        variants = [v for protocol in ("flv", "rtmp", "hls") for v in catalog.candidates(protocol)]
+        if variants:
+            variant = variants[0]
+            print(f"[*] Using {variant.source} stream: {variant.quality} (level {variant.level}, {variant.protocol})")
+            print(f"[*] {len(variants) - 1} fallback stream URLs available")
+        
+        return list(dict.fromkeys(v.url for v in variants))
+
     def is_live(self):
         """
         Checks if the user is currently live.
@@ -282,10 +438,11 @@ class TikTok:
             return room_id, True
         return None, False
 
-    def start_recording(self, stream_url):
+    def start_recording(self, stream_url, fallback_urls=None, detected_at=None):
         """
         Starts the recording process using the Smart Recorder.
         Monitors for resolution changes (e.g. PK Battles) and restarts automatically.
+        Fails over to fallback_urls (backup CDN, lower qualities) when the stream stalls.
         """
         current_date = datetime.now().strftime("%Y.%m.%d_%H-%M-%S")
         filename = f"v02__{self.user}_{current_date}.mp4"
@@ -294,7 +451,20 @@ class TikTok:
         print(f"\n[*] [TikTok] Recording started for {self.user}")
         print(f"[*] [TikTok] Output: {output_path}")
 
-        # --- SMART RECORDING LOOP ---
+        first_session = True
+        handoff = {}  # FFmpeg carried over a resolution change
+
+        def on_first_byte(first_byte_at):
+            """Deferred start work, run once the recording receives data."""
+            nonlocal first_session
+            first_byte_seconds = None
+            if first_session and detected_at is not None:
+                # First session of this live: report the start latency
+                first_byte_seconds = first_byte_at - detected_at
+                print(f"[*] [TikTok] Detection to first byte: {first_byte_seconds:.2f}s")
+            first_session = False
+            self.status_manager.set_recording(filename, first_byte_seconds)
+
         # --- SMART RECORDING LOOP ---
         try:
             while True:
@@ -309,9 +479,11 @@ class TikTok:
                 
                 # Pass execution to the smart recorder module
                 # status will be: "FINISHED", "RESTART", "ERROR", or "MANUAL_STOP"
-                status = record_stream(stream_url, temp_path, self.ffmpeg, self.status_manager)
+                status = record_stream(stream_url, temp_path, self.ffmpeg, self.status_manager, self.stop_event,
+                                       fallback_urls, on_first_byte, self.ffmpeg_pool, self.thumbnail_path,
+                                       handoff)
                 
-                # The conversion already renamed the file (from _flv.mp4 to .mp4)
+                # The recorder already renamed the file (from _flv.mp4 to .mp4)
                 # so the final path is without the _flv suffix
                 final_path = temp_path.replace("_flv.mp4", ".mp4")
                 if os.path.exists(final_path):
@@ -327,9 +499,6 @@ class TikTok:
                     base_name = f"v02__{self.user}_{current_date}_{timestamp}.mp4"
                     filename = base_name # Update filename for next loop
                     output_path = os.path.join(self.output, base_name)
-                    
-                    # Small buffer to let the OS release file locks
-                    time.sleep(1)
                     continue 
                 
                 elif status == "FINISHED":
@@ -355,6 +524,57 @@ class TikTok:
         return "FINISHED"
         # ----------------------------
 
+    def set_offline(self):
+        """
+        Reports the user as offline on the console and in the status file.
+        """
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        print(f"[*] {timestamp} - {RED}{self.user} is offline.{RESET} Checking again...", end="\r")
+        self.status_manager.set_waiting()
+
+    def record_live(self, room_id, detected_at=None, record_history=False):
+        """
+        Records the live of the given room if it is currently live.
+        Returns the recording status, or None if the stream is not live.
+        
+        FFmpeg is started as soon as the stream URL is known; the status
+        update waits until bytes are flowing. The same FFmpeg refreshes the
+        thumbnail shown by the monitor.
+        
+        Args:
+            room_id: Room ID of the live
+            detected_at: When the live was detected (time.time()), used to
+                         measure the detection-to-first-byte latency
+            record_history: Record the session in the live history: its
+                            start as soon as the stream is found, its end
+                            only if the live ends (not on a manual stop or
+                            an error)
+        """
+        detected_at = detected_at or time.time()
+        
+        stream_urls = self.get_stream_urls(room_id)
+        if not stream_urls:
+            return None
+        stream_url = stream_urls[0]
+        
+        print(f"[*] {GREEN}{self.user} is LIVE!{RESET} (Room ID: {room_id})")
+        
+        # Written now, so a crash during the live still leaves its start
+        # (a live resumed after a manual stop or an error is the same session)
+        if record_history and self.live_started_at is None:
+            self.live_started_at = self.live_history.record_start(self.user, detected_at)
+        
+        status = self.start_recording(stream_url, stream_urls[1:], detected_at)
+        
+        if record_history and status == "FINISHED":
+            self.live_history.record_end(self.user, self.live_started_at)
+            self.live_started_at = None
+        
+        # The room is gone once the live ends - resolve it again next time
+        self.room_id_cache.invalidate(self.user)
+        
+        return status
+
     def run(self):
         """
         Main loop handling the 'automatic' or 'manual' modes.
@@ -362,77 +582,62 @@ class TikTok:
         print(f"[*] Target User: {self.user}")
         print(f"[*] Mode: {self.mode}")
         
+        # Stagger the first check so instances restarted together (e.g. after
+        # a container restart) don't poll in lockstep
+        if self.mode == "automatic":
+            delay = random.uniform(0, TimeOut.STARTUP_STAGGER * TimeOut.ONE_MINUTE)
+            print(f"[*] First check in {delay:.0f} seconds...")
+            try:
+                time.sleep(delay)
+            except KeyboardInterrupt:
+                print("\n[*] Stopped by user.")
+                self.status_manager.set_stopped()
+                return
+        
         while True:
             try:
                 room_id = self.get_room_id()
                 
-                if room_id:
-                    # Check if actually live via API
-                    stream_url = self.get_stream_url(room_id)
+                # Check if actually live via API and record if so
+                started_at = time.time()
+                status = self.record_live(room_id, started_at, record_history=True) if room_id else None
+                
+                if status is not None:
+                    # Handle different end statuses
+                    if status == "MANUAL_STOP":
+                         print(f"[*] Manual stop detected. Resuming monitoring in 3 seconds...")
+                         time.sleep(3)
+                         continue
+                    
+                    elif status == "FINISHED":
+                        # Stream ended naturally - check again soon
+                        if self.mode == "automatic":
+                            print(f"\n[*] {self.user} went offline. Waiting 30 seconds before checking again...")
+                            time.sleep(30)
+                            continue
+                        else:
+                            print(f"[*] Stream ended. Mode is manual, exiting.")
+                            break
                     
-                    if stream_url:
-                        print(f"[*] {GREEN}{self.user} is LIVE!{RESET} (Room ID: {room_id})")
-                        # Update status to RECORDING before starting
-                        current_date = datetime.now().strftime("%Y.%m.%d_%H-%M-%S")
-                        self.status_manager.set_recording(f"v02__{self.user}_{current_date}.mp4")
-                        
-                        # Start thumbnail capture in background
-                        try:
-                            self.thumbnail_capturer = ThumbnailCapturer(
-                                username=self.user,
-                                stream_url=stream_url,
-                                ffmpeg_path=self.ffmpeg,
-                                status_dir=self.status_manager.status_dir,  # Use same dir as status files
-                                capture_interval=60  # Update every 60 seconds
-                            )
-                            self.thumbnail_capturer.start()
-                        except Exception as thumb_err:
-                            print(f"[!] Thumbnail capture init failed: {thumb_err}")
-                        
-                        status = self.start_recording(stream_url)
-                        
-                        # Stop thumbnail capture when recording ends
-                        if self.thumbnail_capturer:
-                            self.thumbnail_capturer.stop()
-                        
-                        # Handle different end statuses
-                        if status == "MANUAL_STOP":
-                             print(f"[*] Manual stop detected. Resuming monitoring in 3 seconds...")
-                             time.sleep(3)
-                             continue
-                        
-                        elif status == "FINISHED":
-                            # Stream ended naturally - check again soon
-                            if self.mode == "automatic":
-                                print(f"\n[*] {self.user} went offline. Waiting 30 seconds before checking again...")
-                                time.sleep(30)
-                                continue
-                            else:
-                                print(f"[*] Stream ended. Mode is manual, exiting.")
-                                break
-                        
-                        elif status == "ERROR":
-                            # Error occurred - wait a bit and retry
-                            if self.mode == "automatic":
-                                print(f"\n[!] Error occurred. Retrying in 30 seconds...")
-                                time.sleep(30)
-                                continue
-                    else:
-                        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        print(f"[*] {timestamp} - {RED}{self.user} is offline.{RESET} Checking again...", end="\r")
-                        self.status_manager.set_waiting()
+                    elif status == "ERROR":
+                        # Error occurred - wait a bit and retry
+                        if self.mode == "automatic":
+                            print(f"\n[!] Error occurred. Retrying in 30 seconds...")
+                            time.sleep(30)
+                            continue
                 else:
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    print(f"[*] {timestamp} - {RED}{self.user} is offline.{RESET} Checking again...", end="\r")
-                    self.status_manager.set_waiting()
+                    self.live_started_at = None  # Its end was missed
+                    self.set_offline()
 
                 if self.mode == "manual":
                     break
                 
                 # Wait before checking again (Automatic mode)
+                # The interval is shorter around the user's usual live times.
                 # Use a loop with heartbeats instead of one long sleep
                 # to keep the status file fresh for the monitor
-                wait_seconds = int(self.interval * 60)
+                self.backoff.reset()
+                wait_seconds = int(jittered(self.poll_scheduler.interval_for(self.user)))
                 heartbeat_interval = 30  # Update status every 30 seconds
                 try:
                     for _ in range(0, wait_seconds, heartbeat_interval):
@@ -449,5 +654,6 @@ class TikTok:
                 self.status_manager.set_stopped()
                 break
             except Exception as e:
-                print(f"\n[!] Unexpected Error: {e}")
-                time.sleep(10)
\ No newline at end of file
+                delay = self.backoff.next()
+                print(f"\n[!] Unexpected Error: {e}. Retrying in {delay:.0f} seconds...")
+                time.sleep(delay)
\ No newline at end of file
@@ -62,7 +62,9 @@ def parse_args():
         dest="proxy",
         help=(
             "Use HTTP proxy to bypass login restrictions in some countries.\n"
-            "Example: -proxy http://127.0.0.1:8080"
+            "Several comma-separated proxies are used as a pool: API requests are\n"
+            "spread across the healthy ones, streams are downloaded directly.\n"
+            "Example: -proxy http://127.0.0.1:8080,http://127.0.0.1:8081"
         ),
         action="store",
     )
@@ -35,3 +35,15 @@ class NetworkError(TikTokRecorderError):
     """Raised for network-related errors."""
 
     pass
+
+
+class CircuitOpenError(TikTokRecorderError):
+    """Raised when requests to an endpoint are suspended by its circuit breaker."""
+
+    def __init__(self, endpoint, retry_after=0):
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+        super().__init__(
+            f"Requests to {endpoint} suspended after repeated blocks, "
+            f"retrying in {retry_after:.0f}s"
+        )
@@ -19,6 +19,8 @@ class TimeOut(IntEnum):
     ONE_MINUTE = 60
     AUTOMATIC_MODE = 5
     CONNECTION_CLOSED = 2
+    MAX_BACKOFF = 30
+    STARTUP_STAGGER = 1
 
 
 class StatusCode(IntEnum):
@@ -37,6 +39,24 @@ class Mode(IntEnum):
     FOLLOWERS = 2
 
 
+class Priority(IntEnum):
+    """
+    Enumeration that defines the rate limiter lanes.
+    """
+
+    ROUTINE = 0
+    LIVE_CONFIRMATION = 1
+
+
+class SpillPolicy(Enum):
+    """
+    What a recording does when its disk writes fall behind the stream.
+    """
+
+    BLOCK = "block"  # Wait for the disk (stalls the network read)
+    SPILL = "spill"  # Keep reading into a spill file on local disk
+
+
 class Error(Enum):
     """
     Enumeration that contains possible errors while using TikTok-Live-Recorder.
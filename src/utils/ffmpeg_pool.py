@@ -0,0 +1,549 @@
+"""
+FFmpeg Pool for TikTok Live Recorder.
+
+Starting FFmpeg (process spawn, library loading, codec registration) is
+paid again at every recording, failover and restart. The pool keeps a few
+FFmpeg processes already started and idle, each waiting for an FLV stream
+on its stdin (-f flv -i pipe:0). Claiming a worker hands it a stream URL:
+a StreamFeeder thread downloads the stream and pipes it into the worker,
+reading the video resolution from the FLV tags on the way.
+
+FFmpeg only opens its output once its input is probed, but the output
+path has to be given when it is spawned: workers write to a hidden spool
+file in the output directory, renamed by the recorder when it finalizes.
+The same goes for the thumbnail each worker periodically writes from the
+stream it records (thumbnail_args), published by the recorder under the
+user's name.
+
+Recordings are written as fragmented MP4 (LIVE_MP4_ARGS): playable while
+they are recorded, and final once renamed.
+
+Idle workers are recycled after max_idle seconds and the pool is topped
+back up in the background after every claim.
+"""
+
+import io
+import itertools
+import os
+import subprocess
+import threading
+import time
+from typing import List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from utils.flv import FlvError, FlvReader, video_resolution
+
+
+# Idle workers kept ready
+DEFAULT_POOL_SIZE = 1
+
+# Seconds an idle worker is kept before being replaced by a fresh one
+MAX_IDLE = 30 * 60
+
+# Bytes read from the stream per write to FFmpeg
+CHUNK_SIZE = 64 * 1024
+
+# Seconds to wait for the stream to connect / send data
+READ_TIMEOUT = 10
+
+# After a split, audio older than the split point still goes to the previous
+# worker, for at most this long (stream milliseconds)
+SPLIT_AUDIO_GRACE = 1000
+
+# Seconds between pool maintenance passes
+MAINTENANCE_INTERVAL = 5
+
+# Fragmented MP4 output: the file is playable (and survives a crash) while
+# it's written, so finalizing it is a rename instead of a remux. Fragments
+# are also cut every FRAGMENT_DURATION microseconds, so the output keeps
+# growing (and the recording doesn't look stalled) during long GOPs
+FRAGMENT_DURATION = 1000000
+LIVE_MP4_ARGS = [
+    "-movflags",
+    "+frag_keyframe+empty_moov+default_base_moof",
+    "-frag_duration",
+    str(FRAGMENT_DURATION),
+]
+
+# Seconds between two thumbnails, and their height (pixels)
+THUMBNAIL_INTERVAL = 60
+THUMBNAIL_HEIGHT = 400
+
+
+def is_flv_url(url: str) -> bool:
+    """True for HTTP(S) FLV streams, the only ones a worker can be fed."""
+    parsed = urlparse(url)
+    return parsed.scheme in ("http", "https") and parsed.path.endswith(".flv")
+
+
+def thumbnail_args(path: str, interval: int = THUMBNAIL_INTERVAL) -> List[str]:
+    """
+    FFmpeg output arguments writing a JPEG of the first keyframe, then one
+    every `interval` seconds, to path (overwritten atomically). Meant to
+    be added next to the recording output, with "-skip_frame nokey" as an
+    input option so that only keyframes are decoded.
+    """
+    return [
+        "-map",
+        "0:v:0",
+        "-vf",
+        f"select='isnan(prev_selected_t)+gte(t-prev_selected_t,{interval})',"
+        f"scale=-2:{THUMBNAIL_HEIGHT}",
+        "-fps_mode",
+        "drop",  # Fresh timestamps: a stream timestamp reset can't fail the encoder
+        "-q:v",
+        "2",
+        "-f",
+        "image2",
+        "-update",
+        "1",
+        "-atomic_writing",
+        "1",
+        path,
+    ]
+
+
+class FfmpegWorker:
+    """
+    One pre-spawned FFmpeg process recording whatever FLV it receives on
+    its stdin. Mimics the subset of subprocess.Popen used by the recorder
+    (poll, wait, terminate, kill, stderr as text).
+    """
+
+    def __init__(
+        self, ffmpeg_path: str, output_path: str, thumbnail_path: Optional[str] = None
+    ):
+        """
+        Spawn the worker.
+
+        Args:
+            ffmpeg_path: Path to ffmpeg executable
+            output_path: File the recording is written to
+            thumbnail_path: Optional JPEG refreshed from the stream
+        """
+        self.output_path = output_path
+        self.thumbnail_path = thumbnail_path
+        self.spawned_at = time.monotonic()
+
+        cmd = [ffmpeg_path, "-y", "-nostdin", "-loglevel", "info"]
+        if thumbnail_path:
+            cmd += ["-skip_frame", "nokey"]  # Only the thumbnail output decodes
+        cmd += ["-f", "flv", "-i", "pipe:0", "-c", "copy", *LIVE_MP4_ARGS, output_path]
+        if thumbnail_path:
+            cmd += thumbnail_args(thumbnail_path)
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        self.stderr = io.TextIOWrapper(
+            self.process.stderr, encoding="utf-8", errors="replace"
+        )
+
+        self.feeder = None
+        self._input_lock = threading.Lock()
+
+    def is_idle(self) -> bool:
+        """True if the worker is alive and was never fed."""
+        return self.feeder is None and self.process.poll() is None
+
+    def feed(
+        self, url: str, on_first_byte=None, on_resolution=None, on_split=None
+    ) -> "StreamFeeder":
+        """Start piping the stream at url into the worker (see StreamFeeder)."""
+        self.feeder = StreamFeeder(url, self, on_first_byte, on_resolution, on_split)
+        self.feeder.start()
+        return self.feeder
+
+    def _stop_feeding(self):
+        """Stop the feeder, unless it has moved on to another worker."""
+        if self.feeder is not None and self.feeder.worker is self:
+            self.feeder.stop()
+
+    def write(self, data) -> bool:
+        """Write data to FFmpeg's input. Returns False once it is closed."""
+        with self._input_lock:
+            try:
+                self.process.stdin.write(data)
+                return True
+            except (OSError, ValueError):
+                return False
+
+    def close_input(self) -> None:
+        """End of input: FFmpeg finalizes the output and exits."""
+        with self._input_lock:
+            try:
+                self.process.stdin.close()
+            except (OSError, ValueError):
+                pass
+
+    def stop(self, timeout: float = 5) -> None:
+        """Stop feeding and let FFmpeg finalize, killing it if it hangs."""
+        self._stop_feeding()
+        self.close_input()
+
+        try:
+            self.process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def poll(self):
+        return self.process.poll()
+
+    def wait(self, timeout=None):
+        return self.process.wait(timeout=timeout)
+
+    def terminate(self):
+        self._stop_feeding()
+        self.process.terminate()
+
+    def kill(self):
+        self._stop_feeding()
+        self.process.kill()
+
+
+class StreamFeeder:
+    """
+    Downloads an FLV stream and pipes it, tag by tag, into a worker.
+
+    The tags are inspected on the way (utils.flv): a new video sequence
+    header with other dimensions is reported through on_resolution, so
+    resolution changes are seen without probing the stream again. Data
+    that is not FLV is passed through untouched.
+
+    With on_split, a resolution change also moves the stream to the worker
+    it returns, exactly at the new sequence header (followed by the
+    keyframe): the new worker gets a fresh FLV header, the audio config
+    and everything from the split point on, while the previous one still
+    receives the audio older than the split point, then its input is
+    closed. Nothing is lost or recorded twice at the boundary.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        worker: FfmpegWorker,
+        on_first_byte=None,
+        on_resolution=None,
+        on_split=None,
+    ):
+        """
+        Initialize the feeder.
+
+        Args:
+            url: FLV stream URL
+            worker: Worker the stream is written to
+            on_first_byte: Optional callback(first_byte_at) run when the
+                           first bytes are received
+            on_resolution: Optional callback((width, height)) run for the
+                           first video sequence header and every change
+            on_split: Optional callback((width, height)) run on a change,
+                      returning the worker to continue into (or None)
+        """
+        self.url = url
+        self.worker = worker
+        self.on_first_byte = on_first_byte
+        self.on_resolution = on_resolution
+        self.on_split = on_split
+
+        self.first_byte_at = None
+        self.last_data_at = None
+        self.bytes_read = 0
+        self.resolution = None
+        self.error = None
+
+        self._reader = FlvReader()
+        self._video_config = None
+        self._audio_config = None
+        self._previous = None
+        self._split_at = None
+        self._response = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._feed_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop reading; the worker's input is closed by the feed thread."""
+        self._stop.set()
+        response = self._response
+        if response is not None:
+            try:
+                response.close()  # Unblocks a pending read
+            except Exception:
+                pass
+
+    def _feed_loop(self):
+        try:
+            self._response = requests.get(self.url, stream=True, timeout=READ_TIMEOUT)
+            self._response.raise_for_status()
+
+            for chunk in self._response.iter_content(CHUNK_SIZE):
+                if self._stop.is_set():
+                    break
+                if not chunk:
+                    continue
+
+                now = time.time()
+                if self.first_byte_at is None:
+                    self.first_byte_at = now
+                    if self.on_first_byte:
+                        self.on_first_byte(now)
+                self.last_data_at = now
+                self.bytes_read += len(chunk)
+
+                if not self._write(chunk):
+                    break
+        except Exception as e:
+            # Stream ended or dropped: the recorder fails over
+            if not self._stop.is_set():
+                self.error = e
+        finally:
+            self._release_previous()
+            self.worker.close_input()
+            if self._response is not None:
+                self._response.close()
+
+    def _write(self, chunk) -> bool:
+        """Write a network chunk to the worker, inspecting the FLV tags in it."""
+        if self._reader is None:
+            return self.worker.write(chunk)
+
+        had_header = self._reader.header is not None
+        try:
+            tags = self._reader.feed(chunk)
+        except FlvError:
+            # Not FLV after all: pass the stream through as is
+            print(
+                "[!] [FfmpegPool] Stream is not FLV, resolution changes won't be detected"
+            )
+            self._reader = None
+            return self.worker.write(chunk)
+
+        if not had_header and self._reader.header is not None:
+            if not self.worker.write(self._reader.header):
+                return False
+
+        for tag in tags:
+            if tag.is_video:
+                self._inspect_video(tag)
+            elif tag.is_audio_config:
+                self._audio_config = tag.raw
+
+            if self._previous is not None and self._route_to_previous(tag):
+                self._previous.write(tag.raw)  # Its input may be closed already
+            elif not self.worker.write(tag.raw):
+                return False
+        return True
+
+    def _inspect_video(self, tag):
+        config = tag.video_config()
+        if config is None or config == self._video_config:
+            return
+        self._video_config = config
+
+        resolution = video_resolution(*config)
+        if resolution and resolution != self.resolution:
+            if self.resolution is not None and self.on_split:
+                self._split(tag, resolution)
+            self.resolution = resolution
+            if self.on_resolution:
+                self.on_resolution(resolution)
+
+    def _split(self, tag, resolution):
+        """Continue into a new worker from this sequence header on."""
+        worker = self.on_split(resolution)
+        if worker is None:
+            return
+
+        worker.feeder = self
+        worker.write(self._reader.header)
+        if self._audio_config is not None:
+            worker.write(self._audio_config)
+
+        self._release_previous()
+        self._previous, self.worker = self.worker, worker
+        self._split_at = tag.timestamp
+
+    def _route_to_previous(self, tag) -> bool:
+        """
+        True if the tag belongs before the split point. The previous worker
+        is released once the audio has caught up with the split point.
+        """
+        if tag.is_audio and tag.timestamp < self._split_at:
+            return True
+        if tag.is_audio or tag.timestamp - self._split_at > SPLIT_AUDIO_GRACE:
+            self._release_previous()
+        return False
+
+    def _release_previous(self):
+        if self._previous is not None:
+            self._previous.close_input()
+            self._previous = None
+
+
+class FfmpegPool:
+    """
+    Keeps `size` idle FFmpeg workers ready to be claimed by record_stream.
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        ffmpeg_path: str = "ffmpeg",
+        size: int = DEFAULT_POOL_SIZE,
+        max_idle: float = MAX_IDLE,
+        thumbnail_dir: Optional[str] = None,
+    ):
+        """
+        Initialize the pool (workers are spawned by start()).
+
+        Args:
+            output_dir: Directory the recordings are written to (spool files
+                        are created there so that finalizing is a rename)
+            ffmpeg_path: Path to ffmpeg executable
+            size: Idle workers kept ready
+            max_idle: Seconds before an idle worker is recycled
+            thumbnail_dir: Optional directory where workers write their
+                           thumbnails (the status directory)
+        """
+        self.output_dir = output_dir
+        self.ffmpeg_path = ffmpeg_path
+        self.size = size
+        self.max_idle = max_idle
+        self.thumbnail_dir = thumbnail_dir
+
+        self.warm_claims = 0
+        self.cold_claims = 0
+        self.recycled = 0
+
+        self._idle: List[FfmpegWorker] = []
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = threading.Event()
+        self._thread = None
+
+    def _spawn(self) -> Optional[FfmpegWorker]:
+        name = f".ffmpeg_pool_{os.getpid()}_{next(self._counter)}"
+        path = os.path.join(self.output_dir, name + "_flv.mp4")
+        thumbnail_path = (
+            os.path.join(self.thumbnail_dir, name + ".jpg")
+            if self.thumbnail_dir
+            else None
+        )
+        try:
+            return FfmpegWorker(self.ffmpeg_path, path, thumbnail_path)
+        except Exception as e:
+            print(f"[!] [FfmpegPool] Could not start FFmpeg: {e}")
+            return None
+
+    def start(self):
+        """Spawn the idle workers and start the maintenance thread."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.thumbnail_dir:
+            os.makedirs(self.thumbnail_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._maintain_loop, daemon=True)
+        self._thread.start()
+
+    def _maintain_loop(self):
+        while not self._closed.is_set():
+            try:
+                self._maintain()
+            except Exception as e:
+                print(f"[!] [FfmpegPool] Maintenance error: {e}")
+            self._wakeup.wait(timeout=MAINTENANCE_INTERVAL)
+            self._wakeup.clear()
+
+    def _maintain(self):
+        """Drop dead workers, recycle stale ones and top the pool up."""
+        now = time.monotonic()
+        with self._lock:
+            stale = [
+                w
+                for w in self._idle
+                if not w.is_idle() or now - w.spawned_at > self.max_idle
+            ]
+            self._idle = [w for w in self._idle if w not in stale]
+            missing = self.size - len(self._idle)
+
+        for worker in stale:
+            self.recycled += 1
+            self._discard(worker)
+
+        for _ in range(missing):
+            if self._closed.is_set():
+                return
+            worker = self._spawn()
+            if worker is None:
+                return  # Retried on the next pass
+            with self._lock:
+                self._idle.append(worker)
+
+    def claim(self) -> Optional[FfmpegWorker]:
+        """
+        Take an idle worker (spawning one if none is ready).
+        Returns None if FFmpeg could not be started.
+        """
+        worker = None
+        dead = []
+        with self._lock:
+            while self._idle and worker is None:
+                candidate = self._idle.pop(0)
+                if candidate.is_idle():
+                    worker = candidate
+                else:
+                    dead.append(candidate)
+
+        for candidate in dead:
+            self._discard(candidate)
+
+        if worker is not None:
+            self.warm_claims += 1
+        else:
+            worker = self._spawn()
+            if worker is not None:
+                self.cold_claims += 1
+
+        self._wakeup.set()  # Replace the claimed worker
+        return worker
+
+    def _discard(self, worker: FfmpegWorker):
+        try:
+            worker.kill()
+            worker.wait(timeout=5)
+        except Exception:
+            pass
+        for path in (worker.output_path, worker.thumbnail_path):
+            try:
+                if path and os.path.exists(path):
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def close(self):
+        """Stop the maintenance thread and kill the idle workers."""
+        self._closed.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            self._discard(worker)
+
+    def summary(self) -> str:
+        return (
+            f"FFmpeg pool: {self.warm_claims} warm claims, {self.cold_claims} cold starts, "
+            f"{self.recycled} idle workers recycled"
+        )
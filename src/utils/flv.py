@@ -0,0 +1,528 @@
+"""
+FLV parsing for TikTok Live Recorder.
+
+A small incremental FLV reader: bytes are fed as they arrive from the
+network and complete tags come out, so the stream can be inspected on the
+way to FFmpeg (resolution of the video sequence headers, keyframes...)
+without a second connection or an ffprobe process.
+
+FlvStitcher joins the streams of successive connections of a recording
+into one continuous FLV, and splits it into parts where the video codec
+parameters change.
+
+Both the legacy codec ids (7 = AVC, 12 = HEVC) and the enhanced FLV
+FourCC video headers are understood.
+"""
+
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+
+FLV_SIGNATURE = b"FLV"
+
+TAG_AUDIO = 8
+TAG_VIDEO = 9
+TAG_SCRIPT = 18
+
+# Tag header (11 bytes) + trailing PreviousTagSize (4 bytes)
+TAG_HEADER_SIZE = 11
+TAG_TRAILER_SIZE = 4
+
+FRAME_KEY = 1
+
+SOUND_FORMAT_AAC = 10
+
+# Legacy FLV video codec ids
+LEGACY_VIDEO_CODECS = {7: "avc1", 12: "hvc1"}
+
+# H.264 profiles whose SPS carries chroma format / bit depth / scaling lists
+AVC_HIGH_PROFILES = (100, 110, 122, 244, 44, 83, 86, 118, 128, 138, 139, 134, 135)
+
+HEVC_NAL_SPS = 33
+
+# Timestamp step between the last tag of a connection and the first of the next (ms)
+RECONNECT_GAP = 40
+
+
+class FlvError(Exception):
+    """The data is not a (supported) FLV stream."""
+
+
+@dataclass
+class FlvTag:
+    """One complete FLV tag, raw bytes included (header to PreviousTagSize)."""
+
+    tag_type: int
+    timestamp: int  # milliseconds
+    raw: bytes
+
+    @property
+    def payload(self) -> memoryview:
+        return memoryview(self.raw)[TAG_HEADER_SIZE:-TAG_TRAILER_SIZE]
+
+    @property
+    def is_video(self) -> bool:
+        return self.tag_type == TAG_VIDEO
+
+    @property
+    def is_audio(self) -> bool:
+        return self.tag_type == TAG_AUDIO
+
+    def video_header(self) -> Optional[Tuple[int, str, int, int]]:
+        """
+        (frame type, codec, packet type, offset of the codec data) of a
+        video tag, or None. Packet type 0 is a sequence header in both the
+        legacy and the enhanced format.
+        """
+        payload = self.payload
+        if not self.is_video or len(payload) < 5:
+            return None
+
+        first = payload[0]
+        if first & 0x80:
+            # Enhanced FLV: [1 IsExHeader | 3 FrameType | 4 PacketType] FourCC
+            fourcc = bytes(payload[1:5]).decode("ascii", "replace")
+            return (first >> 4) & 0x07, fourcc, first & 0x0F, 5
+
+        codec = LEGACY_VIDEO_CODECS.get(first & 0x0F)
+        if codec is None:
+            return None
+        # [4 FrameType | 4 CodecId] PacketType CompositionTime(3)
+        return first >> 4, codec, payload[1], 5
+
+    @property
+    def is_keyframe(self) -> bool:
+        header = self.video_header()
+        return header is not None and header[0] == FRAME_KEY
+
+    @property
+    def is_audio_config(self) -> bool:
+        """True for an AAC sequence header (AudioSpecificConfig)."""
+        payload = self.payload
+        return (
+            self.is_audio
+            and len(payload) >= 2
+            and payload[0] >> 4 == SOUND_FORMAT_AAC
+            and payload[1] == 0
+        )
+
+    def video_config(self) -> Optional[Tuple[str, bytes]]:
+        """(codec, decoder configuration record) of a video sequence header, or None."""
+        header = self.video_header()
+        if header is None or header[2] != 0:
+            return None
+        _, codec, _, offset = header
+        return codec, bytes(self.payload[offset:])
+
+
+class FlvReader:
+    """
+    Incremental FLV parser: feed() it network chunks, get complete tags.
+    The file header (with PreviousTagSize0) is kept in `header`.
+    """
+
+    def __init__(self):
+        self.header: Optional[bytes] = None
+        self._buffer = bytearray()
+
+    def feed(self, data) -> List[FlvTag]:
+        """
+        Add data and return the tags it completed.
+
+        Raises:
+            FlvError: If the stream does not start with an FLV header
+        """
+        buffer = self._buffer
+        buffer += data
+        pos = 0
+
+        if self.header is None:
+            if len(buffer) < 13:
+                return []
+            if buffer[:3] != FLV_SIGNATURE:
+                raise FlvError("missing FLV signature")
+            header_size = int.from_bytes(buffer[5:9], "big")
+            if len(buffer) < header_size + TAG_TRAILER_SIZE:
+                return []
+            pos = header_size + TAG_TRAILER_SIZE
+            self.header = bytes(buffer[:pos])
+
+        tags = []
+        while len(buffer) - pos >= TAG_HEADER_SIZE:
+            data_size = int.from_bytes(buffer[pos + 1 : pos + 4], "big")
+            end = pos + TAG_HEADER_SIZE + data_size + TAG_TRAILER_SIZE
+            if end > len(buffer):
+                break
+
+            timestamp = int.from_bytes(buffer[pos + 4 : pos + 7], "big") | (
+                buffer[pos + 7] << 24
+            )
+            tags.append(FlvTag(buffer[pos] & 0x1F, timestamp, bytes(buffer[pos:end])))
+            pos = end
+
+        del buffer[:pos]
+        return tags
+
+
+class BitReader:
+    """MSB-first bit reader with Exp-Golomb codes, for H.264/H.265 parameter sets."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def bits(self, count: int) -> int:
+        value = 0
+        for _ in range(count):
+            byte = self.data[self.pos >> 3]
+            value = (value << 1) | ((byte >> (7 - (self.pos & 7))) & 1)
+            self.pos += 1
+        return value
+
+    def skip(self, count: int) -> None:
+        self.pos += count
+
+    def ue(self) -> int:
+        zeros = 0
+        while self.bits(1) == 0:
+            zeros += 1
+        return (1 << zeros) - 1 + self.bits(zeros)
+
+    def se(self) -> int:
+        value = self.ue()
+        return (value + 1) // 2 if value & 1 else -(value // 2)
+
+
+def _rbsp(nal: bytes) -> bytes:
+    """Remove the emulation prevention bytes (00 00 03 -> 00 00)."""
+    return nal.replace(b"\x00\x00\x03", b"\x00\x00")
+
+
+def _avc_sps_resolution(sps: bytes) -> Tuple[int, int]:
+    reader = BitReader(_rbsp(sps[1:]))  # Skip the NAL header
+    profile_idc = reader.bits(8)
+    reader.skip(16)  # constraint flags, level_idc
+    reader.ue()  # seq_parameter_set_id
+
+    chroma_format_idc = 1
+    separate_colour_plane = 0
+    if profile_idc in AVC_HIGH_PROFILES:
+        chroma_format_idc = reader.ue()
+        if chroma_format_idc == 3:
+            separate_colour_plane = reader.bits(1)
+        reader.ue()  # bit_depth_luma_minus8
+        reader.ue()  # bit_depth_chroma_minus8
+        reader.skip(1)  # qpprime_y_zero_transform_bypass_flag
+        if reader.bits(1):  # seq_scaling_matrix_present_flag
+            for i in range(12 if chroma_format_idc == 3 else 8):
+                if reader.bits(1):
+                    last_scale = next_scale = 8
+                    for _ in range(16 if i < 6 else 64):
+                        if next_scale:
+                            next_scale = (last_scale + reader.se() + 256) % 256
+                        last_scale = next_scale or last_scale
+
+    reader.ue()  # log2_max_frame_num_minus4
+    pic_order_cnt_type = reader.ue()
+    if pic_order_cnt_type == 0:
+        reader.ue()  # log2_max_pic_order_cnt_lsb_minus4
+    elif pic_order_cnt_type == 1:
+        reader.skip(1)  # delta_pic_order_always_zero_flag
+        reader.se()
+        reader.se()
+        for _ in range(reader.ue()):
+            reader.se()
+
+    reader.ue()  # max_num_ref_frames
+    reader.skip(1)  # gaps_in_frame_num_value_allowed_flag
+    width_in_mbs = reader.ue() + 1
+    height_in_map_units = reader.ue() + 1
+    frame_mbs_only = reader.bits(1)
+    if not frame_mbs_only:
+        reader.skip(1)  # mb_adaptive_frame_field_flag
+    reader.skip(1)  # direct_8x8_inference_flag
+
+    width = width_in_mbs * 16
+    height = (2 - frame_mbs_only) * height_in_map_units * 16
+
+    if reader.bits(1):  # frame_cropping_flag
+        left, right, top, bottom = reader.ue(), reader.ue(), reader.ue(), reader.ue()
+        if separate_colour_plane or chroma_format_idc == 0:
+            crop_x, crop_y = 1, 2 - frame_mbs_only
+        else:
+            crop_x = 2 if chroma_format_idc in (1, 2) else 1
+            crop_y = (2 if chroma_format_idc == 1 else 1) * (2 - frame_mbs_only)
+        width -= crop_x * (left + right)
+        height -= crop_y * (top + bottom)
+
+    return width, height
+
+
+def _hevc_sps_resolution(sps: bytes) -> Tuple[int, int]:
+    reader = BitReader(_rbsp(sps[2:]))  # Skip the 2-byte NAL header
+    reader.skip(4)  # sps_video_parameter_set_id
+    max_sub_layers_minus1 = reader.bits(3)
+    reader.skip(1)  # sps_temporal_id_nesting_flag
+
+    # profile_tier_level()
+    reader.skip(96)  # general profile (88 bits) + general_level_idc
+    sub_layers = [
+        (reader.bits(1), reader.bits(1)) for _ in range(max_sub_layers_minus1)
+    ]
+    if max_sub_layers_minus1 > 0:
+        reader.skip(2 * (8 - max_sub_layers_minus1))
+    for profile_present, level_present in sub_layers:
+        reader.skip(88 * profile_present + 8 * level_present)
+
+    reader.ue()  # sps_seq_parameter_set_id
+    chroma_format_idc = reader.ue()
+    if chroma_format_idc == 3:
+        reader.skip(1)  # separate_colour_plane_flag
+    width = reader.ue()
+    height = reader.ue()
+
+    if reader.bits(1):  # conformance_window_flag
+        left, right, top, bottom = reader.ue(), reader.ue(), reader.ue(), reader.ue()
+        sub_width = 2 if chroma_format_idc in (1, 2) else 1
+        sub_height = 2 if chroma_format_idc == 1 else 1
+        width -= sub_width * (left + right)
+        height -= sub_height * (top + bottom)
+
+    return width, height
+
+
+def _avc_sps(config: bytes) -> Optional[bytes]:
+    """First SPS of an AVCDecoderConfigurationRecord."""
+    if len(config) < 8 or not config[5] & 0x1F:
+        return None
+    length = int.from_bytes(config[6:8], "big")
+    return config[8 : 8 + length]
+
+
+def _hevc_sps(config: bytes) -> Optional[bytes]:
+    """First SPS of an HEVCDecoderConfigurationRecord."""
+    if len(config) < 23:
+        return None
+    pos = 23
+    for _ in range(config[22]):
+        nal_type = config[pos] & 0x3F
+        count = int.from_bytes(config[pos + 1 : pos + 3], "big")
+        pos += 3
+        for _ in range(count):
+            length = int.from_bytes(config[pos : pos + 2], "big")
+            if nal_type == HEVC_NAL_SPS:
+                return config[pos + 2 : pos + 2 + length]
+            pos += 2 + length
+    return None
+
+
+def video_resolution(codec: str, config: bytes) -> Optional[Tuple[int, int]]:
+    """
+    (width, height) described by a video decoder configuration record
+    (the body of a sequence header tag), or None if it can't be parsed.
+    """
+    try:
+        if codec == "avc1":
+            sps = _avc_sps(config)
+            return _avc_sps_resolution(sps) if sps else None
+        if codec == "hvc1":
+            sps = _hevc_sps(config)
+            return _hevc_sps_resolution(sps) if sps else None
+    except IndexError:
+        pass  # Truncated parameter set
+    return None
+
+
+class FlvStitcher:
+    """
+    Joins the FLV streams of successive connections into one continuous
+    FLV: after a reconnection the new FLV header, the script data and the
+    repeated (unchanged) sequence headers are dropped, and timestamps are
+    rebased to carry on where the previous connection stopped.
+
+    feed() works in place on the blocks read from the network and returns
+    the parts to write: memoryviews of the block (timestamps rewritten in
+    it) and copies of the tags that straddle two blocks. Only complete
+    tags are returned, so a connection breaking mid-tag leaves no torn tag
+    in the file. Data that isn't FLV is passed through unchanged.
+
+    A video sequence header with new parameters (resolution, profile...)
+    starts a new part: a None entry in the returned parts, followed by an
+    FLV header and the audio config, then the new sequence header and its
+    keyframe with timestamps starting again from 0.
+
+    The resolution, keyframe count, last timestamp and audio config of
+    the stream are tracked on the way.
+    """
+
+    def __init__(self):
+        self.connections = 0
+        self.passthrough = False
+        self.parts = 1
+        self.resolution: Optional[Tuple[int, int]] = None
+        self.keyframes = 0
+        self._header = None  # FLV header of the first connection
+        self._audio_config = None  # Raw AAC sequence header tag
+        self._split = False  # The tag just kept starts a new part
+        self._carry = bytearray()  # Start of an object completed by the next block
+        self._taken = 0  # Bytes of the block fed so far moved into _carry
+        self._expect_header = True
+        self._rebase = False  # The next media tag sets the timestamp offset
+        self._offset = 0
+        self._last_timestamp = None  # Last written (rebased) timestamp
+        self._configs = {}  # tag type -> sequence header written last
+
+    def new_connection(self) -> None:
+        """A new connection starts: its data begins with an FLV header."""
+        self.connections += 1
+        self._carry = bytearray()  # Torn tag of the previous connection
+        self._expect_header = True
+        self._rebase = self._last_timestamp is not None
+
+    def feed(self, block) -> List[memoryview]:
+        """Parts of the block (and of the carried over data) to write."""
+        view = memoryview(block)
+        if self.passthrough:
+            return [view]
+        self._taken = 0
+        try:
+            return self._feed(view)
+        except FlvError:
+            self.passthrough = True
+            return [memoryview(bytes(self._carry)), view[self._taken :]]
+
+    def _feed(self, view) -> List[memoryview]:
+        parts = []
+        pos = 0
+
+        # Complete the object carried over from the previous block
+        while self._carry:
+            need = self._object_size(self._carry)
+            if len(self._carry) < need:
+                if pos == len(view):
+                    return parts
+                take = min(need - len(self._carry), len(view) - pos)
+                self._carry += view[pos : pos + take]
+                pos += take
+                self._taken = pos
+                continue
+
+            carried = memoryview(self._carry)
+            self._carry = bytearray()
+            keep = self._keep(carried)
+            if self._split:
+                parts.extend(self._new_part())
+            if keep:
+                parts.append(carried)
+
+        # Complete objects of the block, in runs of kept ones
+        run = pos
+        while True:
+            size = self._object_size(view[pos : pos + TAG_HEADER_SIZE])
+            if len(view) - pos < size:
+                break
+            keep = self._keep(view[pos : pos + size])
+            if self._split:
+                if run < pos:
+                    parts.append(view[run:pos])
+                parts.extend(self._new_part())
+                run = pos
+            if not keep:
+                if run < pos:
+                    parts.append(view[run:pos])
+                run = pos + size
+            pos += size
+
+        if run < pos:
+            parts.append(view[run:pos])
+        self._carry = bytearray(view[pos:])
+        return parts
+
+    def _new_part(self) -> list:
+        """Marker and head of a new part (FLV header, audio config at 0 ms)."""
+        self._split = False
+        self.parts += 1
+        head = [None, memoryview(self._header)]
+        if self._audio_config is not None:
+            config = bytearray(self._audio_config)
+            config[4:8] = bytes(4)
+            head.append(memoryview(config))
+        return head
+
+    def _object_size(self, data) -> int:
+        """
+        Size of the header or tag starting with data (a minimum if data is
+        too short to tell).
+
+        Raises:
+            FlvError: If a connection does not start with an FLV header
+        """
+        if self._expect_header:
+            if len(data) >= 3 and bytes(data[:3]) != FLV_SIGNATURE:
+                raise FlvError("missing FLV signature")
+            if len(data) < 9:
+                return 9 + TAG_TRAILER_SIZE
+            return int.from_bytes(data[5:9], "big") + TAG_TRAILER_SIZE
+        if len(data) < TAG_HEADER_SIZE:
+            return TAG_HEADER_SIZE + TAG_TRAILER_SIZE
+        return TAG_HEADER_SIZE + int.from_bytes(data[1:4], "big") + TAG_TRAILER_SIZE
+
+    def _keep(self, data) -> bool:
+        """
+        Whether to write a complete header or tag, rebasing its timestamp
+        in place.
+
+        Raises:
+            FlvError: If a connection does not start with an FLV header
+        """
+        first_connection = self.connections <= 1
+        if self._expect_header:
+            if bytes(data[:3]) != FLV_SIGNATURE:
+                raise FlvError("missing FLV signature")
+            self._expect_header = False
+            if first_connection:
+                self._header = bytes(data)
+            return first_connection
+
+        tag_type = data[0] & 0x1F
+        if tag_type not in (TAG_AUDIO, TAG_VIDEO):
+            return (
+                first_connection  # Script data (metadata) of the first connection only
+            )
+
+        timestamp = int.from_bytes(data[4:7], "big") | (data[7] << 24)
+        tag = FlvTag(tag_type, timestamp, data)
+        video_config = tag.video_config()
+        config = (
+            video_config[1]
+            if video_config
+            else (bytes(tag.payload) if tag.is_audio_config else None)
+        )
+        if config is not None:
+            previous = self._configs.get(tag_type)
+            if previous == config:
+                return False  # Repeated by a reconnection
+            self._configs[tag_type] = config
+
+            if video_config:
+                self.resolution = video_resolution(*video_config)
+                # New video parameters: a new part from this sequence header on
+                self._split = previous is not None and self._header is not None
+            else:
+                self._audio_config = bytes(data)
+        elif tag.is_keyframe:
+            self.keyframes += 1
+
+        if self._rebase:
+            self._offset = self._last_timestamp + RECONNECT_GAP - timestamp
+            self._rebase = False
+        if self._split:
+            self._offset = -timestamp
+            self._last_timestamp = 0
+        if self._offset:
+            timestamp = max(0, timestamp + self._offset)
+            data[4:7] = (timestamp & 0xFFFFFF).to_bytes(3, "big")
+            data[7] = (timestamp >> 24) & 0xFF
+
+        self._last_timestamp = max(self._last_timestamp or 0, timestamp)
+        return True
@@ -0,0 +1,106 @@
+"""
+Follow List Cache for TikTok Live Recorder.
+
+Followers mode used to fetch a new msToken (and look up the sec_uid of
+the authenticated account) for every sweep of the follow list. This module
+persists both, so they are reused until they expire.
+
+The follow list itself is not cached: a sweep needs the current room_id
+of every follow to tell who is live, so it always reads every page.
+
+The cache is a JSON document stored as {key}.cache in the status
+directory (not .json, so it is never mistaken for a status file).
+"""
+
+import json
+import os
+import time
+from typing import Optional
+
+
+# Default status directory (same as status_manager.py)
+DEFAULT_STATUS_DIR = ".tiktok_status"
+
+# How long an msToken is reused (seconds)
+MS_TOKEN_TTL = 7200
+
+# How long the sec_uid of the authenticated user is reused (seconds)
+SEC_UID_TTL = 86400
+
+
+class FollowListCache:
+    """
+    Persisted msToken and sec_uid of the follow list requests.
+    """
+
+    def __init__(self, key: str, status_dir: str = DEFAULT_STATUS_DIR):
+        """
+        Initialize the cache and load it from disk.
+
+        Args:
+            key: Identifies the authenticated account (one file per key)
+            status_dir: Directory holding the cache file
+        """
+        self.path = os.path.join(status_dir, f"follow_list_{key}.cache")
+
+        self.ms_token: Optional[str] = None
+        self.ms_token_at = 0.0
+        self.sec_uid: Optional[str] = None
+        self.sec_uid_at = 0.0
+
+        os.makedirs(status_dir, exist_ok=True)
+        self.load()
+
+    def load(self) -> None:
+        """Load the cache file, ignoring missing or corrupted files."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        self.ms_token = data.get("ms_token")
+        self.ms_token_at = data.get("ms_token_at", 0.0)
+        self.sec_uid = data.get("sec_uid")
+        self.sec_uid_at = data.get("sec_uid_at", 0.0)
+
+    def save(self) -> None:
+        """Write the cache file atomically (non-critical on failure)."""
+        data = {
+            "ms_token": self.ms_token,
+            "ms_token_at": self.ms_token_at,
+            "sec_uid": self.sec_uid,
+            "sec_uid_at": self.sec_uid_at,
+        }
+
+        temp_file = self.path + ".tmp"
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(temp_file, self.path)
+        except OSError as e:
+            print(f"[FollowListCache] Warning: Could not write cache: {e}")
+
+    def get_ms_token(self) -> Optional[str]:
+        """Return the cached msToken if it has not expired."""
+        if self.ms_token and time.time() - self.ms_token_at <= MS_TOKEN_TTL:
+            return self.ms_token
+        return None
+
+    def set_ms_token(self, ms_token: str) -> None:
+        """Store an msToken; a rotated token restarts its lifetime."""
+        if ms_token and ms_token != self.ms_token:
+            self.ms_token = ms_token
+            self.ms_token_at = time.time()
+
+    def get_sec_uid(self) -> Optional[str]:
+        """Return the cached sec_uid if it has not expired."""
+        if self.sec_uid and time.time() - self.sec_uid_at <= SEC_UID_TTL:
+            return self.sec_uid
+        return None
+
+    def set_sec_uid(self, sec_uid: str) -> None:
+        """Store the sec_uid of the authenticated user."""
+        self.sec_uid = sec_uid
+        self.sec_uid_at = time.time()
+        self.save()
@@ -0,0 +1,289 @@
+"""
+Adaptive Poll Scheduler for TikTok Live Recorder.
+
+Instead of polling every user at one fixed interval, this module keeps a
+compact per-user history of go-live times and session lengths and uses it
+to decide how often each user is polled: creators that usually stream at
+this time of day are polled every 30 seconds, dormant ones every 30
+minutes. All polls share a global requests-per-minute budget.
+
+The history is stored in a SQLite database in the status directory so
+every recorder process contributes to (and benefits from) it.
+"""
+
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+# Default status directory (same as status_manager.py)
+DEFAULT_STATUS_DIR = ".tiktok_status"
+
+HISTORY_FILENAME = "live_history.sqlite3"
+
+# Sessions kept per user
+HISTORY_SIZE = 50
+
+# Seconds a user's sessions are reused before being read again (other
+# processes add sessions to the same database)
+HISTORY_REFRESH = 60
+
+# Poll interval bounds (seconds)
+MIN_INTERVAL = 30
+MAX_INTERVAL = 1800
+
+# Start polling fast this long before a usual go-live time (seconds)
+LEAD_TIME = 1800
+
+# Global poll budget
+REQUESTS_PER_MINUTE = 120
+
+DAY = 86400
+
+
+class LiveHistory:
+    """
+    Per-user history of live sessions as (started_at, duration) pairs.
+    Failures are non-critical: without history every user simply gets
+    the default interval.
+    """
+
+    def __init__(
+        self,
+        status_dir: str = DEFAULT_STATUS_DIR,
+        size: int = HISTORY_SIZE,
+        refresh: float = HISTORY_REFRESH,
+    ):
+        """
+        Initialize the history store.
+
+        Args:
+            status_dir: Directory holding the history database
+            size: Number of sessions kept per user
+            refresh: Seconds a user's sessions are reused before reloading
+        """
+        self.size = size
+        self.refresh = refresh
+        self._lock = threading.Lock()
+        # username -> (time.monotonic() of the read, sessions)
+        self._sessions: Dict[str, Tuple[float, List[Tuple[int, int]]]] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+
+        try:
+            os.makedirs(status_dir, exist_ok=True)
+            self._conn = sqlite3.connect(
+                os.path.join(status_dir, HISTORY_FILENAME),
+                timeout=5,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " username TEXT NOT NULL,"
+                " started_at INTEGER NOT NULL,"
+                " duration INTEGER NOT NULL DEFAULT 0,"
+                " PRIMARY KEY (username, started_at))"
+            )
+        except sqlite3.Error as e:
+            print(f"[LiveHistory] Warning: history disabled: {e}")
+            self._conn = None
+
+    def sessions(self, username: str) -> List[Tuple[int, int]]:
+        """Return the (started_at, duration) sessions of a user."""
+        now = time.monotonic()
+        with self._lock:
+            read_at, rows = self._sessions.get(username, (None, []))
+            if read_at is not None and now - read_at < self.refresh:
+                return rows
+
+            if self._conn is not None:
+                try:
+                    rows = self._conn.execute(
+                        "SELECT started_at, duration FROM sessions"
+                        " WHERE username = ? ORDER BY started_at DESC LIMIT ?",
+                        (username, self.size),
+                    ).fetchall()
+                except sqlite3.Error:
+                    pass  # Keep the last sessions read
+
+            self._sessions[username] = (now, rows)
+            return rows
+
+    def record_start(self, username: str, started_at: Optional[float] = None) -> int:
+        """
+        Record that a user went live.
+
+        Returns:
+            The session start timestamp, to pass to record_end().
+        """
+        started_at = int(started_at or time.time())
+        sessions = [(started_at, 0)] + [
+            session for session in self.sessions(username) if session[0] != started_at
+        ]
+
+        with self._lock:
+            self._sessions[username] = (time.monotonic(), sessions[: self.size])
+            self._execute(
+                "INSERT OR REPLACE INTO sessions (username, started_at, duration)"
+                " VALUES (?, ?, 0)",
+                (username, started_at),
+            )
+            self._execute(
+                "DELETE FROM sessions WHERE username = ? AND started_at NOT IN"
+                " (SELECT started_at FROM sessions WHERE username = ?"
+                " ORDER BY started_at DESC LIMIT ?)",
+                (username, username, self.size),
+            )
+
+        return started_at
+
+    def record_end(
+        self, username: str, started_at: int, ended_at: Optional[float] = None
+    ) -> None:
+        """Record the end of the session started at started_at."""
+        duration = max(0, int((ended_at or time.time()) - started_at))
+        sessions = [
+            (start, duration if start == started_at else length)
+            for start, length in self.sessions(username)
+        ]
+
+        with self._lock:
+            self._sessions[username] = (time.monotonic(), sessions)
+            self._execute(
+                "UPDATE sessions SET duration = ? WHERE username = ? AND started_at = ?",
+                (duration, username, started_at),
+            )
+
+    def _execute(self, query: str, params: tuple) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(query, params)
+        except sqlite3.Error:
+            pass  # Non-critical
+
+    def likelihood(self, username: str, now: Optional[float] = None) -> Optional[float]:
+        """
+        Fraction of past sessions that were live at this time of day, or
+        started within LEAD_TIME from now. None if there is no history.
+        """
+        sessions = self.sessions(username)
+        if not sessions:
+            return None
+
+        now = now or time.time()
+        offset = time.localtime(now).tm_gmtoff
+        time_of_day = (now + offset) % DAY
+
+        hits = 0
+        for started_at, duration in sessions:
+            window_start = (started_at + offset - LEAD_TIME) % DAY
+            if (time_of_day - window_start) % DAY <= LEAD_TIME + duration:
+                hits += 1
+
+        return hits / len(sessions)
+
+
+class AdaptivePollScheduler:
+    """
+    Priority queue of users ordered by their next poll time.
+
+    Each user's interval is derived from its LiveHistory, and pop_due()
+    never hands out more polls than the requests-per-minute budget allows.
+    """
+
+    def __init__(
+        self,
+        users=(),
+        default_interval: float = 300,
+        requests_per_minute: float = REQUESTS_PER_MINUTE,
+        history: Optional[LiveHistory] = None,
+        min_interval: float = MIN_INTERVAL,
+        max_interval: float = MAX_INTERVAL,
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            users: Users to schedule, all due immediately
+            default_interval: Seconds between polls for users without history
+            requests_per_minute: Global poll budget
+            history: LiveHistory to derive intervals from
+            min_interval: Interval for users that are likely live
+            max_interval: Interval for dormant users
+        """
+        self.default_interval = default_interval
+        self.requests_per_minute = requests_per_minute
+        self.history = history or LiveHistory()
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+        self._heap: List[Tuple[float, str]] = []
+        self._due: Dict[str, float] = {}
+        self._live_since: Dict[str, int] = {}
+        self._tokens = float(requests_per_minute)
+        self._refilled_at = time.monotonic()
+
+        now = time.monotonic()
+        for user in users:
+            self.schedule(user, now)
+
+    def interval_for(self, username: str) -> float:
+        """Seconds to wait before polling this user again."""
+        likelihood = self.history.likelihood(username)
+        if likelihood is None:
+            return self.default_interval
+
+        # Geometric interpolation: likelihood >= 0.5 polls at min_interval
+        weight = min(1.0, likelihood * 2)
+        return self.max_interval * (self.min_interval / self.max_interval) ** weight
+
+    def schedule(self, username: str, at: Optional[float] = None) -> None:
+        """
+        (Re)schedule a user. Without an explicit monotonic time the user
+        is scheduled interval_for() seconds from now.
+        """
+        if at is None:
+            at = time.monotonic() + self.interval_for(username)
+
+        self._due[username] = at
+        heapq.heappush(self._heap, (at, username))
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        rate = self.requests_per_minute / 60
+        self._tokens = min(
+            self.requests_per_minute, self._tokens + (now - self._refilled_at) * rate
+        )
+        self._refilled_at = now
+
+    def pop_due(self) -> List[str]:
+        """Return the users due for a poll, within the request budget."""
+        self._refill()
+        now = time.monotonic()
+
+        due = []
+        while self._heap and self._heap[0][0] <= now and self._tokens >= 1:
+            at, username = heapq.heappop(self._heap)
+            if self._due.get(username) != at:
+                continue  # Stale entry (rescheduled or removed)
+
+            del self._due[username]
+            self._tokens -= 1
+            due.append(username)
+
+        return due
+
+    def live_started(self, username: str) -> None:
+        """Record a go-live in the history."""
+        self._live_since[username] = self.history.record_start(username)
+
+    def live_ended(self, username: str) -> None:
+        """Record the end of a live in the history."""
+        started_at = self._live_since.pop(username, None)
+        if started_at is not None:
+            self.history.record_end(username, started_at)
@@ -0,0 +1,223 @@
+"""
+Room ID Cache for TikTok Live Recorder.
+
+This module provides a persistent username -> room_id cache that can be
+shared by several recorder processes. Entries are stored in a SQLite
+database (WAL mode) inside the status directory, so concurrent readers
+never block the process that is refreshing an entry.
+
+A "no room" answer is only trusted for long when the account doesn't
+exist; a user who is merely offline may go live at any moment, so that
+answer is only reused within the caller's max_age (less than its poll
+interval), e.g. by another process polling the same user.
+
+Besides the room_id, the signed path returned by tikrec.com is cached
+too: once a room_id entry expires it can be refreshed with a single
+request to TikTok instead of a tikrec round-trip followed by TikTok.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+
+# Default status directory (same as status_manager.py)
+DEFAULT_STATUS_DIR = ".tiktok_status"
+
+CACHE_FILENAME = "room_ids.sqlite3"
+
+# How long a resolved room_id is trusted (seconds)
+ROOM_ID_TTL = 120
+
+# How long "this account doesn't exist" is trusted (seconds)
+NEGATIVE_TTL = 600
+
+# How long a tikrec signed path is reused (seconds)
+SIGNED_PATH_TTL = 1800
+
+
+class RoomIdCache:
+    """
+    SQLite-backed cache of room_ids and tikrec signed paths.
+
+    All failures are swallowed and reported as cache misses: the cache
+    must never stop the recorder from resolving a room_id the slow way.
+    """
+
+    def __init__(
+        self,
+        status_dir: str = DEFAULT_STATUS_DIR,
+        room_ttl: float = ROOM_ID_TTL,
+        negative_ttl: float = NEGATIVE_TTL,
+        signed_path_ttl: float = SIGNED_PATH_TTL,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            status_dir: Directory holding the cache database
+            room_ttl: Seconds a cached room_id stays valid
+            negative_ttl: Seconds a cached "no such account" answer stays valid
+            signed_path_ttl: Seconds a cached signed path is reused
+        """
+        self.path = os.path.join(status_dir, CACHE_FILENAME)
+        self.room_ttl = room_ttl
+        self.negative_ttl = negative_ttl
+        self.signed_path_ttl = signed_path_ttl
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        try:
+            os.makedirs(status_dir, exist_ok=True)
+            self._conn = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None, check_same_thread=False
+            )
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS room_ids ("
+                " username TEXT PRIMARY KEY,"
+                " room_id TEXT,"
+                " checked_at REAL NOT NULL,"
+                " signed_path TEXT,"
+                " signed_at REAL,"
+                " missing INTEGER NOT NULL DEFAULT 0)"
+            )
+            try:
+                # Databases created before the missing column
+                self._conn.execute(
+                    "ALTER TABLE room_ids ADD COLUMN missing INTEGER NOT NULL DEFAULT 0"
+                )
+            except sqlite3.OperationalError:
+                pass  # Already there
+        except sqlite3.Error as e:
+            print(f"[RoomIdCache] Warning: cache disabled: {e}")
+            self._conn = None
+
+    def _fetchone(self, username: str):
+        if self._conn is None:
+            return None
+
+        try:
+            with self._lock:
+                return self._conn.execute(
+                    "SELECT room_id, checked_at, signed_path, signed_at, missing"
+                    " FROM room_ids WHERE username = ?",
+                    (username,),
+                ).fetchone()
+        except sqlite3.Error:
+            return None
+
+    def get_room_id(
+        self, username: str, max_age: float = 0
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Look up a cached room_id.
+
+        Args:
+            username: TikTok username
+            max_age: Seconds a "no room" answer for an existing account may
+                     be reused; keep it below the caller's poll interval
+
+        Returns:
+            (hit, room_id). A hit with room_id None is a negative entry:
+            the user had no room when it was last resolved.
+        """
+        row = self._fetchone(username)
+        if row is None:
+            return False, None
+
+        room_id, checked_at, _, _, missing = row
+        if room_id:
+            ttl = self.room_ttl
+        elif missing:
+            ttl = self.negative_ttl
+        else:
+            ttl = min(max_age, self.negative_ttl)
+        if time.time() - checked_at >= ttl:
+            return False, None
+
+        return True, room_id
+
+    def get_signed_path(self, username: str) -> Optional[str]:
+        """Return the cached tikrec signed path if it is still fresh."""
+        row = self._fetchone(username)
+        if row is None:
+            return None
+
+        _, _, signed_path, signed_at, _ = row
+        if not signed_path or time.time() - (signed_at or 0) > self.signed_path_ttl:
+            return None
+
+        return signed_path
+
+    def set_room_id(
+        self,
+        username: str,
+        room_id: Optional[str],
+        signed_path: Optional[str] = None,
+        missing: bool = False,
+    ) -> None:
+        """
+        Store a resolved room_id (None for a negative entry).
+
+        Args:
+            username: TikTok username
+            room_id: Resolved room_id, or None if the user has no room
+            signed_path: Signed path used for the lookup, if freshly signed
+            missing: The account doesn't exist (a negative entry kept for
+                     negative_ttl instead of the caller's max_age)
+        """
+        if self._conn is None:
+            return
+
+        room_id = room_id or None
+        missing = int(missing and room_id is None)
+        now = time.time()
+        try:
+            with self._lock:
+                if signed_path:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO room_ids"
+                        " (username, room_id, checked_at, signed_path, signed_at,"
+                        " missing) VALUES (?, ?, ?, ?, ?, ?)",
+                        (username, room_id, now, signed_path, now, missing),
+                    )
+                else:
+                    self._conn.execute(
+                        "INSERT INTO room_ids (username, room_id, checked_at, missing)"
+                        " VALUES (?, ?, ?, ?)"
+                        " ON CONFLICT(username) DO UPDATE SET"
+                        " room_id = excluded.room_id, checked_at = excluded.checked_at,"
+                        " missing = excluded.missing",
+                        (username, room_id, now, missing),
+                    )
+        except sqlite3.Error:
+            pass  # Non-critical
+
+    def invalidate(self, username: str, keep_signed_path: bool = True) -> None:
+        """
+        Expire the cached room_id for a user (e.g. when their live ended).
+
+        Args:
+            username: TikTok username
+            keep_signed_path: Keep the signed path for the next lookup
+        """
+        if self._conn is None:
+            return
+
+        try:
+            with self._lock:
+                if keep_signed_path:
+                    self._conn.execute(
+                        "UPDATE room_ids SET checked_at = 0 WHERE username = ?",
+                        (username,),
+                    )
+                else:
+                    self._conn.execute(
+                        "DELETE FROM room_ids WHERE username = ?", (username,)
+                    )
+        except sqlite3.Error:
+            pass  # Non-critical
@@ -36,7 +36,8 @@ class StatusManager:
     STATE_RECORDING = "RECORDING"
     STATE_STOPPED = "STOPPED"
     
-    def __init__(self, username: str, output_path: str = None, status_dir: str = DEFAULT_STATUS_DIR):
+    def __init__(self, username: str, output_path: str = None, status_dir: str = DEFAULT_STATUS_DIR,
+                 writer: Optional["StatusWriter"] = None):
         """
         Initialize the StatusManager for a specific user.
         
@@ -44,6 +45,8 @@ class StatusManager:
             username: TikTok username being monitored/recorded
             output_path: Path where recordings are saved
             status_dir: Directory to store status files
+            writer: Optional shared StatusWriter; when set, status files are
+                    written by its thread instead of on every update
         """
         self.username = username
         self.output_path = output_path
@@ -55,8 +58,10 @@ class StatusManager:
         self.file_size_mb: float = 0.0
         self.resolution: Optional[str] = None
         self.last_online: Optional[str] = None
+        self.first_byte_seconds: Optional[float] = None
         self._lock = threading.Lock()
         self._state = self.STATE_STARTING
+        self.writer = writer
         
         # Ensure status directory exists
         os.makedirs(status_dir, exist_ok=True)
@@ -65,9 +70,18 @@ class StatusManager:
         atexit.register(self._cleanup)
         
         # Write initial status
+        if self.writer is not None:
+            self.writer.register(self)
         self._write_status()
     
     def _write_status(self) -> None:
+        """Write the status now, or queue it on the shared writer."""
+        if self.writer is not None:
+            self.writer.mark_dirty(self)
+        else:
+            self.flush_status()
+    
+    def flush_status(self) -> None:
         """Write current status to the JSON file (thread-safe)."""
         with self._lock:
             status_data = {
@@ -80,7 +94,8 @@ class StatusManager:
                 "file_size_mb": round(self.file_size_mb, 2),
                 "output_path": self.output_path,
                 "resolution": self.resolution,
-                "last_online": self.last_online
+                "last_online": self.last_online,
+                "first_byte_seconds": self.first_byte_seconds
             }
             
             # Retry mechanism for Windows file locking issues
@@ -127,14 +142,18 @@ class StatusManager:
         self.file_size_mb = 0.0
         self.set_state(self.STATE_WAITING)
     
-    def set_recording(self, filename: str) -> None:
+    def set_recording(self, filename: str, first_byte_seconds: Optional[float] = None) -> None:
         """
         Set state to RECORDING.
         
         Args:
             filename: Name of the file being recorded
+            first_byte_seconds: Detection-to-first-byte latency of the live,
+                                if measured
         """
         self.current_file = filename
+        if first_byte_seconds is not None:
+            self.first_byte_seconds = round(first_byte_seconds, 2)
         self.file_size_mb = 0.0
         self.last_online = datetime.now().isoformat()  # Track when model is online
         self.set_state(self.STATE_RECORDING)
@@ -188,6 +207,75 @@ class StatusManager:
             pass  # Best effort cleanup
 
 
+class StatusWriter:
+    """
+    Single background writer for many StatusManagers in one process.
+    
+    Updates only mark a manager as dirty; the writer thread flushes dirty
+    managers once per flush_interval and refreshes every registered
+    manager's heartbeat once per heartbeat_interval, so idle users never
+    look stale to the monitor.
+    """
+    
+    def __init__(self, flush_interval: float = 1.0, heartbeat_interval: float = 30.0):
+        """
+        Initialize the writer.
+        
+        Args:
+            flush_interval: Seconds between flushes of dirty status files
+            heartbeat_interval: Seconds between heartbeats of all status files
+        """
+        self.flush_interval = flush_interval
+        self.heartbeat_interval = heartbeat_interval
+        self._managers: list = []
+        self._dirty: set = set()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def register(self, manager: StatusManager) -> None:
+        """Add a manager to the heartbeat rotation."""
+        with self._lock:
+            self._managers.append(manager)
+    
+    def mark_dirty(self, manager: StatusManager) -> None:
+        """Queue a manager's status file for the next flush."""
+        with self._lock:
+            self._dirty.add(manager)
+    
+    def flush(self, everything: bool = False) -> None:
+        """Write dirty status files (or all of them)."""
+        with self._lock:
+            managers = list(self._managers) if everything else list(self._dirty)
+            self._dirty.clear()
+        
+        for manager in managers:
+            manager.flush_status()
+    
+    def _run(self) -> None:
+        last_heartbeat = time.monotonic()
+        while not self._stop_event.wait(timeout=self.flush_interval):
+            heartbeat = time.monotonic() - last_heartbeat >= self.heartbeat_interval
+            if heartbeat:
+                last_heartbeat = time.monotonic()
+            self.flush(everything=heartbeat)
+    
+    def start(self) -> None:
+        """Start the writer thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        """Stop the writer thread after a final flush."""
+        self._stop_event.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=2)
+        self.flush()
+
+
 def get_all_statuses(status_dir: str = DEFAULT_STATUS_DIR) -> list:
     """
     Read all status files from the status directory.
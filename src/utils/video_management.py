@@ -48,3 +48,57 @@ class VideoManagement:
         os.remove(file)
 
         logger.info("Finished converting {}\n".format(file))
+
+    @staticmethod
+    def finalize(file, output):
+        """
+        Give a recording already written in its final container (fragmented
+        MP4, FLV) its final name: a rename instead of a full rewrite
+        """
+        if not VideoManagement.wait_for_file_release(file):
+            logger.error(f"File {file} is still locked after waiting. Skipping rename.")
+            return
+
+        os.replace(file, output)
+
+        logger.info("Finished recording {}\n".format(output))
+
+    @staticmethod
+    def concat_parts(files, output):
+        """
+        Join the parts of one recording (e.g. after a CDN failover) into a
+        single mp4 without re-encoding, then remove the parts
+        """
+        logger.info("Joining {} parts into {}...".format(len(files), output))
+
+        for file in files:
+            if not VideoManagement.wait_for_file_release(file):
+                logger.error(
+                    f"File {file} is still locked after waiting. Skipping join."
+                )
+                return
+
+        list_file = output + ".parts.txt"
+        with open(list_file, "w", encoding="utf-8") as f:
+            for file in files:
+                path = os.path.abspath(file).replace("'", "'\\''")
+                f.write(f"file '{path}'\n")
+
+        try:
+            ffmpeg.input(list_file, f="concat", safe=0).output(
+                output,
+                c="copy",
+                y="-y",
+            ).run(quiet=True)
+        except ffmpeg.Error as e:
+            logger.error(
+                f"ffmpeg error: {e.stderr.decode() if hasattr(e, 'stderr') else str(e)}"
+            )
+            os.remove(list_file)
+            return
+
+        os.remove(list_file)
+        for file in files:
+            os.remove(file)
+
+        logger.info("Finished joining {}\n".format(output))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The application modules import each other from src/ (e.g. "from utils.flv import ...")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
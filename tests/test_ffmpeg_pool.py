@@ -0,0 +1,48 @@
+import shutil
+import subprocess
+import time
+
+import pytest
+
+from utils.ffmpeg_pool import FfmpegWorker
+
+FFMPEG = shutil.which("ffmpeg")
+
+
+@pytest.fixture
+def long_gop_flv(tmp_path):
+    """8 seconds of H.264 + AAC with a single keyframe, as a live FLV."""
+    if FFMPEG is None:
+        pytest.skip("ffmpeg not found")
+    path = tmp_path / "long_gop.flv"
+    result = subprocess.run(
+        [FFMPEG, "-y", "-loglevel", "error",
+         "-f", "lavfi", "-i", "testsrc2=size=640x360:rate=25",
+         "-f", "lavfi", "-i", "sine", "-t", "8",
+         "-c:v", "libx264", "-preset", "ultrafast", "-qp", "10", "-g", "1000",
+         "-c:a", "aac", "-f", "flv", str(path)],
+        capture_output=True,
+    )  # fmt: skip
+    if result.returncode != 0:
+        pytest.skip("ffmpeg can't encode H.264 here")
+    return path.read_bytes()
+
+
+def test_output_grows_within_a_long_gop(tmp_path, long_gop_flv):
+    output = tmp_path / "live_flv.mp4"
+    worker = FfmpegWorker(FFMPEG, str(output))
+    try:
+        # The whole GOP is in, but the stream hasn't ended: FFmpeg must
+        # still write fragments (the stall detector watches the output)
+        worker.write(long_gop_flv)
+        worker.process.stdin.flush()
+
+        fragments = 0
+        deadline = time.monotonic() + 10
+        while fragments < 3 and time.monotonic() < deadline:
+            time.sleep(0.2)
+            if output.exists():
+                fragments = output.read_bytes().count(b"moof")
+        assert fragments >= 3
+    finally:
+        worker.stop()
@@ -0,0 +1,204 @@
+from utils.flv import (
+    FLV_SIGNATURE,
+    RECONNECT_GAP,
+    FlvReader,
+    FlvStitcher,
+    video_resolution,
+)
+
+# AVCDecoderConfigurationRecord of a 640x360 High profile stream
+AVC_640x360 = bytes.fromhex(
+    "0164001effe100196764001eacd940a02ff9610000030001000003003c0f162d96"
+    "01000668ebe3cb22c0fdf8f800"
+)
+AVC_720x1280 = bytes.fromhex(
+    "0164001fffe100196764001facd940b40a1a10000003001000000303c0f18319600100"
+    "0668ebe3cb22c0fdf8f800"
+)
+AVC_1920x1080 = bytes.fromhex(
+    "01640028ffe1001a67640028acd940780227e584000003000400000300f03c60c658"
+    "01000668ebe3cb22c0fdf8f800"
+)
+# Main profile SPS (x265) of a 1920x1080 stream
+HEVC_SPS_1920x1080 = bytes.fromhex(
+    "420101016000000300900000030000030078a003c08010e596566924cae68080000003008000000f04"
+)
+
+
+def flv_header() -> bytes:
+    """FLV header (audio and video) with PreviousTagSize0."""
+    return FLV_SIGNATURE + b"\x01\x05" + (9).to_bytes(4, "big") + bytes(4)
+
+
+def flv_tag(tag_type: int, timestamp: int, payload: bytes) -> bytes:
+    header = (
+        bytes([tag_type])
+        + len(payload).to_bytes(3, "big")
+        + (timestamp & 0xFFFFFF).to_bytes(3, "big")
+        + bytes([timestamp >> 24 & 0xFF])
+        + bytes(3)
+    )
+    return header + payload + (len(header) + len(payload)).to_bytes(4, "big")
+
+
+def video_config_tag(config: bytes, timestamp: int = 0) -> bytes:
+    return flv_tag(9, timestamp, b"\x17\x00\x00\x00\x00" + config)
+
+
+def video_tag(timestamp: int, keyframe: bool = False) -> bytes:
+    return flv_tag(
+        9, timestamp, (b"\x17" if keyframe else b"\x27") + b"\x01" + bytes(8)
+    )
+
+
+def audio_config_tag(timestamp: int = 0) -> bytes:
+    return flv_tag(8, timestamp, b"\xaf\x00\x12\x10")
+
+
+def audio_tag(timestamp: int) -> bytes:
+    return flv_tag(8, timestamp, b"\xaf\x01" + bytes(6))
+
+
+def segment(start: int, frames: int, config: bytes = AVC_640x360) -> bytes:
+    """One connection's stream: header, metadata, configs, then A/V at 40 ms."""
+    data = flv_header() + flv_tag(18, 0, b"\x02\x00\x0aonMetaData")
+    data += video_config_tag(config, start) + audio_config_tag(start)
+    for i in range(frames):
+        data += video_tag(start + i * 40, keyframe=i == 0) + audio_tag(start + i * 40)
+    return data
+
+
+def stitch(stitcher, connections, block_size):
+    """Feed each connection in block_size blocks; returns the written parts."""
+    written = []
+    for data in connections:
+        stitcher.new_connection()
+        for pos in range(0, len(data), block_size):
+            written.extend(stitcher.feed(bytearray(data[pos : pos + block_size])))
+    return [None if part is None else bytes(part) for part in written]
+
+
+def read_tags(data: bytes):
+    reader = FlvReader()
+    tags = reader.feed(data)
+    return reader, tags
+
+
+def test_two_connections_make_one_continuous_flv():
+    first, second = segment(0, 10), segment(90000, 10)
+
+    for block_size in (7, 100, 1 << 20):  # Tags straddling blocks, or not
+        stitcher = FlvStitcher()
+        output = b"".join(stitch(stitcher, [first, second], block_size))
+
+        assert output.count(FLV_SIGNATURE) == 1
+        reader, tags = read_tags(output)
+        assert reader.header == flv_header()
+        assert sum(tag.tag_type == 18 for tag in tags) == 1
+        assert sum(tag.video_config() is not None for tag in tags) == 1
+        assert sum(tag.is_audio_config for tag in tags) == 1
+        assert len(tags) == 1 + 2 + 2 * 20
+
+        media = [tag.timestamp for tag in tags if tag.tag_type != 18]
+        assert media == sorted(media)
+        video = [tag.timestamp for tag in tags if tag.is_video]
+        assert video[-10] == video[-11] + RECONNECT_GAP  # No jump, no rewind
+        assert stitcher.keyframes == 2
+        assert stitcher.parts == 1
+
+
+def test_torn_tag_is_dropped():
+    first, second = segment(0, 5), segment(5000, 5)
+    torn = first + video_tag(200)[:9]  # The connection breaks mid-tag
+
+    output = b"".join(stitch(FlvStitcher(), [torn, second], 64))
+
+    reader, tags = read_tags(output)
+    assert reader.feed(b"") == [] and not reader._buffer  # Nothing left over
+    assert [tag.timestamp for tag in tags if tag.is_video] == [
+        0,
+        0,
+        40,
+        80,
+        120,
+        160,
+        200,
+        240,
+        280,
+        320,
+        360,
+    ]
+
+
+def test_data_that_is_not_flv_passes_through():
+    data = b"#EXTM3U\n" * 10
+    stitcher = FlvStitcher()
+
+    assert b"".join(stitch(stitcher, [data], 16)) == data
+    assert stitcher.passthrough
+
+
+def test_non_flv_starting_in_a_tiny_block_is_written_once():
+    data = b"#EXTM3U\n" * 10
+    stitcher = FlvStitcher()
+    stitcher.new_connection()
+
+    output = [stitcher.feed(bytearray(data[:2])), stitcher.feed(bytearray(data[2:]))]
+
+    assert b"".join(bytes(part) for parts in output for part in parts) == data
+
+
+def hevc_config(sps: bytes) -> bytes:
+    """HEVCDecoderConfigurationRecord with a single SPS array."""
+    header = bytes.fromhex("01016000000090000000000078f000fcfdf8f800000f")
+    return header + b"\x01\xa1\x00\x01" + len(sps).to_bytes(2, "big") + sps
+
+
+def test_sps_resolution():
+    assert video_resolution("avc1", AVC_640x360) == (640, 360)
+    assert video_resolution("avc1", AVC_720x1280) == (720, 1280)
+    assert video_resolution("avc1", AVC_1920x1080) == (1920, 1080)  # Cropped
+    assert video_resolution("hvc1", hevc_config(HEVC_SPS_1920x1080)) == (1920, 1080)
+
+
+def test_truncated_or_unknown_config_has_no_resolution():
+    assert video_resolution("avc1", AVC_640x360[:14]) is None
+    assert video_resolution("avc1", b"") is None
+    assert video_resolution("hvc1", hevc_config(HEVC_SPS_1920x1080[:6])) is None
+    assert video_resolution("av01", AVC_640x360) is None
+
+
+def test_new_video_parameters_start_a_new_part():
+    first, second = segment(0, 10), segment(90000, 10, AVC_720x1280)
+
+    for block_size in (7, 100, 1 << 20):
+        stitcher = FlvStitcher()
+        written = stitch(stitcher, [first, second], block_size)
+
+        assert stitcher.parts == 2
+        assert written.count(None) == 1
+        split = written.index(None)
+        parts = [b"".join(written[:split]), b"".join(written[split + 1 :])]
+
+        reader, tags = read_tags(parts[0])
+        assert reader.header == flv_header()
+        assert video_resolution(*tags[1].video_config()) == (640, 360)
+        assert sum(tag.is_video for tag in tags) == 11
+
+        reader, tags = read_tags(parts[1])
+        assert reader.header == flv_header()
+        assert tags[0].is_audio_config  # Carried over to the new part
+        assert video_resolution(*tags[1].video_config()) == (720, 1280)
+        assert tags[2].is_keyframe
+        media = [tag.timestamp for tag in tags]
+        assert media[0] == 0 and media == sorted(media)
+        assert stitcher.resolution == (720, 1280)
+
+
+def test_repeated_parameters_stay_in_one_part():
+    stitcher = FlvStitcher()
+    written = stitch(stitcher, [segment(0, 5), segment(0, 5)], 100)
+
+    assert None not in written
+    assert stitcher.parts == 1
+    assert stitcher.resolution == (640, 360)
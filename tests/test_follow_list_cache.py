@@ -0,0 +1,31 @@
+from utils import follow_list_cache
+from utils.follow_list_cache import MS_TOKEN_TTL, FollowListCache
+
+
+def test_tokens_are_reused_until_they_expire(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(follow_list_cache.time, "time", lambda: now[0])
+    cache = FollowListCache("key", status_dir=str(tmp_path))
+    assert cache.get_ms_token() is None
+
+    cache.set_ms_token("token")
+    now[0] += MS_TOKEN_TTL
+    assert cache.get_ms_token() == "token"
+
+    cache.set_ms_token("token")  # The same token doesn't restart its lifetime
+    now[0] += 1
+    assert cache.get_ms_token() is None
+
+    cache.set_ms_token("rotated")
+    assert cache.get_ms_token() == "rotated"
+
+
+def test_tokens_survive_a_reload(tmp_path):
+    cache = FollowListCache("key", status_dir=str(tmp_path))
+    cache.set_ms_token("token")
+    cache.set_sec_uid("sec")  # Saves the file
+
+    reloaded = FollowListCache("key", status_dir=str(tmp_path))
+    assert reloaded.get_ms_token() == "token"
+    assert reloaded.get_sec_uid() == "sec"
+    assert FollowListCache("other", status_dir=str(tmp_path)).get_sec_uid() is None
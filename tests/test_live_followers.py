@@ -0,0 +1,22 @@
+from core.tiktok_recorder import TikTokRecorder
+
+
+class FakeTikTokAPI:
+    """Live feed down, follow list with room ids, one follower live."""
+
+    def get_following_live(self):
+        raise ConnectionError("feed unavailable")
+
+    def get_followers_room_ids(self, sec_uid):
+        return {"streamer": "999", "ended": "555", "idle": None}
+
+    def is_rooms_alive(self, room_ids):
+        return {str(room_id): room_id == "999" for room_id in room_ids}
+
+
+def test_fallback_keeps_the_live_followers():
+    recorder = TikTokRecorder.__new__(TikTokRecorder)
+    recorder.tiktok = FakeTikTokAPI()
+    recorder.sec_uid = "sec"
+
+    assert recorder.get_live_followers() == {"streamer": "999"}
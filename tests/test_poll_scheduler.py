@@ -0,0 +1,84 @@
+import time
+
+from utils.poll_scheduler import AdaptivePollScheduler, LiveHistory
+
+
+def test_sessions_written_by_another_process_are_seen(tmp_path):
+    reader = LiveHistory(str(tmp_path), refresh=0.1)
+    writer = LiveHistory(str(tmp_path))
+    assert reader.sessions("alice") == []
+
+    started_at = writer.record_start("alice", 1_700_000_000)
+    writer.record_end("alice", started_at, 1_700_003_600)
+
+    time.sleep(0.15)
+    assert reader.sessions("alice") == [(1_700_000_000, 3600)]
+
+
+def test_record_start_and_end_update_the_sessions(tmp_path):
+    history = LiveHistory(str(tmp_path), size=2)
+    for started_at in (1000, 2000, 3000):
+        history.record_start("bob", started_at)
+    history.record_end("bob", 3000, 3500)
+
+    assert history.sessions("bob") == [(3000, 500), (2000, 0)]
+    assert LiveHistory(str(tmp_path)).sessions("bob") == [(3000, 500), (2000, 0)]
+
+
+def test_interval_is_bounded_by_max_interval(tmp_path):
+    history = LiveHistory(str(tmp_path))
+    now = time.time()
+    started_at = history.record_start("carol", now - 12 * 3600)  # Off-hours
+    history.record_end("carol", started_at, now - 11 * 3600)
+
+    adaptive = AdaptivePollScheduler(default_interval=60, history=history)
+    assert history.likelihood("carol", now) == 0
+    assert adaptive.interval_for("carol") == 1800  # Dormant
+
+    bounded = AdaptivePollScheduler(
+        default_interval=60, history=history, max_interval=60
+    )
+    assert bounded.interval_for("carol") == 60
+
+
+class FakeCache:
+    def invalidate(self, user):
+        pass
+
+
+def fake_tiktok(history, statuses):
+    """TikTok bot whose recordings end with the given statuses."""
+    from tiktok import TikTok
+
+    bot = TikTok.__new__(TikTok)
+    bot.user = "dave"
+    bot.live_history = history
+    bot.live_started_at = None
+    bot.room_id_cache = FakeCache()
+    bot.get_stream_urls = lambda room_id: ["https://example.com/live.flv"]
+    bot.start_recording = lambda *args: statuses.pop(0)
+    return bot
+
+
+def test_a_live_is_recorded_when_found_and_ended_only_when_finished(tmp_path):
+    history = LiveHistory(str(tmp_path))
+    bot = fake_tiktok(history, ["MANUAL_STOP", "ERROR", "FINISHED"])
+
+    assert bot.record_live("7001", 1000, record_history=True) == "MANUAL_STOP"
+    assert history.sessions("dave") == [(1000, 0)]  # Kept if the process dies now
+
+    bot.record_live("7001", 1200, record_history=True)  # Same live, resumed
+    assert history.sessions("dave") == [(1000, 0)]
+
+    bot.record_live("7001", 1500, record_history=True)
+    assert history.sessions("dave")[0][0] == 1000
+    assert history.sessions("dave")[0][1] > 0
+    assert bot.live_started_at is None
+
+
+def test_record_live_leaves_the_history_to_its_caller(tmp_path):
+    history = LiveHistory(str(tmp_path))
+    bot = fake_tiktok(history, ["FINISHED"])
+
+    bot.record_live("7001", 1000)  # The supervisor's poller records it
+    assert history.sessions("dave") == []
@@ -0,0 +1,115 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+
+from core.recording_pipeline import RecordingPipeline
+from utils.enums import SpillPolicy
+
+
+class SlowSink(io.BytesIO):
+    """In-memory output whose writes wait until released."""
+
+    def __init__(self):
+        super().__init__()
+        self.released = threading.Event()
+
+    def write(self, data):
+        self.released.wait()
+        return super().write(data)
+
+
+def blocks(count, size=16):
+    return [bytes([i % 256]) * size for i in range(count)]
+
+
+def feed(pipeline, data):
+    """Read every block into the pipeline, like the recorder's reader."""
+    for block in data:
+        buffer = pipeline.next_buffer()
+        buffer[: len(block)] = block
+        pipeline.put(buffer[: len(block)])
+
+
+def test_spill_keeps_reading_and_writes_everything(tmp_path):
+    sink = SlowSink()
+    pipeline = RecordingPipeline(sink, 16, 2, SpillPolicy.SPILL, str(tmp_path))
+    pipeline.start()
+    data = blocks(20)
+
+    feed(pipeline, data)  # Never waits for the stuck sink
+    assert pipeline.spilled_bytes > 0
+    assert pipeline.reader_wait == 0
+
+    sink.released.set()
+    pipeline.close()
+
+    assert sink.getvalue() == b"".join(data)
+    assert os.listdir(tmp_path) == []  # Spill file removed
+
+
+def test_block_waits_for_the_writer(tmp_path):
+    sink = SlowSink()
+    pipeline = RecordingPipeline(sink, 16, 2, SpillPolicy.BLOCK, str(tmp_path))
+    pipeline.start()
+    data = blocks(10)
+
+    threading.Timer(0.2, sink.released.set).start()
+    feed(pipeline, data)
+    pipeline.close()
+
+    assert sink.getvalue() == b"".join(data)
+    assert pipeline.spilled_bytes == 0
+    assert pipeline.reader_wait > 0.1
+
+
+def test_spill_and_memory_blocks_stay_in_order(tmp_path):
+    sink = SlowSink()
+    pipeline = RecordingPipeline(sink, 16, 3, SpillPolicy.SPILL, str(tmp_path))
+    pipeline.start()
+    data = blocks(30)
+
+    feed(pipeline, data[:10])
+    sink.released.set()
+    feed(pipeline, data[10:])
+    pipeline.close()
+
+    assert sink.getvalue() == b"".join(data)
+
+
+def test_none_part_starts_a_new_file(tmp_path):
+    first = io.BytesIO()
+    parts = []
+
+    def open_part(index):
+        parts.append(io.BytesIO())
+        parts[-1].close = lambda: None  # Keep the content readable
+        return parts[-1]
+
+    pipeline = RecordingPipeline(first, 16, 2, open_part=open_part)
+    pipeline.start()
+    buffer = pipeline.next_buffer()
+    buffer[:8] = b"AAAABBBB"
+    pipeline.put(buffer[:8], [buffer[:4], None, buffer[4:8]])
+    pipeline.close()
+
+    assert first.getvalue() == b"AAAA"
+    assert [part.getvalue() for part in parts] == [b"BBBB"]
+
+
+def test_writer_error_reaches_the_reader():
+    class FullDisk(io.BytesIO):
+        def write(self, data):
+            raise OSError("No space left on device")
+
+    pipeline = RecordingPipeline(FullDisk(), 16, 2)
+    pipeline.start()
+    feed(pipeline, blocks(1))
+
+    deadline = time.monotonic() + 5
+    while pipeline.error is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    with pytest.raises(OSError):
+        feed(pipeline, blocks(1))
@@ -0,0 +1,95 @@
+import sqlite3
+
+import pytest
+
+from utils import room_id_cache
+from utils.room_id_cache import CACHE_FILENAME, RoomIdCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() of the cache module."""
+    now = [1000.0]
+    monkeypatch.setattr(room_id_cache.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return RoomIdCache(str(tmp_path), room_ttl=120, negative_ttl=600)
+
+
+def test_miss_hit_and_expiry(cache, clock):
+    assert cache.get_room_id("alice") == (False, None)
+
+    cache.set_room_id("alice", "7001")
+    clock[0] += 119
+    assert cache.get_room_id("alice") == (True, "7001")
+    clock[0] += 1
+    assert cache.get_room_id("alice") == (False, None)
+
+
+def test_offline_answer_is_only_reused_within_max_age(cache, clock):
+    cache.set_room_id("bob", None)
+
+    assert cache.get_room_id("bob") == (False, None)  # No max_age: never reused
+    assert cache.get_room_id("bob", max_age=15) == (True, None)
+    clock[0] += 15
+    assert cache.get_room_id("bob", max_age=15) == (False, None)
+    assert cache.get_room_id("bob", max_age=3600) == (True, None)
+    clock[0] += 585
+    assert cache.get_room_id("bob", max_age=3600) == (False, None)  # Capped at 600
+
+
+def test_missing_account_is_kept_for_negative_ttl(cache, clock):
+    cache.set_room_id("ghost", None, missing=True)
+
+    clock[0] += 599
+    assert cache.get_room_id("ghost") == (True, None)
+    clock[0] += 1
+    assert cache.get_room_id("ghost") == (False, None)
+
+
+def test_new_answer_replaces_the_negative_entry(cache):
+    cache.set_room_id("carol", None, missing=True)
+    cache.set_room_id("carol", None)
+    assert cache.get_room_id("carol") == (False, None)
+
+    cache.set_room_id("carol", "7002", missing=True)  # A room: not missing
+    cache.set_room_id("carol", None)
+    assert cache.get_room_id("carol") == (False, None)
+
+
+def test_signed_path_survives_invalidate(cache, clock):
+    cache.set_room_id("dave", "7003", signed_path="/signed?x=1")
+    cache.invalidate("dave")
+
+    assert cache.get_room_id("dave") == (False, None)
+    assert cache.get_signed_path("dave") == "/signed?x=1"
+    clock[0] += 1801
+    assert cache.get_signed_path("dave") is None
+
+    cache.set_room_id("dave", "7003", signed_path="/signed?x=2")
+    cache.invalidate("dave", keep_signed_path=False)
+    assert cache.get_signed_path("dave") is None
+
+
+def test_entries_are_shared_between_instances(tmp_path, cache):
+    cache.set_room_id("erin", "7004")
+    assert RoomIdCache(str(tmp_path)).get_room_id("erin") == (True, "7004")
+
+
+def test_database_without_missing_column_is_upgraded(tmp_path, clock):
+    conn = sqlite3.connect(str(tmp_path / CACHE_FILENAME))
+    conn.execute(
+        "CREATE TABLE room_ids (username TEXT PRIMARY KEY, room_id TEXT,"
+        " checked_at REAL NOT NULL, signed_path TEXT, signed_at REAL)"
+    )
+    conn.execute("INSERT INTO room_ids VALUES ('frank', '7005', 1000, NULL, NULL)")
+    conn.commit()
+    conn.close()
+
+    cache = RoomIdCache(str(tmp_path))
+    assert cache.get_room_id("frank") == (True, "7005")
+    cache.set_room_id("frank", None, missing=True)
+    assert cache.get_room_id("frank") == (True, None)